@@ -0,0 +1,218 @@
+"""
+Admission control per route class
+Every sync endpoint shares one threadpool, so a burst of AI generations could
+hold every thread while admin writes and the frontend's GETs wait behind them.
+Requests are split into browse, admin and generation classes, each with its
+own concurrency limit and a bounded FIFO wait queue; a request that finds the
+queue full or waits longer than the class's queue timeout gets a 503.
+
+ADMISSION_CONTROL: "true" (default) or "false"
+ADMISSION_LIMITS: concurrent requests per class (default browse=24,admin=4,generation=4)
+ADMISSION_QUEUE_SIZES: waiting requests per class (default browse=64,admin=16,generation=8)
+ADMISSION_QUEUE_TIMEOUTS: seconds a request may wait (default browse=5,admin=30,generation=30)
+"""
+
+import hmac
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import anyio
+from anyio import to_thread
+from starlette.responses import JSONResponse
+
+from metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS
+from tracing import current_span
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() == "true"
+ROUTE_CLASSES = ("browse", "admin", "generation")
+DEFAULT_LIMITS = "browse=24,admin=4,generation=4"
+DEFAULT_QUEUE_SIZES = "browse=64,admin=16,generation=8"
+DEFAULT_QUEUE_TIMEOUTS = "browse=5,admin=30,generation=30"
+
+# (method, route) pairs that run the LLM pipeline
+GENERATION_ROUTES = {("POST", "/api/applications")}
+# Never queued: scrapes must get through precisely when the service is saturated
+EXEMPT_PATHS = {"/metrics"}
+
+
+def _class_settings(variable: str, default: str) -> Dict[str, float]:
+    settings = {}
+    for raw in (default, os.getenv(variable, "")):
+        for item in raw.split(","):
+            if "=" in item:
+                name, value = (part.strip() for part in item.split("=", 1))
+                if name not in ROUTE_CLASSES:
+                    raise ValueError(f"{variable}: unknown route class {name!r}, expected one of {ROUTE_CLASSES}")
+                settings[name] = float(value)
+    return settings
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, route_class: str, reason: str):
+        super().__init__(f"{route_class} {reason}")
+        self.route_class = route_class
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("event", "granted")
+
+    def __init__(self):
+        self.event = anyio.Event()
+        self.granted = False
+
+
+class RouteClass:
+    """Concurrency slots with a FIFO wait queue.
+
+    Only touched from the event loop thread, so it needs no lock. A released
+    slot goes straight to the oldest waiter, which keeps arrivals from
+    overtaking requests that have been queued longer.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: Deque[_Waiter] = deque()
+
+    def _report(self):
+        ADMISSION_IN_FLIGHT.labels(route_class=self.name).set(self.in_flight)
+        ADMISSION_QUEUE_DEPTH.labels(route_class=self.name).set(len(self._waiters))
+
+    async def acquire(self) -> float:
+        """Take a slot, waiting in line if none is free; returns the seconds waited"""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self._report()
+            return 0.0
+        if len(self._waiters) >= self.queue_size:
+            raise AdmissionRejected(self.name, "queue_full")
+
+        waiter = _Waiter()
+        self._waiters.append(waiter)
+        self._report()
+        started = time.perf_counter()
+        try:
+            with anyio.move_on_after(self.queue_timeout):
+                await waiter.event.wait()
+        except BaseException:
+            # Client gone while queued: pass on a slot handed over meanwhile
+            if waiter.granted:
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+                self._report()
+            raise
+        if not waiter.granted:
+            self._waiters.remove(waiter)
+            self._report()
+            raise AdmissionRejected(self.name, "timeout")
+        return time.perf_counter() - started
+
+    def release(self):
+        if self._waiters:
+            # The slot moves to the next waiter; in_flight stays the same
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            waiter.event.set()
+        else:
+            self.in_flight -= 1
+        self._report()
+
+    def status(self) -> Dict:
+        return {"in_flight": self.in_flight, "limit": self.limit, "queued": len(self._waiters),
+                "queue_size": self.queue_size, "queue_timeout_seconds": self.queue_timeout}
+
+
+def build_route_classes() -> Dict[str, RouteClass]:
+    limits = _class_settings("ADMISSION_LIMITS", DEFAULT_LIMITS)
+    queue_sizes = _class_settings("ADMISSION_QUEUE_SIZES", DEFAULT_QUEUE_SIZES)
+    timeouts = _class_settings("ADMISSION_QUEUE_TIMEOUTS", DEFAULT_QUEUE_TIMEOUTS)
+    return {
+        name: RouteClass(name, int(limits[name]), int(queue_sizes[name]), timeouts[name])
+        for name in ROUTE_CLASSES
+    }
+
+
+route_classes = build_route_classes()
+
+
+def admission_status() -> Dict:
+    return {"enabled": ADMISSION_CONTROL, "classes": {name: rc.status() for name, rc in route_classes.items()}}
+
+
+def size_threadpool():
+    """Grow anyio's default threadpool to at least the sum of the class limits.
+
+    Otherwise admitted requests could still queue for a thread behind another
+    class, which is the starvation admission control is meant to prevent.
+    Call from the event loop (the startup hook).
+    """
+    if not ADMISSION_CONTROL:
+        return
+    needed = sum(rc.limit for rc in route_classes.values())
+    limiter = to_thread.current_default_thread_limiter()
+    if limiter.total_tokens < needed:
+        logger.info("🚦 Threadpool raised from %d to %d threads for the admission limits",
+                    limiter.total_tokens, needed)
+        limiter.total_tokens = needed
+
+
+class AdmissionMiddleware:
+    """Holds each HTTP request until its route class has a free slot, or answers 503"""
+
+    def __init__(self, app, admin_key: str):
+        self.app = app
+        self.admin_key = admin_key.encode("latin-1")
+
+    def _route_class(self, scope) -> Optional[str]:
+        if scope["method"] == "OPTIONS" or scope["path"] in EXEMPT_PATHS:
+            return None
+        if (scope["method"], scope["path"].rstrip("/") or "/") in GENERATION_ROUTES:
+            return "generation"
+        authorization = dict(scope["headers"]).get(b"authorization", b"")
+        if authorization and hmac.compare_digest(authorization, b"Bearer " + self.admin_key):
+            return "admin"
+        return "browse"
+
+    async def __call__(self, scope, receive, send):
+        name = self._route_class(scope) if scope["type"] == "http" and ADMISSION_CONTROL else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        route_class = route_classes[name]
+        active = current_span()
+        try:
+            waited = await route_class.acquire()
+        except AdmissionRejected as e:
+            ADMISSION_REJECTED.labels(route_class=name, reason=e.reason).inc()
+            if active:
+                active.set_attribute("admission.rejected", e.reason)
+            logger.info("🚦 %s %s refused: %s queue %s", scope["method"], scope["path"], name, e.reason,
+                        extra={"event": "admission.rejected", "route_class": name, "reason": e.reason})
+            response = JSONResponse(
+                {"detail": "The server is busy. Please try again shortly."},
+                status_code=503,
+                headers={"Retry-After": str(max(1, math.ceil(route_class.queue_timeout)))}
+            )
+            await response(scope, receive, send)
+            return
+
+        ADMISSION_WAIT_SECONDS.labels(route_class=name).observe(waited)
+        if active:
+            active.set_attribute("admission.class", name)
+            active.set_attribute("admission.wait_ms", round(waited * 1000, 1))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_class.release()
@@ -0,0 +1,153 @@
+"""
+Binary backup format that carries embedding vectors
+A tar container holding a JSON manifest, zstd-compressed block metadata and a
+zstd-compressed .npy embedding matrix, so restores don't have to re-embed
+"""
+
+import hashlib
+import io
+import json
+import tarfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import zstandard
+
+BACKUP_FORMAT = "vector-cv-backup"
+BACKUP_FORMAT_VERSION = 1
+BACKUP_EXTENSION = ".vcvb"
+BACKUP_MEDIA_TYPE = "application/vnd.vector-cv.backup"
+
+MANIFEST_MEMBER = "manifest.json"
+BLOCKS_MEMBER = "blocks.json.zst"
+EMBEDDINGS_MEMBER = "embeddings.npy.zst"
+
+ZSTD_LEVEL = 10
+
+
+class BackupFormatError(ValueError):
+    """Raised when a backup file is malformed, corrupted or from an unknown format version"""
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def embedding_checksum(model: str, dimensions: int) -> str:
+    """Identifies the vector space; vectors are only reusable when this matches"""
+    return _sha256(f"{model}|{dimensions}".encode("utf-8"))
+
+
+def _add_member(archive: tarfile.TarFile, name: str, data: bytes):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    archive.addfile(info, io.BytesIO(data))
+
+
+def write_backup(
+    personal_info: Optional[Dict],
+    blocks: List[Dict],
+    embeddings: List[Optional[List[float]]],
+    embedding_model: str,
+    embedding_dimensions: int
+) -> bytes:
+    """Serialize export-format blocks plus their vectors (None where a block has none)"""
+    matrix = np.zeros((len(blocks), embedding_dimensions), dtype="<f4")
+    blocks_out = []
+    for row, (block, vector) in enumerate(zip(blocks, embeddings)):
+        has_embedding = vector is not None and len(vector) == embedding_dimensions
+        if has_embedding:
+            matrix[row] = np.asarray(vector, dtype="<f4")
+        blocks_out.append({**block, "has_embedding": has_embedding})
+
+    blocks_json = json.dumps(
+        {"personal_info": personal_info, "experience_blocks": blocks_out},
+        ensure_ascii=False
+    ).encode("utf-8")
+    npy = io.BytesIO()
+    np.save(npy, matrix, allow_pickle=False)
+    npy_bytes = npy.getvalue()
+
+    manifest = {
+        "format": BACKUP_FORMAT,
+        "version": BACKUP_FORMAT_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "block_count": len(blocks),
+        "embedding_model": embedding_model,
+        "embedding_dimensions": embedding_dimensions,
+        "embedding_checksum": embedding_checksum(embedding_model, embedding_dimensions),
+        "blocks_sha256": _sha256(blocks_json),
+        "embeddings_sha256": _sha256(npy_bytes),
+        "compression": "zstd"
+    }
+
+    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    out = io.BytesIO()
+    with tarfile.open(fileobj=out, mode="w") as archive:
+        _add_member(archive, MANIFEST_MEMBER, json.dumps(manifest, indent=2).encode("utf-8"))
+        _add_member(archive, BLOCKS_MEMBER, compressor.compress(blocks_json))
+        _add_member(archive, EMBEDDINGS_MEMBER, compressor.compress(npy_bytes))
+    return out.getvalue()
+
+
+def _read_member(archive: tarfile.TarFile, name: str) -> bytes:
+    try:
+        return archive.extractfile(name).read()
+    except (KeyError, AttributeError):
+        raise BackupFormatError(f"Backup is missing {name}")
+
+
+def read_manifest(data: bytes) -> Dict:
+    """Read only the manifest, for previews"""
+    try:
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:") as archive:
+            return json.loads(_read_member(archive, MANIFEST_MEMBER))
+    except (tarfile.TarError, ValueError) as e:
+        raise BackupFormatError(f"Not a Vector CV backup: {e}")
+
+
+def read_backup(data: bytes) -> Tuple[Dict, Optional[Dict], List[Dict], np.ndarray]:
+    """Parse and verify a backup, returning (manifest, personal_info, blocks, embedding matrix)"""
+    try:
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:") as archive:
+            manifest = json.loads(_read_member(archive, MANIFEST_MEMBER))
+            blocks_zst = _read_member(archive, BLOCKS_MEMBER)
+            embeddings_zst = _read_member(archive, EMBEDDINGS_MEMBER)
+    except (tarfile.TarError, ValueError) as e:
+        raise BackupFormatError(f"Not a Vector CV backup: {e}")
+
+    if manifest.get("format") != BACKUP_FORMAT:
+        raise BackupFormatError("Not a Vector CV backup")
+    if manifest.get("version") != BACKUP_FORMAT_VERSION:
+        raise BackupFormatError(f"Unsupported backup version {manifest.get('version')}")
+
+    decompressor = zstandard.ZstdDecompressor()
+    try:
+        blocks_json = decompressor.decompress(blocks_zst)
+        npy_bytes = decompressor.decompress(embeddings_zst)
+    except zstandard.ZstdError as e:
+        raise BackupFormatError(f"Backup is corrupted: {e}")
+    if _sha256(blocks_json) != manifest.get("blocks_sha256"):
+        raise BackupFormatError("Block data checksum mismatch, backup is corrupted")
+    if _sha256(npy_bytes) != manifest.get("embeddings_sha256"):
+        raise BackupFormatError("Embedding matrix checksum mismatch, backup is corrupted")
+
+    payload = json.loads(blocks_json)
+    matrix = np.load(io.BytesIO(npy_bytes), allow_pickle=False)
+    blocks = payload["experience_blocks"]
+    if matrix.shape[0] != len(blocks):
+        raise BackupFormatError("Embedding matrix does not match block count")
+
+    return manifest, payload.get("personal_info"), blocks, matrix
+
+
+def vectors_compatible(manifest: Dict, model: str, dimensions: int) -> bool:
+    """Whether the backup's vectors live in the same space as the current embedding model"""
+    return (
+        manifest.get("embedding_model") == model
+        and manifest.get("embedding_dimensions") == dimensions
+        and manifest.get("embedding_checksum") == embedding_checksum(model, dimensions)
+    )
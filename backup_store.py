@@ -0,0 +1,146 @@
+"""
+Content-addressed backup store
+Each experience block is stored once under its content hash and each snapshot
+is a small manifest mapping titles to hashes, so a snapshot only has to fetch
+blocks the store hasn't seen and two snapshots diff without reading any bodies
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+SNAPSHOT_FORMAT = "vector-cv-snapshot"
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_PREFIX = "my_data.snapshot-"
+SNAPSHOT_SUFFIX = ".json"
+
+OBJECTS_DIR = "objects"
+
+
+def is_snapshot(filename: str) -> bool:
+    name = os.path.basename(filename)
+    return name.startswith(SNAPSHOT_PREFIX) and name.endswith(SNAPSHOT_SUFFIX)
+
+
+def object_hash(data: Dict) -> str:
+    """SHA-256 of canonical JSON, used for objects that have no server-side hash"""
+    canonical = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class BackupStore:
+    """Block objects under <root>/objects/<aa>/<hash>.json, snapshot manifests in <root>"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.objects_root = os.path.join(root, OBJECTS_DIR)
+        os.makedirs(self.objects_root, exist_ok=True)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_root, digest[:2], f"{digest}.json")
+
+    def has_object(self, digest: str) -> bool:
+        return os.path.exists(self._object_path(digest))
+
+    def missing(self, digests: Iterable[str]) -> List[str]:
+        """Hashes not yet in the store, in first-seen order"""
+        return [digest for digest in dict.fromkeys(digests) if not self.has_object(digest)]
+
+    def put_object(self, digest: str, data: Dict):
+        """Store an object once; rewriting an existing hash is a no-op"""
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so an interrupted backup never leaves a truncated object
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def get_object(self, digest: str) -> Dict:
+        with open(self._object_path(digest), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write_snapshot(self, personal_info: Optional[Dict], block_hashes: Dict[str, str]) -> str:
+        """Record a snapshot of objects already in the store and return its path"""
+        personal_info_hash = None
+        if personal_info is not None:
+            personal_info_hash = object_hash(personal_info)
+            self.put_object(personal_info_hash, personal_info)
+
+        absent = self.missing(block_hashes.values())
+        if absent:
+            raise ValueError(f"{len(absent)} block(s) are not in the store")
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "created_at": datetime.utcnow().isoformat(),
+            "personal_info": personal_info_hash,
+            "blocks": dict(sorted(block_hashes.items()))
+        }
+        # Microseconds keep snapshots taken in the same second apart, and "x"
+        # refuses to overwrite an existing manifest if two still collide
+        while True:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            path = os.path.join(self.root, f"{SNAPSHOT_PREFIX}{timestamp}{SNAPSHOT_SUFFIX}")
+            try:
+                with open(path, 'x', encoding='utf-8') as f:
+                    json.dump(manifest, f, indent=2, ensure_ascii=False)
+                return path
+            except FileExistsError:
+                continue
+
+    def read_snapshot(self, path: str) -> Dict:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Not a Vector CV snapshot: {os.path.basename(path)}")
+        return manifest
+
+    def materialize(self, path: str) -> Dict:
+        """Rebuild the full export layout (personal_info + experience_blocks) of a snapshot"""
+        manifest = self.read_snapshot(path)
+        personal_info = self.get_object(manifest["personal_info"]) if manifest["personal_info"] else {}
+        return {
+            "personal_info": personal_info,
+            "experience_blocks": [self.get_object(digest) for digest in manifest["blocks"].values()]
+        }
+
+    def diff(self, older_path: str, newer_path: str) -> Dict:
+        """Block-level diff of two snapshots, from the manifests alone"""
+        older = self.read_snapshot(older_path)
+        newer = self.read_snapshot(newer_path)
+        old_blocks, new_blocks = older["blocks"], newer["blocks"]
+        return {
+            "personal_info_changed": older["personal_info"] != newer["personal_info"],
+            "added": sorted(set(new_blocks) - set(old_blocks)),
+            "removed": sorted(set(old_blocks) - set(new_blocks)),
+            "modified": sorted(
+                title for title in set(old_blocks) & set(new_blocks)
+                if old_blocks[title] != new_blocks[title]
+            ),
+            "block_counts": (len(old_blocks), len(new_blocks))
+        }
+
+    def gc(self) -> int:
+        """Delete objects no snapshot references; returns how many were removed"""
+        referenced = set()
+        for name in os.listdir(self.root):
+            if is_snapshot(name):
+                manifest = self.read_snapshot(os.path.join(self.root, name))
+                referenced.update(manifest["blocks"].values())
+                if manifest["personal_info"]:
+                    referenced.add(manifest["personal_info"])
+
+        removed = 0
+        for prefix in os.listdir(self.objects_root):
+            prefix_dir = os.path.join(self.objects_root, prefix)
+            for name in os.listdir(prefix_dir):
+                if name.endswith(".json") and name[:-len(".json")] not in referenced:
+                    os.remove(os.path.join(prefix_dir, name))
+                    removed += 1
+        return removed
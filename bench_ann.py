@@ -0,0 +1,286 @@
+"""
+Recall/latency tuning for approximate vector indexes
+Builds exact top-k ground truth with brute-force NumPy, then runs the
+select_relevant_blocks vector query against HNSW (per ef_search) and IVFFlat
+(per probes) indexes in a throwaway database and recommends the cheapest
+setting that reaches the target recall
+
+    python bench_ann.py --blocks 20000 --queries 200 --k 3 --target-recall 0.95
+    python bench_ann.py --from-database postgresql://.../vector_cv_db   # real vectors
+
+Needs Postgres with pgvector and a role allowed to CREATE DATABASE.
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from bench_common import insert_blocks, save_results, summarize, synthetic_block, throwaway_database
+from bench_generation import synthetic_specs
+from embeddings import LocalEmbeddingBackend
+from models import Base, BlockType, EmbeddingStatus, ExperienceBlock
+
+HNSW_INDEX = "ix_bench_experience_blocks_embedding_hnsw"
+IVFFLAT_INDEX = "ix_bench_experience_blocks_embedding_ivfflat"
+SEED_BATCH_SIZE = 1000
+
+
+def create_schema(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    Base.metadata.create_all(engine)
+
+
+def seed_synthetic(engine, count: int, rng: random.Random, backend):
+    started = time.perf_counter()
+    for start in range(0, count, SEED_BATCH_SIZE):
+        batch = [synthetic_block(i, rng) for i in range(start, min(count, start + SEED_BATCH_SIZE))]
+        insert_blocks(engine, batch, backend)
+        print(f"   seeded {min(count, start + SEED_BATCH_SIZE):,}/{count:,}", end="\r", flush=True)
+    print(f"🌱 Seeded {count:,} blocks in {time.perf_counter() - started:.1f}s")
+
+
+def copy_vectors(source_url: str, engine, model: str) -> int:
+    """Copy READY supporting-project vectors of `model` from a real database"""
+    source = create_engine(source_url)
+    columns = ("id", "title", "company", "content", "metadata_tags", "block_type", "priority",
+               "embedding", "embedding_status", "embedding_attempts", "embedding_model", "content_hash",
+               "created_at", "updated_at")
+    table = ExperienceBlock.__table__
+    with source.connect() as conn:
+        rows = conn.execute(
+            table.select().with_only_columns(*[table.c[name] for name in columns]).where(
+                table.c.embedding_status == EmbeddingStatus.READY,
+                table.c.embedding_model == model
+            )
+        ).mappings().all()
+    source.dispose()
+    if rows:
+        with engine.begin() as conn:
+            conn.execute(table.insert(), [dict(row) for row in rows])
+    print(f"📥 Copied {len(rows):,} blocks embedded with {model}")
+    return len(rows)
+
+
+def load_candidates(engine, model: str):
+    """The rows select_relevant_blocks ranks: READY supporting projects of the active backend"""
+    with Session(engine) as db:
+        rows = db.query(ExperienceBlock.id, ExperienceBlock.embedding).filter(
+            ExperienceBlock.block_type == BlockType.SUPPORTING_PROJECT,
+            ExperienceBlock.embedding_status == EmbeddingStatus.READY,
+            ExperienceBlock.embedding_model == model
+        ).all()
+    ids = [row.id for row in rows]
+    matrix = np.asarray([np.asarray(row.embedding, dtype=np.float32) for row in rows], dtype=np.float32)
+    return ids, matrix
+
+
+def ground_truth(ids: List, matrix: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    """Exact top-k by cosine distance, the same order pgvector's <=> gives"""
+    norms = np.linalg.norm(matrix, axis=1)
+    normalized = matrix / np.where(norms == 0, 1, norms)[:, None]
+    q_norms = np.linalg.norm(queries, axis=1)
+    similarities = (queries / np.where(q_norms == 0, 1, q_norms)[:, None]) @ normalized.T
+    top = np.argpartition(-similarities, kth=min(k, len(ids) - 1), axis=1)[:, :k]
+    return [{ids[i] for i in row} for row in top]
+
+
+def run_queries(engine, model: str, queries: np.ndarray, k: int, settings: Sequence[str]):
+    """The select_relevant_blocks vector query per job vector; returns (ids per query, ms per query, plan)"""
+    results, latencies = [], []
+    with Session(engine) as db:
+        for statement in settings:
+            db.execute(text(statement))
+
+        def query(vector):
+            return db.query(ExperienceBlock.id).filter(
+                ExperienceBlock.block_type == BlockType.SUPPORTING_PROJECT,
+                ExperienceBlock.embedding_status == EmbeddingStatus.READY,
+                ExperienceBlock.embedding_model == model
+            ).order_by(ExperienceBlock.embedding.cosine_distance(vector)).limit(k)
+
+        plan = "\n".join(row[0] for row in db.execute(text(
+            "EXPLAIN SELECT id FROM experience_blocks WHERE block_type = :block_type "
+            "AND embedding_status = :status AND embedding_model = :model "
+            "ORDER BY embedding <=> CAST(:vector AS vector) LIMIT :k"
+        ), {
+            "block_type": BlockType.SUPPORTING_PROJECT.name, "status": EmbeddingStatus.READY.name,
+            "model": model, "vector": str(queries[0].tolist()), "k": k
+        }))
+
+        for vector in queries:
+            started = time.perf_counter()
+            rows = query(vector.tolist()).all()
+            latencies.append((time.perf_counter() - started) * 1000)
+            results.append({row.id for row in rows})
+        db.rollback()
+    return results, latencies, plan
+
+
+def recall(results: List[set], truth: List[set], k: int) -> float:
+    return float(np.mean([len(found & expected) / min(k, len(expected) or 1) for found, expected in zip(results, truth)]))
+
+
+def measure(name: str, param: Optional[int], engine, model, queries, truth, k, settings, index_name) -> Dict:
+    results, latencies, plan = run_queries(engine, model, queries, k, settings)
+    uses_index = index_name is None or index_name in plan
+    short = sum(1 for found in results if len(found) < k)
+    entry = {
+        "index": name,
+        "param": param,
+        "recall": round(recall(results, truth, k), 4),
+        "latency_ms": summarize(latencies),
+        "uses_index": uses_index,
+        # Filtered ANN scans can return fewer than k rows when the candidate
+        # list runs out before enough rows pass the WHERE clause
+        "short_results": short
+    }
+    label = f"{name}" + (f" {param}" if param is not None else "")
+    print(f"   {label:<22} recall@{k} {entry['recall']:.3f}  p50 {entry['latency_ms']['p50']:>7} ms  "
+          f"p95 {entry['latency_ms']['p95']:>7} ms" + ("" if uses_index else "  (index not used)")
+          + (f"  {short} short" if short else ""))
+    return entry
+
+
+def build_index(engine, sql: str) -> float:
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text(sql))
+        conn.execute(text("ANALYZE experience_blocks"))
+    return round(time.perf_counter() - started, 2)
+
+
+def recommend(results: List[Dict], exact: Dict, target: float) -> Dict:
+    """Per index type the smallest parameter reaching `target`; overall the one with the lowest p95"""
+    picks = {}
+    for name in ("hnsw", "ivfflat"):
+        passing = [r for r in results if r["index"] == name and r["uses_index"] and r["recall"] >= target]
+        if passing:
+            picks[name] = min(passing, key=lambda r: r["param"])
+    if not picks:
+        return {"choice": "exact", "reason": f"no index setting reached recall {target}"}
+    best = min(picks.values(), key=lambda r: r["latency_ms"]["p95"])
+    if best["latency_ms"]["p95"] >= exact["latency_ms"]["p95"]:
+        return {"choice": "exact", "reason": "the exact scan is as fast at this corpus size", "candidates": picks}
+    setting = "hnsw.ef_search" if best["index"] == "hnsw" else "ivfflat.probes"
+    return {
+        "choice": best["index"],
+        "setting": f"{setting} = {best['param']}",
+        "recall": best["recall"],
+        "p95_ms": best["latency_ms"]["p95"],
+        "exact_p95_ms": exact["latency_ms"]["p95"],
+        "candidates": picks
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=20000, help="Synthetic blocks to seed")
+    parser.add_argument("--from-database", help="Copy real vectors from this database instead of seeding")
+    parser.add_argument("--model", help="embedding_model to copy with --from-database (default: local backend)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3, help="select_relevant_blocks takes 3")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--ef-search", default="10,20,40,80,160,320")
+    parser.add_argument("--probes", default="1,2,4,8,16,32")
+    parser.add_argument("--hnsw-m", type=int, default=16)
+    parser.add_argument("--hnsw-ef-construction", type=int, default=64)
+    parser.add_argument("--ivfflat-lists", type=int, help="Default rows/1000, at least 10")
+    parser.add_argument("--force-index", action="store_true",
+                        help="Disable sequential scans so the planner uses the index even on small tables")
+    parser.add_argument("--database-url", help="Server to create the throwaway database on (default: DB_* settings)")
+    parser.add_argument("--keep-db", action="store_true")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if args.database_url:
+        base_url = args.database_url
+    else:
+        from database import get_database_url
+        base_url = get_database_url()
+
+    rng = random.Random(args.seed)
+    backend = LocalEmbeddingBackend()
+    model = args.model or backend.name
+    if args.from_database and args.model and args.model != backend.name:
+        raise SystemExit("❌ Query vectors come from the local backend; copy vectors with --model local:ngram-v1")
+
+    with throwaway_database(base_url, keep=args.keep_db) as db_url:
+        engine = create_engine(db_url)
+        create_schema(engine)
+        if args.from_database:
+            copy_vectors(args.from_database, engine, model)
+        else:
+            seed_synthetic(engine, args.blocks, rng, backend)
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE experience_blocks"))
+
+        ids, matrix = load_candidates(engine, model)
+        if len(ids) < args.k:
+            raise SystemExit(f"❌ Only {len(ids)} candidate blocks")
+        specs = synthetic_specs(args.queries, rng)
+        queries = np.asarray(backend.embed([spec["raw_spec"] for spec in specs]), dtype=np.float32)
+
+        started = time.perf_counter()
+        truth = ground_truth(ids, matrix, queries, args.k)
+        print(f"🎯 Ground truth for {len(queries)} queries over {len(ids):,} vectors in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        force = ["SET LOCAL enable_seqscan = off"] if args.force_index else []
+        print("\n📏 Exact scan (no ANN index)")
+        exact = measure("exact", None, engine, model, queries, truth, args.k, [], None)
+
+        results, build_seconds = [], {}
+        print(f"\n🏗️  HNSW (m={args.hnsw_m}, ef_construction={args.hnsw_ef_construction})")
+        build_seconds["hnsw"] = build_index(engine, (
+            f"CREATE INDEX {HNSW_INDEX} ON experience_blocks USING hnsw (embedding vector_cosine_ops) "
+            f"WITH (m = {args.hnsw_m}, ef_construction = {args.hnsw_ef_construction})"
+        ))
+        print(f"   built in {build_seconds['hnsw']}s")
+        for ef in (int(value) for value in args.ef_search.split(",")):
+            results.append(measure("hnsw", ef, engine, model, queries, truth, args.k,
+                                   force + [f"SET LOCAL hnsw.ef_search = {ef}"], HNSW_INDEX))
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP INDEX {HNSW_INDEX}"))
+
+        lists = args.ivfflat_lists or max(10, len(ids) // 1000)
+        print(f"\n🏗️  IVFFlat (lists={lists})")
+        build_seconds["ivfflat"] = build_index(engine, (
+            f"CREATE INDEX {IVFFLAT_INDEX} ON experience_blocks USING ivfflat (embedding vector_cosine_ops) "
+            f"WITH (lists = {lists})"
+        ))
+        print(f"   built in {build_seconds['ivfflat']}s")
+        for probes in (int(value) for value in args.probes.split(",")):
+            if probes > lists:
+                continue
+            results.append(measure("ivfflat", probes, engine, model, queries, truth, args.k,
+                                   force + [f"SET LOCAL ivfflat.probes = {probes}"], IVFFLAT_INDEX))
+        engine.dispose()
+
+    recommendation = recommend(results, exact, args.target_recall)
+    print(f"\n✅ Recommendation for recall@{args.k} ≥ {args.target_recall}: {recommendation['choice']}"
+          + (f" with {recommendation['setting']} (p95 {recommendation['p95_ms']} ms vs exact "
+             f"{recommendation['exact_p95_ms']} ms)" if "setting" in recommendation else f" ({recommendation['reason']})"))
+
+    save_results("ann", {
+        "config": {
+            "vectors": len(ids), "source": args.from_database and "database" or "synthetic", "model": model,
+            "queries": len(queries), "k": args.k, "target_recall": args.target_recall,
+            "hnsw": {"m": args.hnsw_m, "ef_construction": args.hnsw_ef_construction}, "ivfflat": {"lists": lists},
+            "force_index": args.force_index
+        },
+        "build_seconds": build_seconds,
+        "exact": exact,
+        "results": results,
+        "recommendation": recommendation
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Shared helpers for the database-backed benchmarks
+Throwaway pgvector databases, subprocess API and fake LLM servers, synthetic
+experience blocks, percentiles and JSON result files
+"""
+
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import httpx
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+from block_import import block_content_hash, embedding_text
+from models import BlockType, EmbeddingStatus, ExperienceBlock
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, "bench_results")
+
+# Tags grouped by ecosystem; a block draws most of its tags from one group,
+# like a real project does
+TAG_GROUPS = {
+    "php": ["PHP", "Laravel", "Livewire", "Filament", "Composer", "PHPUnit", "Pest", "Symfony"],
+    "python": ["Python", "FastAPI", "Django", "Flask", "Celery", "Pandas", "Pytest", "SQLAlchemy"],
+    "js": ["JavaScript", "TypeScript", "React", "Vue", "Next.js", "Node.js", "Tailwind CSS", "Vite"],
+    "data": ["PostgreSQL", "MySQL", "Redis", "pgvector", "PostGIS", "Elasticsearch", "Typesense", "MongoDB"],
+    "ops": ["Docker", "Kubernetes", "Nginx", "GitHub Actions", "Terraform", "AWS", "Linux", "CI/CD"],
+    "ai": ["OpenAI", "RAG", "Embeddings", "LangChain", "Vector Search", "Prompt Engineering", "NLP"],
+}
+ALL_TAGS = [tag for group in TAG_GROUPS.values() for tag in group]
+COMPANIES = ["Monate Media", "Acme Corp", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Tech"]
+PROJECT_NOUNS = ["Marketplace", "Dashboard", "Search Engine", "Booking System", "CRM", "API Gateway",
+                 "Analytics Pipeline", "Mobile Backend", "Payment Service", "Inventory Tracker"]
+VERBS = ["Engineered", "Implemented", "Integrated", "Optimised", "Migrated", "Automated", "Designed"]
+OUTCOMES = ["cutting p95 latency to sub-200ms", "serving 50k monthly users", "with 99.9% uptime",
+            "reducing hosting costs by 40%", "processing 2M records a day", "behind a zero-downtime deploy"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def throwaway_database(base_url: str, keep: bool = False) -> Iterator[str]:
+    """Create an empty database next to base_url's and drop it afterwards; yields its URL.
+
+    The role in base_url needs CREATEDB. The API server's startup (init_db)
+    creates the extensions, tables and indexes.
+    """
+    url = make_url(base_url)
+    name = f"{url.database}_bench_{uuid.uuid4().hex[:8]}"
+    admin = create_engine(url, isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f'CREATE DATABASE "{name}"'))
+    print(f"🧪 Created throwaway database {name}")
+    try:
+        yield url.set(database=name).render_as_string(hide_password=False)
+    finally:
+        if keep:
+            print(f"📌 Kept database {name}")
+        else:
+            with admin.connect() as conn:
+                conn.execute(text(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)'))
+            print(f"🧹 Dropped database {name}")
+        admin.dispose()
+
+
+class ServerProcess:
+    """A server subprocess, stopped on exit; output goes to a log file"""
+
+    def __init__(self, args: List[str], env: Dict[str, str], health_url: str, log_path: str,
+                 poll_seconds: float = 0.2):
+        self.args = args
+        self.env = {**os.environ, **env}
+        self.health_url = health_url
+        self.log_path = log_path
+        self.poll_seconds = poll_seconds
+        self.process = None
+        self.ready_seconds = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        self._log = open(self.log_path, "w")
+        self.process = subprocess.Popen(self.args, env=self.env, cwd=HERE, stdout=self._log, stderr=subprocess.STDOUT)
+        self.wait_ready()
+        return self
+
+    def wait_ready(self, timeout: float = 60):
+        """Poll the health URL until it answers; ready_seconds is the time since spawning"""
+        started = time.monotonic()
+        deadline = started + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.args[0]} exited with {self.process.returncode}, see {self.log_path}")
+            try:
+                if httpx.get(self.health_url, timeout=1).status_code < 500:
+                    self.ready_seconds = time.monotonic() - started
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(self.poll_seconds)
+        raise RuntimeError(f"Timed out waiting for {self.health_url}, see {self.log_path}")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self._log.close()
+
+
+def api_server(port: int, env: Dict[str, str], log_path: str, poll_seconds: float = 0.2) -> ServerProcess:
+    return ServerProcess(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env, f"http://127.0.0.1:{port}/", log_path, poll_seconds
+    )
+
+
+def fake_llm_server(port: int, env: Dict[str, str], log_path: str) -> ServerProcess:
+    return ServerProcess(
+        [sys.executable, "fake_openai_server.py", "--port", str(port)],
+        env, f"http://127.0.0.1:{port}/fake/config", log_path
+    )
+
+
+def synthetic_block(index: int, rng: random.Random, block_type: BlockType = BlockType.SUPPORTING_PROJECT) -> Dict:
+    """One realistic-looking block: tags mostly from one ecosystem, content that mentions them"""
+    group = TAG_GROUPS[rng.choice(list(TAG_GROUPS))]
+    tags = rng.sample(group, rng.randint(2, 5)) + rng.sample(ALL_TAGS, rng.randint(1, 3))
+    tags = list(dict.fromkeys(tags))
+    noun = rng.choice(PROJECT_NOUNS)
+    bullets = [
+        f"{rng.choice(VERBS)} a {noun.lower()} with **{tags[0]}** and **{tags[1]}**, {rng.choice(OUTCOMES)}.",
+        f"{rng.choice(VERBS)} {', '.join(tags[2:]) or tags[0]} integration {rng.choice(OUTCOMES)}.",
+        f"{rng.choice(VERBS)} observability and tests for the {noun.lower()}.",
+    ]
+    return {
+        "title": f"{tags[0]} {noun} #{index}",
+        "company": rng.choice(COMPANIES),
+        "content": "\n".join(f"* {bullet}" for bullet in bullets),
+        "tags": tags,
+        "block_type": block_type,
+        "priority": str(rng.randint(1, 5)),
+    }
+
+
+def insert_blocks(engine, blocks: List[Dict], backend) -> None:
+    """Insert blocks READY with vectors from `backend`, in one statement per call"""
+    vectors = backend.embed([
+        embedding_text(block["title"], block["company"], block["content"], block["tags"]) for block in blocks
+    ])
+    now = datetime.utcnow()
+    rows = []
+    for i, (block, vector) in enumerate(zip(blocks, vectors)):
+        rows.append({
+            "id": uuid.uuid4(),
+            "title": block["title"],
+            "company": block["company"],
+            "content": block["content"],
+            "metadata_tags": block["tags"],
+            "block_type": block["block_type"],
+            "priority": block["priority"],
+            "embedding": vector,
+            "embedding_status": EmbeddingStatus.READY,
+            "embedding_attempts": 0,
+            "embedding_model": backend.name,
+            "content_hash": block_content_hash(
+                block["title"], block["company"], block["content"], block["tags"],
+                block["block_type"].value, block["priority"]
+            ),
+            # Distinct timestamps keep created_at ordering deterministic
+            "created_at": now - timedelta(microseconds=i),
+            "updated_at": now,
+        })
+    with engine.begin() as conn:
+        conn.execute(ExperienceBlock.__table__.insert(), rows)
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(values_ms: List[float]) -> Dict:
+    values = sorted(values_ms)
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 2) if values else None,
+        "p50": _round(percentile(values, 50)),
+        "p95": _round(percentile(values, 95)),
+        "p99": _round(percentile(values, 99)),
+        "max": _round(values[-1] if values else None),
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
+def environment_info() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save_results(name: str, payload: Dict, output: Optional[str] = None) -> str:
+    path = output or os.path.join(RESULTS_DIR, f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"benchmark": name, "environment": environment_info(), **payload}, f, indent=2)
+    print(f"💾 Results saved to {path}")
+    return path
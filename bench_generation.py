@@ -0,0 +1,322 @@
+"""
+End-to-end benchmark of POST /api/applications
+Seeds synthetic profiles of growing size (local embeddings) into a throwaway
+pgvector database, runs the API and the fake LLM server as subprocesses,
+replays job specs at several concurrency levels and reports p50/p95/p99 per
+pipeline stage (from the request traces) and throughput
+
+    python bench_generation.py --sizes 10,1000,10000 --concurrency 1,4,16 --requests 32
+    python bench_generation.py --compare bench_results/generation-A.json bench_results/generation-B.json
+
+With --cassette the API records its LLM calls to (or replays them from) an
+llm_cassette directory: record once against a real provider with --live-llm,
+then replay the same --seed/--sizes/--specs run offline
+
+Needs a Postgres server with pgvector reachable through the usual DB_* /
+DATABASE_URL settings and a role allowed to CREATE DATABASE.
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import httpx
+from sqlalchemy import create_engine, func, select
+
+from bench_common import (
+    RESULTS_DIR, TAG_GROUPS, ALL_TAGS, COMPANIES, api_server, fake_llm_server, free_port,
+    insert_blocks, save_results, summarize, synthetic_block, throwaway_database
+)
+from embeddings import LocalEmbeddingBackend
+from models import BlockType, ExperienceBlock
+
+ADMIN_KEY = "bench-admin-key"
+SEED_BATCH_SIZE = 1000
+# Spans reported per stage; SQL statements are summed per request into "sql"
+STAGES = (
+    "retrieval", "retrieval.job_embedding", "retrieval.skill_extraction", "retrieval.skill_match",
+    "retrieval.vector_search", "generation.skills_gap", "generation.cv", "generation.cover_letter",
+    "render.cv_docx", "render.cover_letter_docx", "persist"
+)
+ROLES = ["Full Stack Developer", "Backend Engineer", "Platform Engineer", "Data Engineer", "ML Engineer"]
+
+
+def synthetic_specs(count: int, rng: random.Random) -> List[Dict]:
+    """Job specs of varied length: a required stack, nice-to-haves and filler"""
+    specs = []
+    for i in range(count):
+        group = TAG_GROUPS[rng.choice(list(TAG_GROUPS))]
+        required = rng.sample(group, rng.randint(3, 6))
+        bonus = rng.sample(ALL_TAGS, rng.randint(2, 4))
+        role = rng.choice(ROLES)
+        paragraphs = [
+            f"We are hiring a {role} to join our product team.",
+            "Requirements:\n" + "\n".join(f"- Solid experience with {tag}" for tag in required),
+            "Bonus:\n" + "\n".join(f"- {tag}" for tag in bonus),
+        ]
+        # Real specs range from a paragraph to several pages
+        paragraphs += ["You will own features end to end, from design to production monitoring."] * rng.randint(0, 40)
+        specs.append({
+            "company_name": rng.choice(COMPANIES),
+            "job_title": role,
+            "raw_spec": "\n\n".join(paragraphs),
+            "job_url": f"https://jobs.example.com/{i}"
+        })
+    return specs
+
+
+def load_specs(path: str) -> List[Dict]:
+    """JSON lines with company_name, job_title and raw_spec"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def seed_profile(api_url: str):
+    response = httpx.post(f"{api_url}/api/personal-info", headers={"Authorization": f"Bearer {ADMIN_KEY}"}, json={
+        "name": "Bench Candidate", "email": "bench@example.com", "location": "Johannesburg",
+        "summary": "Synthetic profile for benchmarking."
+    }, timeout=30)
+    response.raise_for_status()
+
+
+def seed_blocks_to(engine, target: int, rng: random.Random, backend) -> int:
+    """Top the corpus up to `target` blocks; the first few carry the fixed block types"""
+    with engine.connect() as conn:
+        existing = conn.execute(select(func.count()).select_from(ExperienceBlock.__table__)).scalar_one()
+    fixed_types = [BlockType.PILLAR_PROJECT] * 2 + [BlockType.SKILLS_SUMMARY, BlockType.EMPLOYMENT, BlockType.EDUCATION]
+
+    started = time.perf_counter()
+    index = existing
+    while index < target:
+        batch = []
+        for i in range(index, min(target, index + SEED_BATCH_SIZE)):
+            block_type = fixed_types[i] if i < len(fixed_types) else BlockType.SUPPORTING_PROJECT
+            batch.append(synthetic_block(i, rng, block_type))
+        insert_blocks(engine, batch, backend)
+        index += len(batch)
+        print(f"   seeded {index:,}/{target:,}", end="\r", flush=True)
+    if target > existing:
+        print(f"🌱 Seeded {target - existing:,} blocks in {time.perf_counter() - started:.1f}s (total {target:,})")
+    return target
+
+
+def read_new_traces(path: str, offset: int) -> Tuple[List[Dict], int]:
+    if not os.path.exists(path):
+        return [], offset
+    with open(path, encoding="utf-8") as f:
+        f.seek(offset)
+        lines = f.readlines()
+        return [json.loads(line) for line in lines if line.strip()], f.tell()
+
+
+def stage_durations(traces: List[Dict]) -> Dict[str, List[float]]:
+    """Milliseconds per stage (and SQL total) for every traced POST /api/applications"""
+    durations = defaultdict(list)
+    for trace in traces:
+        spans = trace["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        root = next((s for s in spans if s["name"] == "POST /api/applications"), None)
+        if root is None:
+            continue
+
+        def ms(span):
+            return (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+
+        durations["total (server)"].append(ms(root))
+        for span in spans:
+            if span["name"] in STAGES:
+                durations[span["name"]].append(ms(span))
+        durations["sql"].append(sum(
+            ms(span) for span in spans
+            if any(attr["key"] == "db.system" for attr in span.get("attributes", []))
+        ))
+    return durations
+
+
+def run_level(api_url: str, specs: List[Dict], requests: int, concurrency: int) -> Dict:
+    latencies, errors = [], defaultdict(int)
+
+    def one(spec):
+        started = time.perf_counter()
+        try:
+            response = client.post(f"{api_url}/api/applications", json=spec)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        elapsed = (time.perf_counter() - started) * 1000
+        return status, elapsed
+
+    with httpx.Client(timeout=600, limits=httpx.Limits(max_connections=concurrency)) as client:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, (specs[i % len(specs)] for i in range(requests))))
+        wall = time.perf_counter() - started
+
+    for status, elapsed in results:
+        if status == 200:
+            latencies.append(elapsed)
+        else:
+            errors[str(status)] += 1
+    return {
+        "requests": requests,
+        "ok": len(latencies),
+        "errors": dict(errors),
+        "wall_seconds": round(wall, 2),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else None,
+        "latency_ms": summarize(latencies)
+    }
+
+
+def print_level(blocks: int, concurrency: int, result: Dict):
+    latency = result["latency_ms"]
+    print(f"\n📊 {blocks:,} blocks, concurrency {concurrency}: {result['ok']}/{result['requests']} ok, "
+          f"{result['throughput_rps']} req/s, p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms")
+    for stage, stats in result["stages_ms"].items():
+        print(f"   {stage:<28} p50 {stats['p50']:>9} ms  p95 {stats['p95']:>9} ms  p99 {stats['p99']:>9} ms")
+    if result["errors"]:
+        print(f"   ⚠️  errors: {result['errors']}")
+
+
+def compare(old_path: str, new_path: str):
+    """p50/p95 of client latency and throughput, new vs old, per (blocks, concurrency)"""
+    def index(path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return {(run["blocks"], run["concurrency"]): run for run in data["runs"]}
+
+    old, new = index(old_path), index(new_path)
+    print(f"{'blocks':>8} {'conc':>5} {'p50 ms':>20} {'p95 ms':>20} {'req/s':>16}")
+    for key in sorted(set(old) & set(new)):
+        a, b = old[key], new[key]
+
+        def delta(x, y):
+            return f"{x} → {y}" if x is None or y is None else f"{x:.0f} → {y:.0f} ({(y - x) / x * 100:+.0f}%)"
+
+        print(f"{key[0]:>8,} {key[1]:>5} {delta(a['latency_ms']['p50'], b['latency_ms']['p50']):>20} "
+              f"{delta(a['latency_ms']['p95'], b['latency_ms']['p95']):>20} "
+              f"{a['throughput_rps']} → {b['throughput_rps']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,1000,10000,100000", help="Corpus sizes in blocks, ascending")
+    parser.add_argument("--concurrency", default="1,4,16", help="Concurrent clients per run")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per (size, concurrency) run")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed requests before each size")
+    parser.add_argument("--specs", help="JSON lines file of job specs to replay instead of synthetic ones")
+    parser.add_argument("--llm-latency-ms", type=float, default=800, help="Fake LLM base latency per call")
+    parser.add_argument("--llm-jitter-ms", type=float, default=400)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=0, help="Simulated generation speed, 0 = off")
+    parser.add_argument("--llm-max-concurrency", type=int, default=8, help="API's LLM_MAX_CONCURRENCY")
+    parser.add_argument("--cassette", help="LLM cassette directory to record to or replay from")
+    parser.add_argument("--cassette-mode", choices=("record", "replay"), default="replay")
+    parser.add_argument("--cassette-latency-scale", type=float, default=1.0,
+                        help="Replay sleeps the recorded latency times this, 0 = instant")
+    parser.add_argument("--live-llm", action="store_true",
+                        help="Call the provider in OPENAI_BASE_URL/OPENAI_API_KEY instead of the fake server")
+    parser.add_argument("--database-url", help="Server to create the throwaway database on (default: DB_* settings)")
+    parser.add_argument("--keep-db", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Result file (default bench_results/generation-<timestamp>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    levels = [int(level) for level in args.concurrency.split(",")]
+    rng = random.Random(args.seed)
+    specs = load_specs(args.specs) if args.specs else synthetic_specs(200, rng)
+
+    if args.database_url:
+        base_url = args.database_url
+    else:
+        from database import get_database_url
+        base_url = get_database_url()
+
+    run_dir = os.path.join(RESULTS_DIR, f"run-{os.getpid()}")
+    trace_file = os.path.join(run_dir, "traces.jsonl")
+    llm_port, api_port = free_port(), free_port()
+    api_url = f"http://127.0.0.1:{api_port}"
+    backend = LocalEmbeddingBackend()
+    runs = []
+
+    with throwaway_database(base_url, keep=args.keep_db) as db_url:
+        llm_env = {
+            "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+            "FAKE_LLM_JITTER_MS": str(args.llm_jitter_ms),
+            "FAKE_LLM_TOKENS_PER_SECOND": str(args.llm_tokens_per_second),
+        }
+        api_env = {
+            "DATABASE_URL": db_url,
+            "EMBEDDING_BACKEND": "local",
+            "ADMIN_API_KEY": ADMIN_KEY,
+            "ENABLE_RATE_LIMITING": "false",
+            "LLM_MAX_CONCURRENCY": str(args.llm_max_concurrency),
+            "TRACE_EXPORTER": "file",
+            "TRACE_FILE": trace_file,
+        }
+        replaying = args.cassette and args.cassette_mode == "replay"
+        if args.cassette:
+            api_env.update({
+                "LLM_CASSETTE_MODE": args.cassette_mode,
+                "LLM_CASSETTE_DIR": os.path.abspath(args.cassette),
+                "LLM_CASSETTE_LATENCY_SCALE": str(args.cassette_latency_scale),
+            })
+        if not args.live_llm and not replaying:
+            api_env.update({"OPENAI_BASE_URL": f"http://127.0.0.1:{llm_port}/v1", "OPENAI_API_KEY": "fake"})
+            upstream = fake_llm_server(llm_port, llm_env, os.path.join(run_dir, "fake_llm.log"))
+        else:
+            upstream = nullcontext()
+        with upstream, \
+                api_server(api_port, api_env, os.path.join(run_dir, "api.log")):
+            engine = create_engine(db_url)
+            seed_profile(api_url)
+            trace_offset = 0
+
+            for size in sizes:
+                seed_blocks_to(engine, size, rng, backend)
+                with httpx.Client(timeout=600) as client:
+                    for spec in specs[:args.warmup]:
+                        client.post(f"{api_url}/api/applications", json=spec)
+                time.sleep(0.5)
+                _, trace_offset = read_new_traces(trace_file, trace_offset)
+
+                for concurrency in levels:
+                    result = run_level(api_url, specs, args.requests, concurrency)
+                    # Traces are written after the response is sent
+                    time.sleep(0.5)
+                    traces, trace_offset = read_new_traces(trace_file, trace_offset)
+                    result["stages_ms"] = {
+                        stage: summarize(values) for stage, values in stage_durations(traces).items()
+                    }
+                    result.update(blocks=size, concurrency=concurrency)
+                    runs.append(result)
+                    print_level(size, concurrency, result)
+            engine.dispose()
+
+    save_results("generation", {
+        "config": {
+            "sizes": sizes, "concurrency": levels, "requests": args.requests,
+            "specs": args.specs or "synthetic", "llm_latency_ms": args.llm_latency_ms,
+            "llm_jitter_ms": args.llm_jitter_ms, "llm_tokens_per_second": args.llm_tokens_per_second,
+            "llm_max_concurrency": args.llm_max_concurrency,
+            "llm": "cassette replay" if replaying else "live" if args.live_llm else "fake",
+            "cassette": args.cassette and {
+                "dir": args.cassette, "mode": args.cassette_mode, "latency_scale": args.cassette_latency_scale
+            },
+            "embedding_backend": backend.name, "seed": args.seed
+        },
+        "runs": runs
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Micro-benchmark: response_model serialization vs the orjson row fast path
+Runs on synthetic rows, no database or API needed
+
+    python bench_serialization.py --rows 500 --repeat 200
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from models import ExperienceBlock, BlockType, EmbeddingStatus
+from main import ExperienceBlockResponse, BLOCK_READ_COLUMNS
+
+BlockRow = namedtuple("BlockRow", [column.key for column in BLOCK_READ_COLUMNS])
+
+
+def make_blocks(count: int):
+    """The same synthetic data as ORM objects (old path) and row tuples (fast path)"""
+    now = datetime.utcnow()
+    orm_blocks, rows = [], []
+    for i in range(count):
+        values = {
+            "id": uuid.uuid4(),
+            "title": f"Project {i}",
+            "company": f"Company {i % 17}",
+            "content": "Built and operated a service handling job specs and CV generation. " * 6,
+            "metadata_tags": ["Python", "FastAPI", "PostgreSQL", "pgvector", "Docker", f"tag{i}"],
+            "block_type": BlockType.SUPPORTING_PROJECT,
+            "priority": str(i % 5 + 1),
+            "embedding_status": EmbeddingStatus.READY,
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": now - timedelta(minutes=i)
+        }
+        orm_blocks.append(ExperienceBlock(**values))
+        rows.append(BlockRow(**values))
+    return orm_blocks, rows
+
+
+# One loop for every run so loop setup isn't billed to the response_model path
+_loop = asyncio.new_event_loop()
+
+
+def response_model_path(field, orm_blocks) -> bytes:
+    """What FastAPI does for a route that returns ORM objects with response_model=List[...]"""
+    content = _loop.run_until_complete(
+        serialize_response(field=field, response_content=orm_blocks, is_coroutine=False)
+    )
+    return JSONResponse(content).body
+
+
+def fast_path(rows) -> bytes:
+    """What list_experience_blocks does now: row tuples to dicts to orjson"""
+    return ORJSONResponse([{**row._asdict(), "snippet": None} for row in rows]).body
+
+
+def timed(fn, repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    orm_blocks, rows = make_blocks(args.rows)
+    field = create_response_field(name="bench", type_=List[ExperienceBlockResponse])
+
+    if json.loads(response_model_path(field, orm_blocks)) != json.loads(fast_path(rows)):
+        raise SystemExit("❌ Paths produce different JSON")
+
+    print(f"Serializing {args.rows} experience blocks, {args.repeat} runs each\n")
+    results = {
+        "response_model": timed(lambda: response_model_path(field, orm_blocks), args.repeat),
+        "orjson rows": timed(lambda: fast_path(rows), args.repeat)
+    }
+    for name, samples in results.items():
+        samples.sort()
+        print(
+            f"{name:>15}: median {statistics.median(samples):7.2f} ms  "
+            f"p95 {samples[int(len(samples) * 0.95) - 1]:7.2f} ms  "
+            f"({args.rows / (statistics.median(samples) / 1000):,.0f} rows/s)"
+        )
+    speedup = statistics.median(results["response_model"]) / statistics.median(results["orjson rows"])
+    print(f"\n⚡ Fast path is {speedup:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Cold start-to-ready time of the API worker
+Starts uvicorn against a throwaway database several times: the first start
+sets the schema up, later ones only check schema_version. Reports the time
+from spawn to the first answered request, the worker's own import / schema /
+warm-up breakdown, and optionally the slowest imports of main
+
+    python bench_startup.py --runs 5
+    python bench_startup.py --imports 20
+
+Needs Postgres with pgvector and a role allowed to CREATE DATABASE.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from bench_common import HERE, RESULTS_DIR, api_server, free_port, save_results, summarize, throwaway_database
+
+READY_LINE = re.compile(r"Ready: imports (\d+) ms, schema check (\d+) ms, startup (\d+) ms")
+WARMUP_LINE = re.compile(r"Warm-up done in (\d+) ms")
+
+
+def slowest_imports(limit: int) -> List[Dict]:
+    """Top-level packages by cumulative import time when importing main, from python -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=HERE, capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    )
+    totals: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( +)(\S+)", line)
+        # Two spaces of indent: imported directly by the -c statement or main
+        if match and len(match.group(2)) <= 3:
+            package = match.group(3).split(".")[0]
+            totals[package] = totals.get(package, 0) + int(match.group(1))
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [{"module": name, "ms": round(us / 1000, 1)} for name, us in ranked]
+
+
+def wait_for_line(path: str, pattern, timeout: float) -> Optional[re.Match]:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            match = pattern.search(f.read())
+        if match:
+            return match
+        time.sleep(0.05)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Worker starts; the first one sets the schema up")
+    parser.add_argument("--no-warmup", action="store_true", help="Start with STARTUP_WARMUP=false")
+    parser.add_argument("--imports", type=int, default=0, metavar="N", help="Also list the N slowest imports of main")
+    parser.add_argument("--database-url", help="Server to create the throwaway database on (default: DB_* settings)")
+    parser.add_argument("--keep-db", action="store_true")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if args.database_url:
+        base_url = args.database_url
+    else:
+        from database import get_database_url
+        base_url = get_database_url()
+
+    imports = []
+    if args.imports:
+        imports = slowest_imports(args.imports)
+        print("📦 Slowest imports of main (cumulative)")
+        for row in imports:
+            print(f"   {row['module']:<24} {row['ms']:>8.1f} ms")
+
+    run_dir = os.path.join(RESULTS_DIR, f"run-{os.getpid()}")
+    runs = []
+    with throwaway_database(base_url, keep=args.keep_db) as db_url:
+        env = {
+            "DATABASE_URL": db_url,
+            "EMBEDDING_BACKEND": "local",
+            "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY") or "fake",
+            "STARTUP_WARMUP": "false" if args.no_warmup else "true",
+            "PYTHONUNBUFFERED": "1",
+        }
+        for run in range(args.runs):
+            log_path = os.path.join(run_dir, f"startup-{run}.log")
+            server = api_server(free_port(), env, log_path, poll_seconds=0.01)
+            with server:
+                ready = wait_for_line(log_path, READY_LINE, 10)
+                warmup = None if args.no_warmup else wait_for_line(log_path, WARMUP_LINE, 60)
+            entry = {
+                "run": run,
+                "schema": "setup" if run == 0 else "check",
+                "ready_ms": round(server.ready_seconds * 1000, 1),
+                "import_ms": int(ready.group(1)) if ready else None,
+                "schema_ms": int(ready.group(2)) if ready else None,
+                "startup_ms": int(ready.group(3)) if ready else None,
+                "warmup_ms": int(warmup.group(1)) if warmup else None,
+            }
+            runs.append(entry)
+            print(f"🚀 Run {run} ({entry['schema']}): ready in {entry['ready_ms']} ms "
+                  f"(imports {entry['import_ms']} ms, schema {entry['schema_ms']} ms, "
+                  f"startup {entry['startup_ms']} ms; warm-up {entry['warmup_ms']} ms in background)")
+
+    warm = [entry["ready_ms"] for entry in runs[1:]]
+    if warm:
+        print(f"\n✅ Restart ready p50 {summarize(warm)['p50']} ms, first start {runs[0]['ready_ms']} ms")
+    save_results("startup", {
+        "config": {"runs": args.runs, "warmup": not args.no_warmup},
+        "runs": runs,
+        "restart_ready_ms": summarize(warm),
+        "imports": imports
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Set-based import of experience blocks
+Diffs incoming blocks against the database in a single query and writes only
+new or changed blocks with INSERT ... ON CONFLICT (title); blocks whose embedded
+text changed are left to the background embedding worker
+"""
+
+import hashlib
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import List, Dict, Optional
+
+from sqlalchemy import and_, case, cast, text
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from sqlalchemy.orm import Session
+
+from models import ExperienceBlock, BlockType, EmbeddingStatus
+
+# Rows per INSERT ... ON CONFLICT statement
+UPSERT_BATCH_SIZE = 500
+
+# Columns overwritten when an incoming block's title already exists
+UPSERT_UPDATE_COLUMNS = [
+    "company", "content", "metadata_tags", "block_type", "priority", "content_hash", "updated_at"
+]
+# Overwritten only when the embedded text changed (see _keeps_embedding)
+UPSERT_EMBEDDING_COLUMNS = [
+    "embedding", "embedding_status", "embedding_attempts", "embedding_model",
+    # Releasing the claim keeps an in-flight worker batch from writing a stale vector
+    "embedding_claimed_by", "embedding_claimed_at"
+]
+
+
+def embedding_text(title: str, company: Optional[str], content: str, tags: List[str]) -> str:
+    """Text that represents a block in vector space"""
+    return f"{title} at {company or ''}: {content} Keywords: {', '.join(tags or [])}"
+
+
+def block_content_hash(
+    title: str,
+    company: Optional[str],
+    content: str,
+    tags: List[str],
+    block_type: str,
+    priority: str
+) -> str:
+    """Stable SHA-256 over every exported field of a block"""
+    canonical = json.dumps(
+        [title, company or None, content, list(tags or []), block_type, priority],
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def hash_block(block: ExperienceBlock) -> str:
+    """content_hash for an ORM block"""
+    block_type = block.block_type.value if block.block_type else BlockType.SUPPORTING_PROJECT.value
+    return block_content_hash(
+        block.title, block.company, block.content,
+        block.metadata_tags or [], block_type, block.priority or "3"
+    )
+
+
+def _normalize(block_data: Dict) -> Dict:
+    """Map an export-format block dict onto table columns"""
+    block_type = block_data.get("block_type") or BlockType.SUPPORTING_PROJECT.value
+    priority = block_data.get("priority") or "3"
+    tags = block_data.get("tags", [])
+    return {
+        "title": block_data["title"],
+        "company": block_data.get("company"),
+        "content": block_data["content"],
+        "metadata_tags": tags,
+        "block_type": BlockType(block_type),
+        "priority": priority,
+        "content_hash": block_content_hash(
+            block_data["title"], block_data.get("company"), block_data["content"],
+            tags, block_type, priority
+        )
+    }
+
+
+def _keeps_embedding(table, excluded):
+    """ON CONFLICT condition: the stored vector still represents the incoming block.
+
+    True when every field of embedding_text is unchanged (the title is the
+    conflict key), the block has not failed and no trusted vector comes with
+    it. A change to priority or block_type alone keeps the embedding, like
+    update_experience_block does.
+    """
+    return and_(
+        table.c.company.is_not_distinct_from(excluded.company),
+        table.c.content == excluded.content,
+        # json has no equality operator; jsonb compares the arrays
+        cast(table.c.metadata_tags, JSONB).is_not_distinct_from(cast(excluded.metadata_tags, JSONB)),
+        table.c.embedding_status != EmbeddingStatus.FAILED,
+        excluded.embedding.is_(None)
+    )
+
+
+def import_experience_blocks(db: Session, blocks: List[Dict]) -> Dict:
+    """Upsert export-format blocks by title and report counts and per-phase timings.
+
+    A block may carry a trusted "embedding" vector plus the "embedding_model"
+    that produced it (e.g. from a binary backup in the active backend's vector
+    space); it is written as READY. Every other new block, or changed block
+    whose embedded text changed, is written PENDING for embedding_worker, so
+    call embedding_worker.notify() once the caller has committed.
+    """
+    timings = {}
+
+    # Later duplicates of a title win, matching the old row-by-row behaviour
+    incoming = {}
+    precomputed = {}
+    for block_data in blocks:
+        row = _normalize(block_data)
+        incoming[row["title"]] = row
+        # A vector without the backend that produced it can't be trusted
+        if block_data.get("embedding") is not None and block_data.get("embedding_model"):
+            precomputed[row["title"]] = (block_data["embedding"], block_data["embedding_model"])
+
+    # 1. Diff: one query for the hashes of every incoming title
+    started = time.perf_counter()
+    existing = {}
+    if incoming:
+        existing = {
+            row.title: row
+            for row in db.query(
+                ExperienceBlock.title,
+                ExperienceBlock.content_hash,
+                ExperienceBlock.embedding_status
+            ).filter(ExperienceBlock.title.in_(list(incoming)))
+        }
+
+    to_insert, to_update, unchanged = [], [], 0
+    for title, row in incoming.items():
+        current = existing.get(title)
+        if current is None:
+            to_insert.append(row)
+        elif (
+            current.content_hash != row["content_hash"]
+            # Re-importing a block whose embedding failed queues it again
+            or current.embedding_status == EmbeddingStatus.FAILED
+            or (current.embedding_status != EmbeddingStatus.READY and title in precomputed)
+        ):
+            to_update.append(row)
+        else:
+            unchanged += 1
+    timings["diff_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    # 2. Write with INSERT ... ON CONFLICT (title) DO UPDATE
+    started = time.perf_counter()
+    pending = to_insert + to_update
+    now = datetime.utcnow()
+    values = []
+    for row in pending:
+        vector, model = precomputed.get(row["title"], (None, None))
+        values.append({
+            **row,
+            "id": uuid.uuid4(),
+            "embedding": vector,
+            "embedding_model": model,
+            "embedding_status": EmbeddingStatus.READY if vector is not None else EmbeddingStatus.PENDING,
+            "embedding_attempts": 0,
+            "embedding_claimed_by": None,
+            "embedding_claimed_at": None,
+            "created_at": now,
+            "updated_at": now
+        })
+    reused = sum(1 for value in values if value["embedding"] is not None)
+    queued = 0
+    table = ExperienceBlock.__table__
+    for start in range(0, len(values), UPSERT_BATCH_SIZE):
+        stmt = pg_insert(table).values(values[start:start + UPSERT_BATCH_SIZE])
+        keep = _keeps_embedding(table, stmt.excluded)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.title],
+            set_={
+                **{column: stmt.excluded[column] for column in UPSERT_UPDATE_COLUMNS},
+                **{column: case((keep, table.c[column]), else_=stmt.excluded[column])
+                   for column in UPSERT_EMBEDDING_COLUMNS}
+            }
+        ).returning(table.c.embedding_status)
+        queued += sum(1 for (status,) in db.execute(stmt) if status == EmbeddingStatus.PENDING)
+    timings["write_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    return {
+        "inserted": len(to_insert),
+        "updated": len(to_update),
+        "unchanged": unchanged,
+        "queued_for_embedding": queued,
+        "reused_embeddings": reused,
+        "timings_ms": timings
+    }
+
+
+def backfill_content_hashes(conn):
+    """Schema migration step: fill content_hash for rows written before the column existed"""
+    rows = conn.execute(text(
+        "SELECT id, title, company, content, metadata_tags, block_type, priority "
+        "FROM experience_blocks WHERE content_hash IS NULL"
+    )).fetchall()
+    for row in rows:
+        # block_type is stored by enum name
+        block_type = BlockType[row.block_type].value if row.block_type else BlockType.SUPPORTING_PROJECT.value
+        conn.execute(
+            text("UPDATE experience_blocks SET content_hash = :hash WHERE id = :id"),
+            {
+                "id": row.id,
+                "hash": block_content_hash(
+                    row.title, row.company, row.content,
+                    row.metadata_tags or [], block_type, row.priority or "3"
+                )
+            }
+        )
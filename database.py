@@ -1,8 +1,16 @@
+import hashlib
+import logging
 import os
+import time
 from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateIndex, CreateTable
 from dotenv import load_dotenv
-from models import Base
+from models import Base, SchemaVersion, EXPERIENCE_BLOCK_SEARCH_VECTOR_SQL
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env
 load_dotenv()
@@ -42,20 +50,223 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def init_db():
-    """Initialize database with pgvector extension and create tables"""
+def _backfill_block_content_hashes(conn):
+    # Imported lazily: block_import pulls in llm_service, which this module doesn't otherwise need
+    from block_import import backfill_content_hashes
+    backfill_content_hashes(conn)
+
+# Tables whose writes bump their row in table_versions
+VERSIONED_TABLES = ("personal_info", "style_guidelines", "experience_blocks", "job_applications")
+# Columns only the embedding worker's bookkeeping writes; changing them alone
+# is not an edit and must not invalidate caches or ETags
+UNVERSIONED_COLUMNS = ("embedding_claimed_by", "embedding_claimed_at")
+
+# One statement trigger per event, with the statement's transition tables:
+# the version is bumped only when rows were inserted or deleted, or an update
+# changed something besides UNVERSIONED_COLUMNS. A statement that matches no
+# rows (an idle worker poll) leaves it alone.
+_unversioned = " ".join(f"- '{column}'" for column in UNVERSIONED_COLUMNS)
+TABLE_VERSION_TRIGGERS = [
+    f"""
+    CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM 1 FROM new_rows LIMIT 1;
+        ELSIF TG_OP = 'DELETE' THEN
+            PERFORM 1 FROM old_rows LIMIT 1;
+        ELSE
+            -- A full join so an update of the primary key still counts
+            PERFORM 1 FROM new_rows FULL JOIN old_rows ON old_rows.id = new_rows.id
+            WHERE to_jsonb(new_rows) {_unversioned} IS DISTINCT FROM to_jsonb(old_rows) {_unversioned}
+            LIMIT 1;
+        END IF;
+        IF NOT FOUND THEN
+            RETURN NULL;
+        END IF;
+        INSERT INTO table_versions (table_name, version, updated_at)
+        VALUES (TG_TABLE_NAME, 1, timezone('utc', now()))
+        ON CONFLICT (table_name) DO UPDATE
+        SET version = table_versions.version + 1, updated_at = EXCLUDED.updated_at;
+        RETURN NULL;
+    END
+    $$
+    """,
+    *[f"DROP TRIGGER IF EXISTS {table}_bump_version ON {table}" for table in VERSIONED_TABLES],
+    *[
+        f"CREATE OR REPLACE TRIGGER {table}_bump_version_{event.lower()} "
+        f"AFTER {event} ON {table} REFERENCING {transitions} "
+        "FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()"
+        for table in VERSIONED_TABLES
+        for event, transitions in (
+            ("INSERT", "NEW TABLE AS new_rows"),
+            ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+            ("DELETE", "OLD TABLE AS old_rows"),
+        )
+    ],
+]
+
+# create_all() only creates missing tables, so columns and indexes added to
+# existing tables are applied here. Every step must be idempotent; a step is
+# either a SQL string or a callable taking the migration connection.
+SCHEMA_MIGRATIONS = [
+    ("job_applications keyset pagination indexes", [
+        "CREATE INDEX IF NOT EXISTS ix_job_applications_created_at_id ON job_applications (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_job_applications_status_created_at_id ON job_applications (status, created_at, id)",
+    ]),
+    ("experience_blocks full-text and trigram search", [
+        "ALTER TABLE experience_blocks ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({EXPERIENCE_BLOCK_SEARCH_VECTOR_SQL}) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_experience_blocks_search_vector ON experience_blocks USING gin (search_vector)",
+        "CREATE INDEX IF NOT EXISTS ix_experience_blocks_title_trgm ON experience_blocks USING gin (title gin_trgm_ops)",
+    ]),
+    ("experience_blocks unique titles and content hashes", [
+        # Titles are the import key. Older rows may share one; keep the most
+        # recently updated title as-is and suffix the others with their id.
+        """
+        UPDATE experience_blocks AS b
+        SET title = left(b.title, 188) || ' (' || left(b.id::text, 8) || ')'
+        FROM (
+            SELECT id, row_number() OVER (
+                PARTITION BY title ORDER BY updated_at DESC NULLS LAST, id
+            ) AS position
+            FROM experience_blocks
+        ) AS ranked
+        WHERE b.id = ranked.id AND ranked.position > 1
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_experience_blocks_title ON experience_blocks (title)",
+        "ALTER TABLE experience_blocks ADD COLUMN IF NOT EXISTS content_hash varchar(64)",
+        _backfill_block_content_hashes,
+    ]),
+    ("experience_blocks asynchronous embedding status", [
+        # Enum names are stored as plain strings (native_enum=False)
+        "ALTER TABLE experience_blocks ADD COLUMN IF NOT EXISTS embedding_status varchar(16) NOT NULL DEFAULT 'PENDING'",
+        "ALTER TABLE experience_blocks ADD COLUMN IF NOT EXISTS embedding_attempts integer NOT NULL DEFAULT 0",
+        # Writes clear the vector when they queue a block, so any pending row
+        # that still has one was embedded before this column existed
+        "UPDATE experience_blocks SET embedding_status = 'READY' WHERE embedding_status = 'PENDING' AND embedding IS NOT NULL",
+        "CREATE INDEX IF NOT EXISTS ix_experience_blocks_embedding_pending ON experience_blocks (updated_at) "
+        "WHERE embedding_status = 'PENDING'",
+    ]),
+    ("experience_blocks embedding backend", [
+        "ALTER TABLE experience_blocks ADD COLUMN IF NOT EXISTS embedding_model varchar(100)",
+        # Every vector written before this column came from the OpenAI backend
+        "UPDATE experience_blocks SET embedding_model = 'openai:text-embedding-3-small' "
+        "WHERE embedding IS NOT NULL AND embedding_model IS NULL",
+    ]),
+    ("table_versions change counters", [
+        """
+        CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO table_versions (table_name, version, updated_at)
+            VALUES (TG_TABLE_NAME, 1, timezone('utc', now()))
+            ON CONFLICT (table_name) DO UPDATE
+            SET version = table_versions.version + 1, updated_at = EXCLUDED.updated_at;
+            RETURN NULL;
+        END
+        $$
+        """,
+        *[
+            f"CREATE OR REPLACE TRIGGER {table}_bump_version "
+            f"AFTER INSERT OR UPDATE OR DELETE ON {table} "
+            "FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()"
+            for table in VERSIONED_TABLES
+        ],
+    ]),
+    ("experience_blocks embedding claims", [
+        "ALTER TABLE experience_blocks ADD COLUMN IF NOT EXISTS embedding_claimed_by varchar(64)",
+        "ALTER TABLE experience_blocks ADD COLUMN IF NOT EXISTS embedding_claimed_at timestamp",
+    ]),
+    ("table_versions only for statements that change rows", TABLE_VERSION_TRIGGERS),
+]
+
+def apply_schema_migrations():
+    """Apply idempotent DDL for schema changes made after the tables were first created"""
+    with engine.begin() as conn:
+        for description, statements in SCHEMA_MIGRATIONS:
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(text(statement))
+            logger.info("✅ Migration applied: %s", description)
+
+# Numbered by position: append new migrations, never reorder or edit applied ones
+SCHEMA_VERSION = len(SCHEMA_MIGRATIONS)
+# pg_advisory_lock key serialising schema setup across workers starting together
+SCHEMA_LOCK_KEY = 4_815_162_342
+
+def schema_fingerprint() -> str:
+    """Hash of the models' DDL and the migration list; changes whenever either does"""
+    dialect = postgresql.dialect()
+    parts = []
+    for table in Base.metadata.sorted_tables:
+        parts.append(str(CreateTable(table).compile(dialect=dialect)))
+        parts.extend(sorted(str(CreateIndex(index).compile(dialect=dialect)) for index in table.indexes))
+    for description, statements in SCHEMA_MIGRATIONS:
+        parts.append(description)
+        parts.extend(getattr(statement, "__name__", None) or " ".join(statement.split()) for statement in statements)
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+def schema_is_current(fingerprint: str) -> bool:
+    """One-row lookup; False when schema_version is missing or records another schema"""
     try:
         with engine.connect() as conn:
-            # Enable pgvector extension
-            conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
-            conn.commit()
-            print("✅ pgvector extension verified/installed")
-            
-        # Create all tables
-        Base.metadata.create_all(bind=engine)
-        print("✅ Database tables created successfully!")
+            row = conn.execute(text("SELECT fingerprint FROM schema_version WHERE id = 1")).first()
+    except DBAPIError:
+        return False
+    return row is not None and row.fingerprint == fingerprint
+
+def _create_schema():
+    with engine.connect() as conn:
+        # Enable pgvector extension
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        # Trigram matching for fuzzy title search
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.commit()
+        logger.info("✅ pgvector and pg_trgm extensions verified/installed")
+
+    # Create all tables
+    Base.metadata.create_all(bind=engine)
+    logger.info("✅ Database tables created successfully!")
+
+    apply_schema_migrations()
+
+def init_db():
+    """Bring the database up to the current schema.
+
+    Workers normally find schema_version current and skip the DDL. Otherwise
+    one worker at a time (advisory lock) creates extensions and tables, applies
+    the migrations and stamps the version; the others re-check and skip.
+    """
+    started = time.perf_counter()
+    fingerprint = schema_fingerprint()
+    try:
+        if schema_is_current(fingerprint):
+            logger.info("✅ Schema v%d current (%.0f ms)", SCHEMA_VERSION, (time.perf_counter() - started) * 1000)
+            return
+
+        with engine.connect() as lock_conn:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+            try:
+                if schema_is_current(fingerprint):
+                    logger.info("✅ Schema v%d set up by another worker", SCHEMA_VERSION)
+                    return
+                _create_schema()
+                with engine.begin() as conn:
+                    conn.execute(
+                        postgresql.insert(SchemaVersion.__table__)
+                        .values(id=1, version=SCHEMA_VERSION, fingerprint=fingerprint)
+                        .on_conflict_do_update(
+                            index_elements=["id"],
+                            set_={"version": SCHEMA_VERSION, "fingerprint": fingerprint, "applied_at": text("timezone('utc', now())")}
+                        )
+                    )
+                logger.info("✅ Schema v%d applied (%.0f ms)", SCHEMA_VERSION, (time.perf_counter() - started) * 1000)
+            finally:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEMA_LOCK_KEY})
+                lock_conn.commit()
     except Exception as e:
-        print(f"❌ Error during database initialization: {e}")
+        logger.error("❌ Error during database initialization: %s", e)
         raise e
 
 def get_db():
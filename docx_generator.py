@@ -3,13 +3,18 @@ Generate Word documents from CV markdown
 Converts markdown-formatted CVs to professional Word documents
 """
 
-from docx import Document
-from docx.shared import Pt, RGBColor, Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+import io
 import re
 
+from metrics import DOCX_RENDER_SECONDS
+
+@DOCX_RENDER_SECONDS.labels(document="cv").time()
 def parse_markdown_to_docx(markdown_text: str, output_path: str):
     """Convert markdown CV to Word document with formatting"""
+    # python-docx is imported on first render (or by the startup warm-up), not at worker start
+    from docx import Document
+    from docx.shared import Pt, RGBColor
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
     
     doc = Document()
     
@@ -159,12 +164,11 @@ def generate_cv_docx(cv_markdown: str, company_name: str, job_title: str, output
     
     return output_path
 
-def generate_cover_letter_docx(cover_letter_markdown: str, company_name: str, job_title: str, output_dir: str = "./") -> str:
-    """Generate Word document from cover letter markdown"""
-    
-    # Clean filename
-    filename = f"CoverLetter_{company_name}_{job_title}.docx".replace(' ', '_').replace('/', '_')
-    output_path = f"{output_dir}/{filename}"
+@DOCX_RENDER_SECONDS.labels(document="cover_letter").time()
+def parse_cover_letter_to_docx(cover_letter_markdown: str, output_path):
+    """Convert markdown cover letter to Word document (path or file-like object)"""
+    from docx import Document
+    from docx.shared import Pt
     
     # Cover letters are simpler, just format paragraphs
     doc = Document()
@@ -214,9 +218,31 @@ def generate_cover_letter_docx(cover_letter_markdown: str, company_name: str, jo
             add_formatted_text(p, segments)
     
     doc.save(output_path)
+    return output_path
+
+def generate_cover_letter_docx(cover_letter_markdown: str, company_name: str, job_title: str, output_dir: str = "./") -> str:
+    """Generate Word document from cover letter markdown"""
+    
+    # Clean filename
+    filename = f"CoverLetter_{company_name}_{job_title}.docx".replace(' ', '_').replace('/', '_')
+    output_path = f"{output_dir}/{filename}"
+    
+    parse_cover_letter_to_docx(cover_letter_markdown, output_path)
     
     return output_path
 
+def render_cv_docx_bytes(cv_markdown: str) -> bytes:
+    """Render CV markdown to Word document bytes without touching disk"""
+    buffer = io.BytesIO()
+    parse_markdown_to_docx(cv_markdown, buffer)
+    return buffer.getvalue()
+
+def render_cover_letter_docx_bytes(cover_letter_markdown: str) -> bytes:
+    """Render cover letter markdown to Word document bytes without touching disk"""
+    buffer = io.BytesIO()
+    parse_cover_letter_to_docx(cover_letter_markdown, buffer)
+    return buffer.getvalue()
+
 # Example usage for testing
 if __name__ == "__main__":
     sample_cv = """# Edward Baitsewe
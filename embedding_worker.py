@@ -0,0 +1,201 @@
+"""
+Background embedding worker
+Block writes only mark a block PENDING; this thread embeds pending blocks in
+batches so admin saves never wait on (or fail with) the embeddings API
+"""
+
+import logging
+import os
+import threading
+import uuid
+from datetime import timedelta
+from typing import Tuple
+
+from sqlalchemy import func, or_, select, update
+
+from database import SessionLocal
+from models import ExperienceBlock, EmbeddingStatus
+from embeddings import get_backend, EmbeddingError
+from block_import import embedding_text
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "50"))
+# Idle poll, in case a write happened in another process
+EMBEDDING_POLL_SECONDS = float(os.getenv("EMBEDDING_POLL_SECONDS", "30"))
+# Wait after a failed batch before trying again
+EMBEDDING_RETRY_SECONDS = float(os.getenv("EMBEDDING_RETRY_SECONDS", "60"))
+# Failed attempts before a block is marked FAILED
+EMBEDDING_MAX_ATTEMPTS = int(os.getenv("EMBEDDING_MAX_ATTEMPTS", "5"))
+# A claim older than this belongs to a worker that died mid-batch and is
+# taken over; keep it well above the embedding call's deadline
+EMBEDDING_CLAIM_TIMEOUT_SECONDS = float(os.getenv("EMBEDDING_CLAIM_TIMEOUT_SECONDS", "300"))
+
+_wake = threading.Event()
+_stop = threading.Event()
+_thread = None
+
+
+def notify():
+    """Wake the worker after queueing blocks"""
+    _wake.set()
+
+
+def requeue_foreign_embeddings() -> int:
+    """Queue every READY block embedded by a different backend than the active one.
+
+    Their vectors are cleared: they live in another vector space and would
+    never be compared with anything the active backend produces.
+    """
+    db = SessionLocal()
+    try:
+        backend_name = get_backend().name
+        foreign = db.query(ExperienceBlock).filter(
+            ExperienceBlock.embedding_status == EmbeddingStatus.READY,
+            or_(ExperienceBlock.embedding_model.is_(None), ExperienceBlock.embedding_model != backend_name)
+        )
+        # Read first so a boot with nothing foreign writes nothing at all
+        if not db.query(foreign.exists()).scalar():
+            return 0
+        count = foreign.update({
+            ExperienceBlock.embedding: None,
+            ExperienceBlock.embedding_model: None,
+            ExperienceBlock.embedding_status: EmbeddingStatus.PENDING,
+            ExperienceBlock.embedding_attempts: 0,
+            ExperienceBlock.embedding_claimed_by: None,
+            ExperienceBlock.embedding_claimed_at: None,
+            ExperienceBlock.updated_at: ExperienceBlock.updated_at
+        }, synchronize_session=False)
+        db.commit()
+        if count:
+            logger.info("🔁 Queued %d block(s) embedded by another backend for re-embedding with %s", count, backend_name)
+        return count
+    finally:
+        db.close()
+
+
+def process_pending_batch() -> Tuple[int, bool]:
+    """Embed up to one batch of pending blocks; returns (blocks processed, whether the API call failed)"""
+    db = SessionLocal()
+    try:
+        # Claim in one short transaction: the rows are locked, then stamped
+        # with this batch's token before the commit releases the locks, so
+        # other workers (SKIP LOCKED while it runs, the claim after) leave them
+        # alone and nothing stays locked during the API call
+        now = func.timezone("utc", func.now())
+        claimable = db.execute(select(ExperienceBlock.id).where(
+            ExperienceBlock.embedding_status == EmbeddingStatus.PENDING,
+            or_(
+                ExperienceBlock.embedding_claimed_at.is_(None),
+                ExperienceBlock.embedding_claimed_at < now - timedelta(seconds=EMBEDDING_CLAIM_TIMEOUT_SECONDS)
+            )
+        ).order_by(ExperienceBlock.updated_at).limit(EMBEDDING_BATCH_SIZE).with_for_update(skip_locked=True)).scalars().all()
+        if not claimable:
+            # Idle poll: nothing written, not even an empty UPDATE
+            db.rollback()
+            return 0, False
+
+        claim = uuid.uuid4().hex
+        rows = db.execute(
+            update(ExperienceBlock).where(ExperienceBlock.id.in_(claimable)).values({
+                ExperienceBlock.embedding_claimed_by: claim,
+                ExperienceBlock.embedding_claimed_at: now,
+                ExperienceBlock.updated_at: ExperienceBlock.updated_at
+            }).returning(
+                ExperienceBlock.id,
+                ExperienceBlock.title,
+                ExperienceBlock.company,
+                ExperienceBlock.content,
+                ExperienceBlock.metadata_tags,
+                ExperienceBlock.embedding_attempts
+            ).execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+
+        backend = get_backend()
+        try:
+            vectors = backend.embed(
+                [embedding_text(row.title, row.company, row.content, row.metadata_tags) for row in rows]
+            )
+            failed = False
+        except EmbeddingError as e:
+            logger.warning("⚠️  Embedding batch of %d failed: %s", len(rows), e)
+            vectors = [None] * len(rows)
+            failed = True
+
+        for row, vector in zip(rows, vectors):
+            # Only write back while the claim is still ours: editing the
+            # embedded text releases it, and a timed-out claim may have been
+            # taken over, so either way the row is left to its new owner
+            current = db.query(ExperienceBlock).filter(
+                ExperienceBlock.id == row.id,
+                ExperienceBlock.embedding_claimed_by == claim,
+                ExperienceBlock.embedding_status == EmbeddingStatus.PENDING
+            )
+            if vector is not None:
+                changes = {
+                    ExperienceBlock.embedding: vector,
+                    ExperienceBlock.embedding_model: backend.name,
+                    ExperienceBlock.embedding_status: EmbeddingStatus.READY,
+                    ExperienceBlock.embedding_attempts: 0
+                }
+            else:
+                attempts = row.embedding_attempts + 1
+                changes = {
+                    ExperienceBlock.embedding_attempts: attempts,
+                    ExperienceBlock.embedding_status: (
+                        EmbeddingStatus.FAILED if attempts >= EMBEDDING_MAX_ATTEMPTS else EmbeddingStatus.PENDING
+                    )
+                }
+            changes[ExperienceBlock.embedding_claimed_by] = None
+            changes[ExperienceBlock.embedding_claimed_at] = None
+            # Embedding is bookkeeping, not an edit: keep updated_at as it was
+            changes[ExperienceBlock.updated_at] = ExperienceBlock.updated_at
+            current.update(changes, synchronize_session=False)
+        db.commit()
+
+        if not failed:
+            logger.info("🧮 Embedded %d experience block(s)", len(rows))
+        return len(rows), failed
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _run():
+    while not _stop.is_set():
+        _wake.clear()
+        try:
+            processed, failed = process_pending_batch()
+        except Exception as e:
+            logger.exception("❌ Embedding worker error: %s", e)
+            processed, failed = 0, True
+
+        if processed and not failed:
+            # More may be queued, keep draining
+            continue
+        _wake.wait(EMBEDDING_RETRY_SECONDS if failed else EMBEDDING_POLL_SECONDS)
+
+
+def start():
+    """Start the worker thread (idempotent)"""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    requeue_foreign_embeddings()
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="embedding-worker", daemon=True)
+    _thread.start()
+    logger.info("✅ Embedding worker started")
+
+
+def stop(timeout: float = 5.0):
+    global _thread
+    if _thread is None:
+        return
+    _stop.set()
+    _wake.set()
+    _thread.join(timeout)
+    _thread = None
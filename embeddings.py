@@ -0,0 +1,156 @@
+"""
+Pluggable embedding backends
+EMBEDDING_BACKEND picks "openai" (default) or "local", a deterministic CPU
+backend that needs no network. Every stored vector records the backend name
+that produced it, and vectors from different backends are never compared.
+"""
+
+import logging
+import os
+import re
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+from llm_provider import get_client, recorded_call
+from metrics import EMBEDDING_CALLS, EMBEDDING_TEXTS
+from tracing import span
+from llm_service import EMBEDDING_MODEL, EMBEDDING_DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingError(RuntimeError):
+    """Raised when a backend cannot produce embeddings; there is no placeholder fallback"""
+
+
+class EmbeddingBackend:
+    """Turns texts into EMBEDDING_DIMENSIONS-long vectors.
+
+    `name` identifies the vector space and is stored next to every vector, so
+    it must change whenever the backend's output for the same text would.
+    Subclasses implement _embed(); embed() wraps it with call metrics.
+    """
+    name: str
+    dimensions: int = EMBEDDING_DIMENSIONS
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        EMBEDDING_TEXTS.labels(backend=self.name).inc(len(texts))
+        try:
+            with span("embedding.embed", **{"embedding.backend": self.name, "embedding.texts": len(texts)}):
+                vectors = self._embed(texts)
+        except EmbeddingError:
+            EMBEDDING_CALLS.labels(backend=self.name, outcome="error").inc()
+            raise
+        EMBEDDING_CALLS.labels(backend=self.name, outcome="ok").inc()
+        return vectors
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    name = f"openai:{EMBEDDING_MODEL}"
+
+    def __init__(self, batch_size: int = 100):
+        self.batch_size = batch_size
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            try:
+                vectors.extend(recorded_call(
+                    "embedding",
+                    {"kind": "embedding", "model": EMBEDDING_MODEL, "dimensions": self.dimensions, "input": batch},
+                    lambda timeout: self._request(batch, timeout)
+                ))
+            except Exception as e:
+                raise EmbeddingError(f"OpenAI embeddings request failed for batch of {len(batch)}: {e}") from e
+        return vectors
+
+    def _request(self, batch: List[str], timeout: float) -> List[List[float]]:
+        response = get_client().embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=batch,
+            dimensions=self.dimensions,
+            timeout=timeout
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+class LocalEmbeddingBackend(EmbeddingBackend):
+    """Hashed word and character n-gram features, sublinear TF weighted and
+    randomly projected to `dimensions`.
+
+    Features are hashed with crc32 (stable across processes, unlike hash())
+    into HASH_BUCKETS buckets. There is no corpus IDF: a block's vector must
+    not change when other blocks are added. The projection is a fixed ±1
+    matrix from numpy's legacy RandomState, whose stream is frozen across
+    numpy versions, so the same text always maps to the same vector.
+    """
+    name = "local:ngram-v1"
+
+    HASH_BUCKETS = 4096
+    CHAR_NGRAMS = (3, 4, 5)
+    SEED = 20240611
+    _WORD = re.compile(r"[a-z0-9+#.]+")
+
+    def __init__(self):
+        rng = np.random.RandomState(self.SEED)
+        signs = rng.randint(0, 2, size=(self.HASH_BUCKETS, self.dimensions)).astype(np.float32)
+        self._projection = (signs * 2 - 1) / np.sqrt(self.dimensions)
+
+    def _features(self, text: str) -> List[str]:
+        words = self._WORD.findall(text.lower())
+        features = [f"w:{word}" for word in words]
+        features.extend(f"b:{a} {b}" for a, b in zip(words, words[1:]))
+        for word in words:
+            padded = f" {word} "
+            for n in self.CHAR_NGRAMS:
+                features.extend(f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1))
+        return features
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        counts = np.zeros((len(texts), self.HASH_BUCKETS), dtype=np.float32)
+        for row, text in enumerate(texts):
+            buckets = [zlib.crc32(feature.encode("utf-8")) % self.HASH_BUCKETS for feature in self._features(text)]
+            counts[row] = np.bincount(buckets, minlength=self.HASH_BUCKETS)
+
+        vectors = np.log1p(counts) @ self._projection
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1.0, norms)
+        return vectors.tolist()
+
+
+BACKENDS = {
+    "openai": OpenAIEmbeddingBackend,
+    "local": LocalEmbeddingBackend
+}
+
+_backend: Optional[EmbeddingBackend] = None
+
+
+def get_backend() -> EmbeddingBackend:
+    """The backend selected by EMBEDDING_BACKEND, created once per process"""
+    global _backend
+    if _backend is None:
+        choice = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+        if choice not in BACKENDS:
+            raise ValueError(f"Unknown EMBEDDING_BACKEND {choice!r}, expected one of {sorted(BACKENDS)}")
+        _backend = BACKENDS[choice]()
+        logger.info("✅ Embedding backend: %s", _backend.name)
+    return _backend
+
+
+def generate_embedding(text: str) -> List[float]:
+    """Embed one text with the active backend; raises EmbeddingError on failure"""
+    return get_backend().embed([text])[0]
+
+
+def generate_embeddings(texts: List[str]) -> List[List[float]]:
+    """Embed many texts with the active backend; raises EmbeddingError on failure"""
+    return get_backend().embed(texts)
@@ -0,0 +1,259 @@
+"""
+Streaming exports of stored data
+Archives are written incrementally from a server-side cursor so memory stays
+flat no matter how many rows are exported
+"""
+
+import base64
+import json
+import logging
+import re
+import zipfile
+from datetime import datetime
+from typing import Iterator, Optional, Dict, List
+
+import numpy as np
+from sqlalchemy.orm import load_only
+
+from database import SessionLocal
+from models import JobApplication, ApplicationStatus, PersonalInfo, ExperienceBlock
+from docx_generator import render_cv_docx_bytes, render_cover_letter_docx_bytes
+from embeddings import get_backend
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round-trip from the server-side cursor
+EXPORT_BATCH_SIZE = 50
+
+# NDJSON rows are small, so fetch more per round-trip
+NDJSON_BATCH_SIZE = 200
+
+# Flush the NDJSON stream to the client once this many bytes are buffered
+NDJSON_FLUSH_BYTES = 64 * 1024
+
+NDJSON_FORMAT_VERSION = 1
+EMBEDDING_ENCODING = "float16-base64-le"
+
+
+class _ChunkBuffer:
+    """Write-only, non-seekable sink that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _safe_name(value: Optional[str]) -> str:
+    """Make a string safe to use as a zip path segment"""
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", value or "").strip("_") or "untitled"
+
+
+def _bundle_folder(app: JobApplication) -> str:
+    created = app.created_at.strftime("%Y%m%d") if app.created_at else "undated"
+    return f"{created}_{_safe_name(app.company_name)}_{_safe_name(app.job_title)}_{str(app.id)[:8]}"
+
+
+def _write_entry(archive: zipfile.ZipFile, path: str, data: bytes, compress: bool = True):
+    info = zipfile.ZipInfo(path, date_time=datetime.utcnow().timetuple()[:6])
+    # DOCX files are already zip-compressed, deflating them again only burns CPU
+    info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    archive.writestr(info, data)
+
+
+def iter_application_bundle(
+    status: Optional[ApplicationStatus] = None,
+    company: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None
+) -> Iterator[bytes]:
+    """Yield a ZIP archive of the documents for every matching job application, one application at a time"""
+    db = SessionLocal()
+    buffer = _ChunkBuffer()
+    try:
+        query = db.query(JobApplication).options(load_only(
+            JobApplication.id,
+            JobApplication.company_name,
+            JobApplication.job_title,
+            JobApplication.generated_cv,
+            JobApplication.generated_cover_letter,
+            JobApplication.skills_gap_report,
+            JobApplication.created_at
+        ))
+
+        if status:
+            query = query.filter(JobApplication.status == status)
+        if company:
+            query = query.filter(JobApplication.company_name.ilike(f"%{company}%"))
+        if created_after:
+            query = query.filter(JobApplication.created_at >= created_after)
+        if created_before:
+            query = query.filter(JobApplication.created_at < created_before)
+
+        # yield_per streams rows through a server-side cursor instead of buffering the result set
+        query = query.order_by(JobApplication.created_at, JobApplication.id).yield_per(EXPORT_BATCH_SIZE)
+
+        with zipfile.ZipFile(buffer, mode="w") as archive:
+            for app in query:
+                folder = _bundle_folder(app)
+
+                if app.generated_cv:
+                    _write_entry(archive, f"{folder}/cv.md", app.generated_cv.encode("utf-8"))
+                    try:
+                        _write_entry(archive, f"{folder}/CV.docx", render_cv_docx_bytes(app.generated_cv), compress=False)
+                    except Exception as e:
+                        logger.warning("⚠️  CV render failed for %s: %s", app.id, e)
+
+                if app.generated_cover_letter:
+                    _write_entry(archive, f"{folder}/cover_letter.md", app.generated_cover_letter.encode("utf-8"))
+                    try:
+                        _write_entry(archive, f"{folder}/CoverLetter.docx", render_cover_letter_docx_bytes(app.generated_cover_letter), compress=False)
+                    except Exception as e:
+                        logger.warning("⚠️  Cover letter render failed for %s: %s", app.id, e)
+
+                if app.skills_gap_report is not None:
+                    _write_entry(archive, f"{folder}/skills_gap.json", json.dumps(app.skills_gap_report, indent=2).encode("utf-8"))
+
+                # Drop the ORM object once written so the identity map doesn't grow with the export
+                db.expunge(app)
+                yield buffer.drain()
+
+        # Closing the archive writes the central directory
+        yield buffer.drain()
+    finally:
+        db.close()
+
+
+def encode_embedding(vector) -> str:
+    """Compact text form of a vector: little-endian float16, base64 encoded"""
+    return base64.b64encode(np.asarray(vector, dtype="<f2").tobytes()).decode("ascii")
+
+
+def decode_embedding(encoded: str) -> List[float]:
+    return np.frombuffer(base64.b64decode(encoded), dtype="<f2").astype(np.float32).tolist()
+
+
+def personal_info_dict(personal_info: PersonalInfo) -> Dict:
+    return {
+        "name": personal_info.name,
+        "email": personal_info.email,
+        "phone": personal_info.phone,
+        "location": personal_info.location,
+        "linkedin": personal_info.linkedin,
+        "github": personal_info.github,
+        "portfolio": personal_info.portfolio,
+        "summary": personal_info.summary
+    }
+
+
+def block_export_dict(block) -> Dict:
+    """Export-format dict for an ExperienceBlock row or ORM object"""
+    return {
+        "title": block.title,
+        "company": block.company,
+        "content": block.content,
+        "tags": block.metadata_tags or [],
+        "block_type": block.block_type.value if block.block_type else "supporting_project",
+        "priority": block.priority or "3"
+    }
+
+
+def _application_export_dict(app) -> Dict:
+    return {
+        "company_name": app.company_name,
+        "job_title": app.job_title,
+        "raw_spec": app.raw_spec,
+        "job_url": app.job_url,
+        "generated_cv": app.generated_cv,
+        "generated_cover_letter": app.generated_cover_letter,
+        "skills_gap_report": app.skills_gap_report,
+        "status": app.status.value if app.status else None,
+        "notes": app.notes,
+        "applied_date": app.applied_date.isoformat() if app.applied_date else None,
+        "created_at": app.created_at.isoformat() if app.created_at else None
+    }
+
+
+def iter_profile_ndjson(include_applications: bool = False, include_embeddings: bool = False) -> Iterator[bytes]:
+    """Yield the profile as NDJSON: a meta line, personal info, then one line per block (and application)"""
+    db = SessionLocal()
+    buffer = []
+    buffered = 0
+    counts = {"experience_blocks": 0, "applications": 0}
+
+    def line(record: Dict) -> bytes:
+        return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+    try:
+        meta = {
+            "type": "meta",
+            "format": "vector-cv-ndjson",
+            "version": NDJSON_FORMAT_VERSION,
+            "exported_at": datetime.utcnow().isoformat()
+        }
+        backend = get_backend()
+        if include_embeddings:
+            meta.update({
+                "embedding_encoding": EMBEDDING_ENCODING,
+                "embedding_model": backend.name,
+                "embedding_dimensions": backend.dimensions
+            })
+        yield line(meta)
+
+        personal_info = db.query(PersonalInfo).first()
+        if personal_info:
+            yield line({"type": "personal_info", "data": personal_info_dict(personal_info)})
+
+        columns = [
+            ExperienceBlock.title,
+            ExperienceBlock.company,
+            ExperienceBlock.content,
+            ExperienceBlock.metadata_tags,
+            ExperienceBlock.block_type,
+            ExperienceBlock.priority
+        ]
+        if include_embeddings:
+            columns.extend([ExperienceBlock.embedding, ExperienceBlock.embedding_model])
+        blocks = db.query(*columns).order_by(ExperienceBlock.title).yield_per(NDJSON_BATCH_SIZE)
+
+        for block in blocks:
+            data = block_export_dict(block)
+            # Only vectors from the backend named in the meta line
+            if include_embeddings and block.embedding is not None and block.embedding_model == backend.name:
+                data["embedding"] = encode_embedding(block.embedding)
+            chunk = line({"type": "experience_block", "data": data})
+            buffer.append(chunk)
+            buffered += len(chunk)
+            counts["experience_blocks"] += 1
+            if buffered >= NDJSON_FLUSH_BYTES:
+                yield b"".join(buffer)
+                buffer, buffered = [], 0
+
+        if include_applications:
+            applications = db.query(JobApplication).order_by(
+                JobApplication.created_at, JobApplication.id
+            ).yield_per(NDJSON_BATCH_SIZE)
+            for app in applications:
+                chunk = line({"type": "application", "data": _application_export_dict(app)})
+                db.expunge(app)
+                buffer.append(chunk)
+                buffered += len(chunk)
+                counts["applications"] += 1
+                if buffered >= NDJSON_FLUSH_BYTES:
+                    yield b"".join(buffer)
+                    buffer, buffered = [], 0
+
+        buffer.append(line({"type": "end", "counts": counts}))
+        yield b"".join(buffer)
+    finally:
+        db.close()
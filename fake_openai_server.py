@@ -0,0 +1,233 @@
+"""
+Local stand-in for the OpenAI API
+Implements /v1/chat/completions and /v1/embeddings with templated responses,
+configurable latency and error injection, so the generation pipeline can be
+exercised and load-tested without network access or API spend
+
+    python fake_openai_server.py --port 8090
+    OPENAI_BASE_URL=http://localhost:8090/v1 OPENAI_API_KEY=fake EMBEDDING_BACKEND=openai uvicorn main:app
+
+Behaviour is set with FAKE_LLM_* variables, overridden per request with query
+parameters of the same name in lower case (e.g. ?latency_ms=0&error_rate=1),
+or changed at runtime with POST /fake/config.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from embeddings import LocalEmbeddingBackend
+
+CONFIG = {
+    # Fixed delay before every response, plus uniform jitter on top
+    "latency_ms": float(os.getenv("FAKE_LLM_LATENCY_MS", "0")),
+    "jitter_ms": float(os.getenv("FAKE_LLM_JITTER_MS", "0")),
+    # Simulated generation speed for chat; 0 disables the per-token delay
+    "tokens_per_second": float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0")),
+    # Fraction of requests answered with error_status instead
+    "error_rate": float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+    "error_status": int(os.getenv("FAKE_LLM_ERROR_STATUS", "500"))
+}
+
+KNOWN_SKILLS = [
+    "Python", "PHP", "JavaScript", "TypeScript", "Go", "Java", "Ruby", "C#",
+    "Laravel", "Django", "FastAPI", "Flask", "React", "Vue", "Angular", "Next.js", "Node.js",
+    "PostgreSQL", "MySQL", "Redis", "MongoDB", "Elasticsearch", "Typesense",
+    "Docker", "Kubernetes", "Terraform", "Nginx", "Git", "GitHub Actions",
+    "AWS", "Azure", "GCP", "CI/CD", "DevOps", "REST", "GraphQL", "Linux"
+]
+
+app = FastAPI(title="Fake OpenAI API")
+_embedder = LocalEmbeddingBackend()
+
+
+def _setting(request: Request, key: str):
+    value = request.query_params.get(key)
+    return type(CONFIG[key])(value) if value is not None else CONFIG[key]
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+async def _delay(request: Request, completion_tokens: int = 0):
+    seconds = (_setting(request, "latency_ms") + random.uniform(0, _setting(request, "jitter_ms"))) / 1000
+    tokens_per_second = _setting(request, "tokens_per_second")
+    if tokens_per_second > 0:
+        seconds += completion_tokens / tokens_per_second
+    if seconds > 0:
+        await asyncio.sleep(seconds)
+
+
+def _injected_error(request: Request) -> Optional[JSONResponse]:
+    if random.random() >= _setting(request, "error_rate"):
+        return None
+    status = _setting(request, "error_status")
+    error_type = "rate_limit_exceeded" if status == 429 else "server_error"
+    headers = {"Retry-After": "1"} if status == 429 else None
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": f"Injected {status} from fake server", "type": error_type, "code": error_type}},
+        headers=headers
+    )
+
+
+def _skills_in(text: str) -> List[str]:
+    return [skill for skill in KNOWN_SKILLS if re.search(rf"(?<![\w]){re.escape(skill)}(?![\w])", text, re.IGNORECASE)]
+
+
+def _section(text: str, start: str, end: str) -> str:
+    match = re.search(rf"{start}(.*?)(?:{end}|$)", text, re.DOTALL)
+    return match.group(1) if match else ""
+
+
+def _field(text: str, name: str, default: str) -> str:
+    match = re.search(rf"^{name}: *(.+)$", text, re.MULTILINE)
+    value = match.group(1).strip() if match else ""
+    return value if value and value != "None" else default
+
+
+def _chat_content(messages: List[Dict], json_mode: bool) -> str:
+    """Pick a template from the prompt llm_service sent"""
+    system = " ".join(m.get("content") or "" for m in messages if m.get("role") == "system")
+    user = (messages[-1].get("content") or "") if messages else ""
+
+    if json_mode and "missing_skills" in user:
+        candidate = set(_skills_in(_section(user, "CANDIDATE EXPERIENCE:", "JOB DESCRIPTION:")))
+        wanted = _skills_in(_section(user, "JOB DESCRIPTION:", "Analyze the skills gap"))
+        return json.dumps({
+            "missing_skills": [skill for skill in wanted if skill not in candidate],
+            "matching_skills": [skill for skill in wanted if skill in candidate],
+            "partial_matches": [],
+            "recommendations": [f"Highlight hands-on {skill} work" for skill in wanted if skill not in candidate][:3]
+        })
+    if json_mode:
+        return json.dumps({"skills": _skills_in(_section(user, "Job Description:", "Example output format"))})
+
+    name = _field(user, "(?:Name|CANDIDATE)", "Candidate")
+    if "cover letter" in system.lower():
+        job = _field(user, "JOB", "the role")
+        return (
+            "# 🔹 Cover Letter\n\n**To:** Hiring Team\n"
+            f"**Subject:** {job} Application - {name}\n\nDear Hiring Team,\n\n"
+            "This is a placeholder cover letter generated by the local fake OpenAI server.\n\n"
+            f"Best regards,\n\n{name}\n"
+        )
+    projects = re.findall(r"^BLOCK: (.+)$", user, re.MULTILINE)
+    job_skills = _skills_in(_section(user, "TARGET JOB:", "STYLE GUIDELINES:"))
+    lines = [
+        f"# {name}",
+        f"📍 {_field(user, 'Location', '')} | 📧 {_field(user, 'Email', '')}",
+        "",
+        "## 🔹 Summary",
+        f"Placeholder CV from the local fake OpenAI server, tailored to {', '.join(job_skills) or 'the target role'}.",
+        "",
+        "## 🔹 Key Projects"
+    ]
+    lines.extend(f"* **{project}**" for project in projects)
+    return "\n".join(lines) + "\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    error = _injected_error(request)
+    if error:
+        await _delay(request)
+        return error
+
+    messages = body.get("messages", [])
+    json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+    content = _chat_content(messages, json_mode)
+    prompt_tokens = sum(_estimate_tokens(m.get("content") or "") for m in messages)
+    completion_tokens = _estimate_tokens(content)
+    await _delay(request, completion_tokens)
+
+    return {
+        "id": f"chatcmpl-fake-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    error = _injected_error(request)
+    if error:
+        await _delay(request)
+        return error
+
+    texts = body.get("input", [])
+    if isinstance(texts, str):
+        texts = [texts]
+    dimensions = int(body.get("dimensions") or _embedder.dimensions)
+    # The local backend's vectors, so similarities are meaningful; other
+    # sizes are truncated and renormalised like OpenAI's shortened embeddings
+    vectors = np.asarray(_embedder.embed(texts), dtype=np.float32)[:, :dimensions] if texts else np.zeros((0, dimensions))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1.0, norms)
+    await _delay(request)
+
+    prompt_tokens = sum(_estimate_tokens(text) for text in texts)
+    return {
+        "object": "list",
+        "model": body.get("model", "fake"),
+        "data": [
+            {"object": "embedding", "index": index, "embedding": vector}
+            for index, vector in enumerate(vectors.tolist())
+        ],
+        "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens}
+    }
+
+
+@app.get("/fake/config")
+def get_config():
+    return CONFIG
+
+
+@app.post("/fake/config")
+async def update_config(request: Request):
+    """Change latency or error settings mid-run, e.g. to start failing during a load test"""
+    changes = await request.json()
+    unknown = set(changes) - set(CONFIG)
+    if unknown:
+        return JSONResponse(status_code=400, content={"error": f"Unknown settings: {sorted(unknown)}"})
+    for key, value in changes.items():
+        CONFIG[key] = type(CONFIG[key])(value)
+    return CONFIG
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+    print(f"🧪 Fake OpenAI server on http://{args.host}:{args.port}/v1 with {CONFIG}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
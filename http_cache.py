@@ -0,0 +1,211 @@
+"""
+HTTP caching and compression for read endpoints
+ETags and Last-Modified come from the table_versions change counters, so an
+unchanged resource is answered with 304 after a single indexed lookup
+"""
+
+import hashlib
+import json
+import os
+import zlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models import TableVersion
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+# Cache-Control for conditional GET routes. "no-cache" lets clients keep a
+# copy but revalidate it every time, which the ETag turns into a cheap 304.
+CACHE_CONTROL_DEFAULT = os.getenv("CACHE_CONTROL_DEFAULT", "no-cache")
+# Per-route overrides keyed by route template, as JSON, e.g.
+# {"/api/personal-info": "public, max-age=300"}
+CACHE_CONTROL_ROUTES: Dict[str, str] = json.loads(os.getenv("CACHE_CONTROL_ROUTES", "{}"))
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Low qualities are much faster and still beat gzip on JSON
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/markdown", "text/plain", "text/html")
+
+
+def cache_control_for(route_path: str) -> str:
+    return CACHE_CONTROL_ROUTES.get(route_path, CACHE_CONTROL_DEFAULT)
+
+
+def _if_none_match(header: str, etag: str) -> bool:
+    # Weak comparison: compression changes the bytes but not the representation
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == etag.removeprefix("W/") for value in candidates)
+
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have whole-second precision
+    return last_modified.replace(microsecond=0) <= since.replace(tzinfo=timezone.utc).replace(tzinfo=None)
+
+
+def conditional_get(*tables: str):
+    """Dependency for GET routes whose response depends only on `tables` and the URL.
+
+    Sets ETag, Last-Modified and Cache-Control on the response, or raises a 304
+    when the client's cached copy is still current.
+    """
+    def dependency(request: Request, response: Response, db: Session = Depends(get_db)):
+        rows = db.query(TableVersion.table_name, TableVersion.version, TableVersion.updated_at).filter(
+            TableVersion.table_name.in_(tables)
+        ).all()
+        versions = {row.table_name: row.version for row in rows}
+        modified = [row.updated_at for row in rows if row.updated_at]
+        route = request.scope.get("route")
+        route_path = route.path if route else request.url.path
+
+        # The query string picks filters and pages, so it is part of the identity
+        fingerprint = "|".join(
+            [request.url.path, request.url.query] + [f"{table}={versions.get(table, 0)}" for table in tables]
+        )
+        etag = f'W/"{hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:32]}"'
+        headers = {"ETag": etag, "Cache-Control": cache_control_for(route_path)}
+        last_modified = max(modified) if modified else None
+        if last_modified:
+            headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+
+        if_none_match = request.headers.get("if-none-match")
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_none_match is not None:
+            not_modified = _if_none_match(if_none_match, etag)
+        else:
+            not_modified = bool(if_modified_since and last_modified and _not_modified_since(if_modified_since, last_modified))
+        if not_modified:
+            raise HTTPException(status_code=304, headers=headers)
+
+        response.headers.update(headers)
+
+    return dependency
+
+
+class CompressionMiddleware:
+    """gzip/brotli for JSON and text responses above COMPRESSION_MIN_SIZE.
+
+    Single-body responses are compressed in one go; streamed ones (NDJSON
+    exports) are compressed chunk by chunk with a sync flush after each.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1").lower()
+                break
+        encoding = self._choose_encoding(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await self.app(scope, receive, _CompressingSender(send, encoding, self.minimum_size))
+
+    @staticmethod
+    def _choose_encoding(accept: str) -> Optional[str]:
+        offered = {part.split(";")[0].strip() for part in accept.split(",")}
+        if brotli is not None and "br" in offered:
+            return "br"
+        if "gzip" in offered:
+            return "gzip"
+        return None
+
+
+class _CompressingSender:
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+
+    def _new_compressor(self):
+        if self.encoding == "br":
+            return brotli.Compressor(quality=BROTLI_QUALITY)
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def _compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self.compressor.process(data)
+            return out + (self.compressor.finish() if final else self.compressor.flush())
+        out = self.compressor.compress(data)
+        return out + self.compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+    def _compressed_headers(self, content_length: Optional[int]):
+        headers = [
+            (name, value) for name, value in self.start_message["headers"]
+            if name not in (b"content-length", b"vary")
+        ]
+        vary = [value for name, value in self.start_message["headers"] if name == b"vary"]
+        headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode("latin-1")))
+        return {**self.start_message, "headers": headers}
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            headers = dict(message["headers"])
+            content_type = headers.get(b"content-type", b"").decode("latin-1").split(";")[0].strip()
+            self.passthrough = b"content-encoding" in headers or content_type not in COMPRESSIBLE_TYPES
+            if self.passthrough:
+                await self.send(message)
+            else:
+                # Held until the first body chunk shows whether compressing is worth it
+                self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            if not more_body and len(body) < self.minimum_size:
+                await self.send(self.start_message)
+                self.start_message = None
+                self.passthrough = True
+                await self.send(message)
+                return
+
+            self.compressor = self._new_compressor()
+            if not more_body:
+                compressed = self._compress(body, final=True)
+                await self.send(self._compressed_headers(len(compressed)))
+                self.start_message = None
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+
+            await self.send(self._compressed_headers(None))
+            self.start_message = None
+
+        await self.send({
+            "type": "http.response.body",
+            "body": self._compress(body, final=not more_body),
+            "more_body": more_body
+        })
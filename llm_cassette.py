@@ -0,0 +1,151 @@
+"""
+Record and replay of LLM provider interactions
+In "record" mode every chat and embedding call's request fingerprint, response
+and latency are written to a cassette directory; "replay" serves them back
+without touching the network, optionally sleeping for the recorded latency, so
+create_job_application can be benchmarked and profiled offline and in CI.
+
+LLM_CASSETTE_MODE: "off" (default), "record" or "replay"
+LLM_CASSETTE_DIR: one JSON file per fingerprint (default ./cassettes/default)
+LLM_CASSETTE_LATENCY_SCALE: replay sleeps recorded latency x scale (default 0)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+CASSETTE_DIR = os.getenv("LLM_CASSETTE_DIR", "./cassettes/default")
+CASSETTE_LATENCY_SCALE = float(os.getenv("LLM_CASSETTE_LATENCY_SCALE", "0"))
+
+if CASSETTE_MODE not in ("off", "record", "replay"):
+    raise ValueError(f"LLM_CASSETTE_MODE must be off, record or replay, got {CASSETTE_MODE!r}")
+
+
+class CassetteMissError(RuntimeError):
+    """Replay found no recording for a request; the prompt or model changed since recording"""
+
+
+def fingerprint(request: Dict) -> str:
+    """sha256 of the request's canonical JSON: same model, messages and parameters, same fingerprint"""
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """A directory of recordings, one file per fingerprint.
+
+    A request seen several times keeps every response in order; replay hands
+    them out round-robin, so a run that asks the same thing twice gets what
+    the recorded run got.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._entries: Dict[str, Dict] = {}
+        self._replayed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load(self, key: str) -> Optional[Dict]:
+        if key not in self._entries:
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    self._entries[key] = json.load(f)
+            except FileNotFoundError:
+                return None
+        return self._entries[key]
+
+    def record(self, request: Dict, response, latency_seconds: float):
+        key = fingerprint(request)
+        with self._lock:
+            entry = self._load(key) or {"fingerprint": key, "request": request, "responses": []}
+            entry["responses"].append({
+                "response": response,
+                "latency_seconds": round(latency_seconds, 4),
+                "recorded_at": datetime.utcnow().isoformat()
+            })
+            self._entries[key] = entry
+            os.makedirs(self.directory, exist_ok=True)
+            # Write-then-rename so a concurrent reader never sees half a file
+            temporary = f"{self._path(key)}.{os.getpid()}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, default=str)
+            os.replace(temporary, self._path(key))
+
+    def lookup(self, request: Dict) -> Dict:
+        """The next recorded response for request: {"response", "latency_seconds", ...}"""
+        key = fingerprint(request)
+        with self._lock:
+            entry = self._load(key)
+            if entry is None or not entry["responses"]:
+                raise CassetteMissError(
+                    f"No recording of this {request.get('kind', 'LLM')} request "
+                    f"(model {request.get('model')}, fingerprint {key[:12]}) in {self.directory}"
+                )
+            count = self._replayed.get(key, 0)
+            self._replayed[key] = count + 1
+            return entry["responses"][count % len(entry["responses"])]
+
+    def play(self, recorded: Dict, timeout: float):
+        """The recorded response, after the recorded latency x CASSETTE_LATENCY_SCALE (capped at timeout)"""
+        if CASSETTE_LATENCY_SCALE > 0:
+            time.sleep(max(0.0, min(recorded["latency_seconds"] * CASSETTE_LATENCY_SCALE, timeout)))
+        return recorded["response"]
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """The configured cassette, or None when LLM_CASSETTE_MODE is off"""
+    global _cassette
+    if CASSETTE_MODE == "off":
+        return None
+    if _cassette is None:
+        with _cassette_lock:
+            if _cassette is None:
+                _cassette = Cassette(CASSETTE_DIR)
+                logger.info("📼 LLM cassette: %s %s", CASSETTE_MODE, os.path.abspath(CASSETTE_DIR))
+    return _cassette
+
+
+def summarize(directory: str) -> List[Dict]:
+    """Recordings per (kind, model): requests, responses and latency"""
+    groups: Dict[tuple, Dict] = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            entry = json.load(f)
+        request = entry["request"]
+        group = groups.setdefault((request.get("kind"), request.get("model")), {
+            "kind": request.get("kind"), "model": request.get("model"),
+            "requests": 0, "responses": 0, "latency_seconds": 0.0
+        })
+        group["requests"] += 1
+        group["responses"] += len(entry["responses"])
+        group["latency_seconds"] += sum(r["latency_seconds"] for r in entry["responses"])
+    return list(groups.values())
+
+
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else CASSETTE_DIR
+    rows = summarize(directory)
+    if not rows:
+        print(f"No recordings in {directory}")
+    for row in rows:
+        mean = row["latency_seconds"] / row["responses"] if row["responses"] else 0
+        print(f"{row['kind']:<10} {row['model']:<28} {row['requests']:>5} requests "
+              f"{row['responses']:>5} responses  mean latency {mean:.2f}s")
@@ -0,0 +1,395 @@
+"""
+OpenAI-compatible provider layer
+One lazily created client with configurable base URL, timeouts and connection
+pool, plus per-task model selection, so generation can be pointed at OpenAI,
+any compatible gateway or the bundled fake_openai_server.
+Every upstream call goes through call(): a per-call deadline, retries with
+jittered backoff, a circuit breaker and a cap on concurrent requests.
+recorded_call() adds record/replay through llm_cassette
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, Type, TypeVar
+
+from dotenv import load_dotenv
+
+from metrics import observe_llm_call
+from tracing import current_span, span, SPAN_KIND_CLIENT
+from llm_usage import note_call
+from llm_cassette import CASSETTE_MODE, CassetteMissError, get_cassette
+from profiler import note_llm_call
+
+logger = logging.getLogger(__name__)
+
+# The SDK (and httpx under it) takes over half a second to import; workers
+# load it on the first LLM call or in the startup warm-up instead
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+load_dotenv()
+
+DEFAULT_CHAT_MODEL = "gpt-4-turbo-preview"
+
+# Model per generation task; each falls back to LLM_MODEL, then DEFAULT_CHAT_MODEL
+# (an empty value counts as unset, as a blank line in .env leaves it)
+TASK_MODEL_ENV = {
+    "extraction": "LLM_MODEL_EXTRACTION",
+    "gap_analysis": "LLM_MODEL_GAP_ANALYSIS",
+    "cv": "LLM_MODEL_CV",
+    "cover_letter": "LLM_MODEL_COVER_LETTER"
+}
+TASK_MODELS: Dict[str, str] = {
+    task: os.getenv(env) or os.getenv("LLM_MODEL") or DEFAULT_CHAT_MODEL for task, env in TASK_MODEL_ENV.items()
+}
+
+# Unset means api.openai.com; e.g. http://localhost:8090/v1 for the fake server
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+# Whole-response read timeout; long CVs take a while to generate
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+
+# Total time budget per call, retries and waiting for a slot included
+TASK_DEADLINE_SECONDS = {
+    "extraction": float(os.getenv("LLM_DEADLINE_EXTRACTION_SECONDS", "30")),
+    "gap_analysis": float(os.getenv("LLM_DEADLINE_GAP_ANALYSIS_SECONDS", "60")),
+    "cv": float(os.getenv("LLM_DEADLINE_CV_SECONDS", "150")),
+    "cover_letter": float(os.getenv("LLM_DEADLINE_COVER_LETTER_SECONDS", "120")),
+    "embedding": float(os.getenv("LLM_DEADLINE_EMBEDDING_SECONDS", "60"))
+}
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "4"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8"))
+# Upstream requests in flight across all threads; more wait for a slot
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Consecutive failed calls that open the breaker, and how long it stays open
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_client: Optional["OpenAI"] = None
+
+
+@dataclass(frozen=True)
+class ChatResult:
+    """A chat completion reduced to what callers use, independent of the SDK's types"""
+    content: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+
+
+def model_for(task: str) -> str:
+    if task not in TASK_MODELS:
+        raise ValueError(f"Unknown LLM task {task!r}, expected one of {sorted(TASK_MODELS)}")
+    return TASK_MODELS[task]
+
+
+@lru_cache(maxsize=None)
+def provider_errors() -> Tuple[Tuple[Type[Exception], ...], Type[Exception]]:
+    """(retryable, rejected) SDK exception types, importing the SDK on first use.
+
+    Worth another attempt: rate limits, timeouts, dropped connections and 5xx.
+    Other 4xx (bad key, bad request) would fail the same way again.
+    """
+    import openai
+
+    retryable = (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError
+    )
+    return retryable, openai.APIStatusError
+
+
+def get_client() -> "OpenAI":
+    """The shared client, created on first use so importing needs no API key"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import httpx
+                from openai import OpenAI
+
+                http_client = httpx.Client(
+                    timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+                    limits=httpx.Limits(
+                        max_connections=LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS
+                    )
+                )
+                # Retries are done by call(), which knows the deadline
+                _client = OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    base_url=OPENAI_BASE_URL,
+                    http_client=http_client,
+                    max_retries=0
+                )
+                logger.info("✅ LLM provider: %s", OPENAI_BASE_URL or "api.openai.com")
+    return _client
+
+
+class LLMError(RuntimeError):
+    """An upstream call failed for good; the message says why"""
+
+
+class LLMUnavailableError(LLMError):
+    """Failed fast without calling upstream: breaker open or no slot before the deadline"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive failures -> half_open after
+    `reset_seconds`, when a single probe call decides between closed and open
+    """
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and self.retry_after() == 0:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def cancel_probe(self):
+        """An allowed call never reached the provider; let the next one probe"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("✅ LLM circuit breaker closed")
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probing = False
+            if self.state == "half_open" or (
+                self.state == "closed" and self.consecutive_failures >= self.threshold
+            ):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+                logger.warning("⚠️  LLM circuit breaker open for %.0fs after %d consecutive failures",
+                               self.reset_seconds, self.consecutive_failures)
+
+
+breaker = CircuitBreaker(LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RESET_SECONDS)
+_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+_stats_lock = threading.Lock()
+_stats = {"in_flight": 0, "calls": 0, "attempts": 0, "retries": 0, "failures": 0, "short_circuited": 0}
+
+
+def _count(**deltas):
+    with _stats_lock:
+        for key, delta in deltas.items():
+            _stats[key] += delta
+
+
+def llm_status() -> Dict:
+    """Breaker, limiter and call counters, for /api/llm-status"""
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        "breaker": {
+            "state": breaker.state,
+            "consecutive_failures": breaker.consecutive_failures,
+            "times_opened": breaker.times_opened,
+            "retry_after_seconds": round(breaker.retry_after(), 1) if breaker.state == "open" else 0
+        },
+        "concurrency": {"in_flight": stats.pop("in_flight"), "limit": LLM_MAX_CONCURRENCY},
+        "calls": stats
+    }
+
+
+def _backoff_seconds(attempt: int, error: Exception) -> float:
+    """Full jitter: uniform in [0, min(cap, base * 2^attempt)], or the server's Retry-After if it asked"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), LLM_BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    return random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def call(task: str, fn: Callable[[float], T]) -> T:
+    """Run fn(timeout) against the provider within the task's deadline.
+
+    fn gets the attempt's timeout (never past the deadline) and must pass it
+    on to the request. Retryable errors are retried with backoff while time and
+    attempts remain. Raises LLMUnavailableError without calling upstream when
+    the breaker is open, and LLMError once the call has failed for good.
+    """
+    deadline = time.monotonic() + TASK_DEADLINE_SECONDS.get(task, LLM_TIMEOUT_SECONDS)
+    retryable_errors, rejected_error = provider_errors()
+    _count(calls=1)
+    note_llm_call(task)
+
+    if not breaker.allow():
+        _count(short_circuited=1)
+        raise LLMUnavailableError(
+            f"LLM provider unavailable (circuit open), retry in {breaker.retry_after():.0f}s",
+            retry_after=breaker.retry_after()
+        )
+
+    if not _slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+        # Local congestion says nothing about the provider's health
+        breaker.cancel_probe()
+        _count(short_circuited=1)
+        raise LLMUnavailableError(f"No free LLM slot within the {task} deadline", retry_after=1.0)
+    _count(in_flight=1)
+    try:
+        attempt = 0
+        while True:
+            timeout = min(LLM_TIMEOUT_SECONDS, deadline - time.monotonic())
+            _count(attempts=1)
+            try:
+                result = fn(timeout)
+            except retryable_errors as e:
+                attempt += 1
+                pause = _backoff_seconds(attempt, e)
+                if attempt >= LLM_MAX_ATTEMPTS or time.monotonic() + pause >= deadline:
+                    breaker.record_failure()
+                    _count(failures=1)
+                    raise LLMError(f"{task} failed after {attempt} attempt(s): {e}") from e
+                _count(retries=1)
+                active = current_span()
+                if active is not None:
+                    active.add_event("retry", attempt=attempt, error=type(e).__name__, backoff_seconds=round(pause, 3))
+                logger.info("🔁 %s attempt %d failed (%s), retrying in %.1fs", task, attempt, type(e).__name__, pause,
+                            extra={"event": "llm.retry"})
+                time.sleep(pause)
+                continue
+            except rejected_error as e:
+                # The provider answered; a rejected request isn't an outage
+                breaker.record_success()
+                _count(failures=1)
+                raise LLMError(f"{task} rejected by provider: {e}") from e
+            except Exception as e:
+                # Anything else (a malformed response, a replay error) still
+                # has to settle the breaker, or a half_open probe never ends
+                breaker.record_failure()
+                _count(failures=1)
+                raise LLMError(f"{task} failed: {type(e).__name__}: {e}") from e
+            breaker.record_success()
+            return result
+    finally:
+        _count(in_flight=-1)
+        _slots.release()
+
+
+def recorded_call(task: str, request: Dict, fn: Callable[[float], T],
+                  encode: Callable[[T], object] = lambda value: value,
+                  decode: Callable[[object], T] = lambda value: value) -> T:
+    """call(), recording to or replaying from the LLM cassette when one is configured.
+
+    `request` is everything that determines the response (model, input,
+    parameters) and is what recordings are matched on; fn's result must be
+    JSON-serialisable after `encode`. Replays still take a slot and honour the
+    deadline, so concurrency behaves as it did live. A replay with no matching
+    recording raises LLMError.
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return call(task, fn)
+
+    if CASSETTE_MODE == "replay":
+        try:
+            recorded = cassette.lookup(request)
+        except CassetteMissError as e:
+            raise LLMError(str(e)) from e
+        return decode(call(task, lambda timeout: cassette.play(recorded, timeout)))
+
+    latency = {}
+
+    def timed(timeout: float) -> T:
+        started = time.perf_counter()
+        result = fn(timeout)
+        # The successful attempt's latency; retries and backoff aren't replayed
+        latency["seconds"] = time.perf_counter() - started
+        return result
+
+    result = call(task, timed)
+    cassette.record(request, encode(result), latency["seconds"])
+    return result
+
+
+def _complete(model: str, messages: List[Dict], timeout: float, kwargs: Dict) -> ChatResult:
+    response = get_client().chat.completions.create(model=model, messages=messages, timeout=timeout, **kwargs)
+    usage = response.usage
+    return ChatResult(
+        content=response.choices[0].message.content or "",
+        model=response.model,
+        prompt_tokens=usage.prompt_tokens if usage else 0,
+        completion_tokens=usage.completion_tokens if usage else 0
+    )
+
+
+def chat(task: str, messages: List[Dict], **kwargs) -> ChatResult:
+    """Run a chat completion with the model configured for `task`.
+
+    Extra keyword arguments (temperature, response_format, ...) are passed to
+    the API unchanged. Raises LLMError; the callers decide how to degrade.
+    """
+    model = model_for(task)
+    started = time.perf_counter()
+    try:
+        with span(f"llm.chat {task}", SPAN_KIND_CLIENT, **{"llm.task": task, "llm.model": model}) as chat_span:
+            result = recorded_call(
+                task,
+                {"kind": "chat", "model": model, "messages": messages, **kwargs},
+                lambda timeout: _complete(model, messages, timeout, kwargs),
+                encode=asdict,
+                decode=lambda recorded: ChatResult(**recorded)
+            )
+            if chat_span is not None:
+                chat_span.set_attribute("llm.prompt_tokens", result.prompt_tokens)
+                chat_span.set_attribute("llm.completion_tokens", result.completion_tokens)
+    except LLMUnavailableError:
+        observe_llm_call(task, model, time.perf_counter() - started, "short_circuited")
+        raise
+    except LLMError:
+        observe_llm_call(task, model, time.perf_counter() - started, "error")
+        raise
+    # Labelled with the configured model: result.model carries dated
+    # snapshot names that would multiply the series
+    observe_llm_call(task, model, time.perf_counter() - started, "ok",
+                     result.prompt_tokens, result.completion_tokens)
+    note_call(task, model, result.prompt_tokens, result.completion_tokens)
+    return result
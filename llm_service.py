@@ -1,31 +1,14 @@
-import os
 import json
-from openai import OpenAI
+import logging
 from typing import List, Dict
-from dotenv import load_dotenv
 
-load_dotenv()
+from llm_provider import chat, LLMError
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger(__name__)
 
-def generate_embedding(text: str) -> List[float]:
-    """Generate embeddings using OpenAI's text-embedding-3-small model"""
-    try:
-        response = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text,
-            dimensions=1024
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        print(f"Error generating embedding: {e}")
-        import hashlib
-        hash_obj = hashlib.sha256(text.encode())
-        hash_bytes = hash_obj.digest()
-        vector = []
-        for i in range(1024):
-            vector.append((hash_bytes[i % len(hash_bytes)] / 255.0) * 2 - 1)
-        return vector
+# Used by embeddings.OpenAIEmbeddingBackend
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1024
 
 def extract_skills_from_job(job_description: str) -> List[str]:
     """Extract technical skills and technologies from job description"""
@@ -49,16 +32,16 @@ def extract_skills_from_job(job_description: str) -> List[str]:
     """
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[{"role": "user", "content": prompt}],
+        response = chat(
+            "extraction",
+            [{"role": "user", "content": prompt}],
             temperature=0.1,
             response_format={"type": "json_object"}
         )
-        result = json.loads(response.choices[0].message.content)
+        result = json.loads(response.content)
         return result.get("skills", [])
     except Exception as e:
-        print(f"Error extracting skills: {e}")
+        logger.warning("Error extracting skills: %s", e)
         return []
 
 def analyze_skills_gap(candidate_chunks: List[Dict], job_description: str) -> Dict:
@@ -86,14 +69,14 @@ Return ONLY valid JSON:
 }}"""
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[{"role": "system", "content": "You are a technical recruiter who values data over fluff."},
-                      {"role": "user", "content": prompt}],
+        response = chat(
+            "gap_analysis",
+            [{"role": "system", "content": "You are a technical recruiter who values data over fluff."},
+             {"role": "user", "content": prompt}],
             temperature=0.2,
             response_format={"type": "json_object"}
         )
-        return json.loads(response.choices[0].message.content)
+        return json.loads(response.content)
     except Exception as e:
         return {"error": str(e)}
 
@@ -242,15 +225,18 @@ CRITICAL INSTRUCTIONS:
 """
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
+        response = chat(
+            "cv",
+            [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
             temperature=0.2
         )
-        return response.choices[0].message.content
+        return response.content
+    except LLMError:
+        # No document is better than an error message saved as one
+        raise
     except Exception as e:
         return f"Error: {str(e)}"
 
@@ -337,14 +323,17 @@ INSTRUCTIONS:
 """
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
+        response = chat(
+            "cover_letter",
+            [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
             temperature=0.4
         )
-        return response.choices[0].message.content
+        return response.content
+    except LLMError:
+        # No document is better than an error message saved as one
+        raise
     except Exception as e:
         return f"Error: {str(e)}"
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+LLM token and cost accounting
+llm_provider.chat reports every completed call to the collector active in the
+current context; create_job_application saves them as LLMUsage rows against
+the application, and the rate limiter can budget on tokens or dollars
+"""
+
+import json
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import LLMUsage
+
+logger = logging.getLogger(__name__)
+
+# USD per million (prompt, completion) tokens. LLM_PRICES (JSON, same shape)
+# adds or overrides entries, e.g. {"my-gateway-model": [0.5, 1.5]}
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4-turbo-preview": (10.0, 30.0),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.0),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.0, 8.0),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+MODEL_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.getenv("LLM_PRICES", "{}")).items()})
+
+# "requests" counts generations (MAX_CV_PER_DAY); "tokens" and "cost" cap each
+# client's rolling 24h usage at DAILY_TOKEN_BUDGET / DAILY_COST_BUDGET_USD
+BUDGET_MODE = os.getenv("RATE_LIMIT_MODE", "requests").lower()
+DAILY_TOKEN_BUDGET = int(os.getenv("DAILY_TOKEN_BUDGET", "100000"))
+DAILY_COST_BUDGET_USD = Decimal(os.getenv("DAILY_COST_BUDGET_USD", "1.00"))
+# Spend cap across all clients, enforced in every mode; empty disables it
+GLOBAL_DAILY_COST_BUDGET_USD = Decimal(os.getenv("GLOBAL_DAILY_COST_BUDGET_USD") or "0") or None
+
+_collector: ContextVar[Optional[List["UsageRecord"]]] = ContextVar("llm_usage_collector", default=None)
+_unpriced_warned = set()
+
+
+@dataclass(frozen=True)
+class UsageRecord:
+    task: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    cost_usd: Decimal
+
+
+def price_for(model: str) -> Optional[Tuple[float, float]]:
+    """Exact match first, then the longest known prefix ("gpt-4o-2024-08-06" -> "gpt-4o")"""
+    if model in MODEL_PRICES:
+        return MODEL_PRICES[model]
+    prefixes = [known for known in MODEL_PRICES if model.startswith(known)]
+    return MODEL_PRICES[max(prefixes, key=len)] if prefixes else None
+
+
+def cost_for(model: str, prompt_tokens: int, completion_tokens: int) -> Decimal:
+    prices = price_for(model)
+    if prices is None:
+        if model not in _unpriced_warned:
+            _unpriced_warned.add(model)
+            logger.warning("⚠️  No price for model %r, its calls are recorded at $0 (set LLM_PRICES)", model)
+        return Decimal("0")
+    prompt_price, completion_price = prices
+    cost = (Decimal(prompt_tokens) * Decimal(str(prompt_price))
+            + Decimal(completion_tokens) * Decimal(str(completion_price))) / Decimal(1_000_000)
+    return cost.quantize(Decimal("0.000001"))
+
+
+@contextmanager
+def collect_usage():
+    """Collect the LLM calls made in this context (and threads it spawns via copied contexts)"""
+    calls: List[UsageRecord] = []
+    token = _collector.set(calls)
+    try:
+        yield calls
+    finally:
+        _collector.reset(token)
+
+
+def note_call(task: str, model: str, prompt_tokens: int, completion_tokens: int):
+    """Called by llm_provider.chat after every completed call; a no-op outside collect_usage()"""
+    calls = _collector.get()
+    if calls is not None:
+        calls.append(UsageRecord(task, model, prompt_tokens, completion_tokens,
+                                 cost_for(model, prompt_tokens, completion_tokens)))
+
+
+def record_usage(db: Session, calls: List[UsageRecord], client_ip: Optional[str], application_id=None):
+    """Add the collected calls to the session (the caller commits) and clear the list"""
+    db.add_all([
+        LLMUsage(
+            application_id=application_id,
+            client_ip=client_ip,
+            task=call.task,
+            model=call.model,
+            prompt_tokens=call.prompt_tokens,
+            completion_tokens=call.completion_tokens,
+            cost_usd=call.cost_usd
+        )
+        for call in calls
+    ])
+    calls.clear()
+
+
+def usage_since(db: Session, since: datetime, client_ip: Optional[str] = None) -> Tuple[int, Decimal]:
+    """(tokens, cost) recorded since `since`, for one client or everyone"""
+    query = db.query(
+        func.coalesce(func.sum(LLMUsage.prompt_tokens + LLMUsage.completion_tokens), 0),
+        func.coalesce(func.sum(LLMUsage.cost_usd), 0)
+    ).filter(LLMUsage.created_at >= since)
+    if client_ip is not None:
+        query = query.filter(LLMUsage.client_ip == client_ip)
+    tokens, cost = query.one()
+    return int(tokens), Decimal(cost)
+
+
+def budget_status(db: Session, client_ip: str) -> Dict:
+    """The client's rolling 24h usage against its token or cost budget"""
+    tokens, cost = usage_since(db, datetime.utcnow() - timedelta(days=1), client_ip)
+    if BUDGET_MODE == "tokens":
+        used, limit = tokens, DAILY_TOKEN_BUDGET
+        remaining = max(0, limit - used)
+    else:
+        used, limit = float(cost), float(DAILY_COST_BUDGET_USD)
+        remaining = round(max(0.0, limit - used), 6)
+    return {"mode": BUDGET_MODE, "used": used, "limit": limit, "remaining": remaining}
+
+
+def global_budget_exhausted(db: Session) -> bool:
+    if GLOBAL_DAILY_COST_BUDGET_USD is None:
+        return False
+    _, cost = usage_since(db, datetime.utcnow() - timedelta(days=1))
+    return cost >= GLOBAL_DAILY_COST_BUDGET_USD
+
+
+def daily_costs(db: Session, days: int) -> Dict:
+    """Per day and client: generations, calls, tokens and cost; plus per-model totals"""
+    since = datetime.utcnow() - timedelta(days=days)
+    day = func.date(LLMUsage.created_at)
+    rows = db.query(
+        day.label("day"),
+        LLMUsage.client_ip,
+        func.count(func.distinct(LLMUsage.application_id)).label("applications"),
+        func.count(LLMUsage.id).label("calls"),
+        func.sum(LLMUsage.prompt_tokens).label("prompt_tokens"),
+        func.sum(LLMUsage.completion_tokens).label("completion_tokens"),
+        func.sum(LLMUsage.cost_usd).label("cost_usd")
+    ).filter(LLMUsage.created_at >= since).group_by(day, LLMUsage.client_ip).order_by(day.desc(), LLMUsage.client_ip).all()
+
+    models = db.query(
+        LLMUsage.model,
+        func.count(LLMUsage.id).label("calls"),
+        func.sum(LLMUsage.prompt_tokens).label("prompt_tokens"),
+        func.sum(LLMUsage.completion_tokens).label("completion_tokens"),
+        func.sum(LLMUsage.cost_usd).label("cost_usd")
+    ).filter(LLMUsage.created_at >= since).group_by(LLMUsage.model).order_by(LLMUsage.model).all()
+
+    return {
+        "days": days,
+        "daily": [
+            {**row._asdict(), "day": str(row.day), "cost_usd": float(row.cost_usd or 0)}
+            for row in rows
+        ],
+        "by_model": [{**row._asdict(), "cost_usd": float(row.cost_usd or 0)} for row in models],
+        "total_cost_usd": float(sum(Decimal(row.cost_usd or 0) for row in models))
+    }
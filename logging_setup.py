@@ -0,0 +1,163 @@
+"""
+Structured, non-blocking logging
+Records are queued by the calling thread and written by a background
+QueueListener, so request handlers never block on stdout. Each line is one
+JSON object with the request's trace id (X-Trace-Id), per-module levels come
+from LOG_LEVELS and high-frequency events can be sampled per request.
+
+LOG_FORMAT: "json" (default) or "text"
+LOG_LEVEL: root level (default INFO)
+LOG_LEVELS: per-logger overrides, e.g. "embedding_worker=WARNING,main=DEBUG"
+LOG_SAMPLE_RATES: share of requests whose `event` lines are kept, e.g. "retrieval.step=0.1"
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from metrics import LOG_RECORDS_DROPPED
+from tracing import current_span
+
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+DEFAULT_SAMPLE_RATES = "retrieval.step=0.1,rate_limit.hit=0.1,admission.rejected=0.1"
+# The HTTP clients log every request at INFO
+DEFAULT_LEVELS = "httpx=WARNING,httpcore=WARNING,openai=WARNING"
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "trace_id", "span_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+def _parse_pairs(raw: str) -> Dict[str, str]:
+    pairs = {}
+    for item in raw.split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            pairs[key.strip()] = value.strip()
+    return pairs
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps the trace and span id while still in the logging thread (the queue loses the context)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        active = current_span()
+        record.trace_id = active.trace.trace_id if active else None
+        record.span_id = active.span_id if active else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a share of records whose `event` has a sample rate.
+
+    The decision hashes the trace id, so a kept request keeps all its lines
+    for that event; outside a request it is random. Warnings and errors are
+    never sampled away.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, "event", None))
+        if rate is None or rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        record.sample_rate = rate
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            return zlib.crc32(f"{trace_id}:{record.event}".encode()) / 2 ** 32 < rate
+        return random.random() < rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks: when the writer falls behind and the queue is full, the record is dropped and counted"""
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Like the base class, but keeps the traceback as exc_text for the
+        # JSON formatter instead of folding it into the message
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+            entry["span_id"] = record.span_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        trace_id = getattr(record, "trace_id", None)
+        return f"{line} [trace {trace_id}]" if trace_id else line
+
+
+def configure_logging(log_format: Optional[str] = None):
+    """Install the queue handler on the root logger and start the writer thread (idempotent).
+
+    Scripts pass log_format="text" to stay readable whatever LOG_FORMAT says.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(JsonFormatter() if (log_format or LOG_FORMAT) == "json" else TextFormatter())
+
+        handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        handler.addFilter(RequestContextFilter())
+        rates = {event: float(rate) for event, rate in _parse_pairs(
+            os.getenv("LOG_SAMPLE_RATES", DEFAULT_SAMPLE_RATES)
+        ).items()}
+        handler.addFilter(SamplingFilter(rates))
+
+        root = logging.getLogger()
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(handler)
+        levels = {**_parse_pairs(DEFAULT_LEVELS), **_parse_pairs(os.getenv("LOG_LEVELS", ""))}
+        for name, level in levels.items():
+            logging.getLogger(name).setLevel(level.upper())
+
+        _listener = logging.handlers.QueueListener(handler.queue, stream)
+        _listener.start()
+        # Flush what is still queued when the worker exits
+        atexit.register(_listener.stop)
@@ -1,27 +1,58 @@
-from fastapi import FastAPI, Depends, HTTPException, Request
+import time
+# Startup timing starts here, before the (heavy) imports below
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, Query, File, UploadFile
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi.responses import FileResponse, StreamingResponse, ORJSONResponse
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import desc, func, tuple_
+from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel
 from typing import List, Optional, Dict
 from datetime import datetime, timedelta
 import uuid
 import os
 import json
+import base64
+import html
+import logging
+import threading
 from collections import defaultdict
-from database import get_db, init_db
+from database import get_db, init_db, engine, SessionLocal
 from models import (
     ExperienceBlock, PersonalInfo, StyleGuideline,
-    JobApplication, ApplicationStatus, BlockType
+    JobApplication, ApplicationStatus, BlockType, EmbeddingStatus
 )
 from llm_service import (
-    generate_embedding, analyze_skills_gap,
-    generate_tailored_cv, generate_cover_letter,
+    analyze_skills_gap, generate_tailored_cv, generate_cover_letter,
     extract_skills_from_job
 )
+from llm_provider import llm_status, get_client, provider_errors, LLMUnavailableError
+import llm_usage
+from llm_usage import collect_usage, record_usage, budget_status, daily_costs
+from embeddings import generate_embedding, get_backend, EmbeddingError
 from docx_generator import generate_cv_docx, generate_cover_letter_docx
+from exports import iter_application_bundle, iter_profile_ndjson, personal_info_dict, block_export_dict
+from block_import import import_experience_blocks, hash_block, embedding_text
+from profile_cache import get_profile_snapshot, ProfileSnapshot
+from http_cache import conditional_get, CompressionMiddleware
+from metrics import MetricsMiddleware, instrument_engine, metrics_payload, stage_timer, STARTUP_SECONDS
+import tracing
+from tracing import span, TracingMiddleware, TRACE_ID_HEADER
+import profiler
+from profiler import ProfiledRoute, ProfilerMiddleware, PROFILE_ID_HEADER
+from admission import AdmissionMiddleware, admission_status, size_threadpool
+import embedding_worker
+from backup_format import (
+    write_backup, read_backup, vectors_compatible,
+    BackupFormatError, BACKUP_EXTENSION, BACKUP_MEDIA_TYPE
+)
+from logging_setup import configure_logging
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 # --- Security Configuration ---
 security = HTTPBearer()
@@ -39,14 +70,19 @@ def verify_admin_key(auth: HTTPAuthorizationCredentials = Depends(security)):
 browse_tracker = defaultdict(list)  # For GET requests
 ai_tracker = defaultdict(list)      # For POST /api/applications
 
+def get_client_ip(request: Request) -> str:
+    """Client address, from X-Forwarded-For when behind nginx"""
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
 def check_general_rate_limit(request: Request):
     """60 requests per hour for browsing"""
     if os.getenv("ENABLE_RATE_LIMITING", "false").lower() != "true":
         return
 
-    # Standardize IP extraction
-    forwarded = request.headers.get("X-Forwarded-For")
-    client_ip = forwarded.split(",")[0] if forwarded else request.client.host
+    client_ip = get_client_ip(request)
     now = datetime.now()
 
     # 1. Clean and check (1 hour window)
@@ -55,7 +91,7 @@ def check_general_rate_limit(request: Request):
     # 2. Check limit
     limit = int(os.getenv("GENERAL_RATE_LIMIT", "60"))
     if len(browse_tracker[client_ip]) >= limit:
-        print(f"⚠️ General Rate Limit hit: {client_ip}")
+        logger.info("⚠️ General Rate Limit hit: %s", client_ip, extra={"event": "rate_limit.hit", "client_ip": client_ip})
         raise HTTPException(
             status_code=429,
             detail=f"Browsing limit of {limit} requests per hour reached."
@@ -64,13 +100,23 @@ def check_general_rate_limit(request: Request):
     # 3. Log
     browse_tracker[client_ip].append(now)
 
-def check_ai_usage_allowed(request: Request):
-    """Checks if the user has attempts left without consuming one"""
+def check_ai_usage_allowed(request: Request, db: Session):
+    """Checks if the user has attempts (or token/cost budget) left without consuming any"""
+    # The service-wide spend cap holds even with per-client limits off
+    if llm_usage.global_budget_exhausted(db):
+        raise HTTPException(status_code=429, detail="Daily AI spend limit for the service reached.")
+
     if os.getenv("ENABLE_RATE_LIMITING", "false").lower() != "true":
         return
 
-    forwarded = request.headers.get("X-Forwarded-For")
-    client_ip = forwarded.split(",")[0] if forwarded else request.client.host
+    client_ip = get_client_ip(request)
+
+    if llm_usage.BUDGET_MODE != "requests":
+        # Checked before generating, so one generation may overshoot the budget
+        if budget_status(db, client_ip)["remaining"] <= 0:
+            raise HTTPException(status_code=429, detail="Daily AI budget reached.")
+        return
+
     now = datetime.now()
 
     # Clean old entries
@@ -84,9 +130,7 @@ def log_ai_usage_success(request: Request):
     if os.getenv("ENABLE_RATE_LIMITING", "false").lower() != "true":
         return
 
-    forwarded = request.headers.get("X-Forwarded-For")
-    client_ip = forwarded.split(",")[0] if forwarded else request.client.host
-    ai_tracker[client_ip].append(datetime.now())
+    ai_tracker[get_client_ip(request)].append(datetime.now())
 
 # Create the app with a dynamic root_path
 app = FastAPI(
@@ -94,6 +138,8 @@ app = FastAPI(
     # This allows Swagger to work behind the Nginx /api prefix
     root_path=os.getenv("PROXY_ROOT_PATH", "")
 )
+# Endpoints can run under an admin-requested profiler (X-Profile header)
+app.router.route_class = ProfiledRoute
 
 # Create output directory for Word docs
 OUTPUT_DIR = "./generated_docs"
@@ -106,14 +152,34 @@ origins = [origin.strip() for origin in raw_origins]
 if "http://localhost:3000" not in origins: origins.append("http://localhost:3000")
 if "http://localhost:5173" not in origins: origins.append("http://localhost:5173")
 
+# Separate concurrency limits and wait queues for browse, admin and generation
+# requests; added first so it sits inside CORS and its 503s carry CORS headers
+app.add_middleware(AdmissionMiddleware, admin_key=ADMIN_KEY)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", TRACE_ID_HEADER, PROFILE_ID_HEADER],
 )
 
+# Compresses JSON, NDJSON and markdown bodies for clients that accept gzip/brotli
+app.add_middleware(CompressionMiddleware)
+
+# Admin requests with X-Profile are profiled, profile id returned in X-Profile-Id
+app.add_middleware(ProfilerMiddleware, admin_key=ADMIN_KEY)
+profiler.instrument_engine(engine)
+
+# Root span per request, trace id returned in X-Trace-Id
+app.add_middleware(TracingMiddleware)
+tracing.instrument_engine(engine)
+
+# Added last so it is outermost and times compression too
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+
 # --- Pydantic Models ---
 
 class ExperienceBlockCreate(BaseModel):
@@ -140,8 +206,10 @@ class ExperienceBlockResponse(BaseModel):
     metadata_tags: Optional[List[str]] = []
     block_type: Optional[str] = None
     priority: Optional[str] = None
+    embedding_status: Optional[str] = None
     created_at: datetime
     updated_at: datetime
+    snippet: Optional[str] = None  # Escaped HTML with <mark> around matches, only set for search results
     class Config:
         from_attributes = True
 
@@ -201,6 +269,20 @@ class JobApplicationResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class JobApplicationSummary(BaseModel):
+    """List view of an application without the large generated text columns"""
+    id: uuid.UUID
+    company_name: str
+    job_title: str
+    status: ApplicationStatus
+    notes: Optional[str]
+    job_url: Optional[str] = None
+    applied_date: Optional[datetime]
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    class Config:
+        from_attributes = True
+
 class StyleGuidelineResponse(BaseModel):
     id: uuid.UUID
     name: str
@@ -217,101 +299,225 @@ class DataExportResponse(BaseModel):
     experience_blocks: List[Dict]
 
 class DataImportRequest(BaseModel):
-    personal_info: Dict
+    # Omitted (or empty) leaves the stored personal info as it is
+    personal_info: Optional[Dict] = None
     experience_blocks: List[Dict]
 
+class BlockHashesRequest(BaseModel):
+    hashes: List[str]
+
 # --- Helper Functions ---
 
-def select_relevant_blocks(job_description: str, db: Session) -> List[ExperienceBlock]:
-    """Hybrid selection strategy for experience blocks"""
+# Columns served by the experience block read endpoints. The embedding vector
+# is never part of a read path.
+BLOCK_READ_COLUMNS = (
+    ExperienceBlock.id,
+    ExperienceBlock.title,
+    ExperienceBlock.company,
+    ExperienceBlock.content,
+    ExperienceBlock.metadata_tags,
+    ExperienceBlock.block_type,
+    ExperienceBlock.priority,
+    ExperienceBlock.embedding_status,
+    ExperienceBlock.created_at,
+    ExperienceBlock.updated_at
+)
+BLOCK_READ_OPTIONS = load_only(*BLOCK_READ_COLUMNS)
+
+# ts_headline returns the block's raw content, so it marks matches with
+# private-use characters; the text is escaped before they become <mark> tags
+SNIPPET_START, SNIPPET_STOP = "\ue000", "\ue001"
+
+def highlight_snippet(headline: Optional[str]) -> Optional[str]:
+    """HTML-safe snippet with <mark> around the matched words"""
+    if headline is None:
+        return None
+    return html.escape(headline).replace(SNIPPET_START, "<mark>").replace(SNIPPET_STOP, "</mark>")
 
-    job_embedding = generate_embedding(job_description)
-    job_skills = extract_skills_from_job(job_description)
-    print(f"📊 Extracted {len(job_skills)} skills from job: {job_skills[:10]}")
+def rows_response(rows: List[Dict], response: Response) -> ORJSONResponse:
+    """Encode trusted DB rows straight to JSON with orjson, skipping response_model validation.
+
+    The rows must already have the response model's shape (orjson writes UUIDs,
+    naive datetimes and enum values the same way Pydantic does). Returning a
+    Response bypasses FastAPI's merge of headers set on the injected response
+    (ETag, X-Next-Cursor), so they are copied across here.
+    """
+    return ORJSONResponse(rows, headers=dict(response.headers))
+
+def select_relevant_blocks(job_description: str, db: Session, profile: ProfileSnapshot) -> List[ExperienceBlock]:
+    """Hybrid selection strategy for experience blocks.
+
+    Fixed blocks (pillars, skills summary, employment, education) come from the
+    profile snapshot; only skill and vector matching query the database.
+    """
+
+    with stage_timer("job_embedding"), span("retrieval.job_embedding"):
+        try:
+            job_embedding = generate_embedding(job_description)
+        except EmbeddingError as e:
+            # No usable vector: skip the vector stage rather than rank by noise
+            logger.warning("⚠️  Job embedding failed, skipping vector matching: %s", e)
+            job_embedding = None
+    with stage_timer("skill_extraction"), span("retrieval.skill_extraction"):
+        job_skills = extract_skills_from_job(job_description)
+    logger.info("📊 Extracted %d skills from job: %s", len(job_skills), job_skills[:10],
+                extra={"event": "retrieval.step", "skills": len(job_skills)})
 
     selected_blocks = []
     selected_ids = set()
 
     # 1. ALWAYS include pillar projects
-    pillar_blocks = db.query(ExperienceBlock).filter(
-        ExperienceBlock.block_type == BlockType.PILLAR_PROJECT
-    ).all()
+    pillar_blocks = profile.pillar_blocks
 
     for block in pillar_blocks:
         selected_blocks.append(block)
         selected_ids.add(block.id)
-    print(f"✅ Added {len(pillar_blocks)} pillar projects")
+    logger.info("✅ Added %d pillar projects", len(pillar_blocks), extra={"event": "retrieval.step"})
 
     # 2. ALWAYS include skills summary
-    skills_summary = db.query(ExperienceBlock).filter(
-        ExperienceBlock.block_type == BlockType.SKILLS_SUMMARY
-    ).first()
+    skills_summary = profile.skills_summary
 
     if skills_summary:
         selected_blocks.append(skills_summary)
         selected_ids.add(skills_summary.id)
-        print(f"✅ Added skills summary")
+        logger.info("✅ Added skills summary", extra={"event": "retrieval.step"})
 
     # 3. Find blocks matching required skills
     skill_matched_blocks = []
-    for skill in job_skills:
-        matching_blocks = db.query(ExperienceBlock).filter(
-            ExperienceBlock.id.notin_(selected_ids),
-            ExperienceBlock.block_type.in_([BlockType.SUPPORTING_PROJECT, BlockType.PILLAR_PROJECT])
-        ).all()
-
-        for block in matching_blocks:
-            if block.metadata_tags and any(
-                skill.lower() in tag.lower() for tag in block.metadata_tags
-            ):
-                if block.id not in selected_ids:
-                    skill_matched_blocks.append(block)
-                    selected_ids.add(block.id)
-                    break
+    with stage_timer("skill_match"), span("retrieval.skill_match"):
+        for skill in job_skills:
+            matching_blocks = db.query(ExperienceBlock).filter(
+                ExperienceBlock.id.notin_(selected_ids),
+                ExperienceBlock.block_type.in_([BlockType.SUPPORTING_PROJECT, BlockType.PILLAR_PROJECT])
+            ).all()
+
+            for block in matching_blocks:
+                if block.metadata_tags and any(
+                    skill.lower() in tag.lower() for tag in block.metadata_tags
+                ):
+                    if block.id not in selected_ids:
+                        skill_matched_blocks.append(block)
+                        selected_ids.add(block.id)
+                        break
 
     selected_blocks.extend(skill_matched_blocks)
-    print(f"✅ Added {len(skill_matched_blocks)} skill-matched projects")
-
-    # 4. Vector search for additional projects
-    vector_blocks = db.query(ExperienceBlock).filter(
-        ExperienceBlock.id.notin_(selected_ids),
-        ExperienceBlock.block_type == BlockType.SUPPORTING_PROJECT
-    ).order_by(
-        ExperienceBlock.embedding.cosine_distance(job_embedding)
-    ).limit(3).all()
+    logger.info("✅ Added %d skill-matched projects", len(skill_matched_blocks), extra={"event": "retrieval.step"})
+
+    # 4. Vector search for additional projects. Blocks still waiting on the
+    # embedding worker, or embedded by another backend, are left out.
+    vector_blocks = []
+    if job_embedding is not None:
+        with stage_timer("vector_search"), span("retrieval.vector_search"):
+            vector_blocks = db.query(ExperienceBlock).filter(
+                ExperienceBlock.id.notin_(selected_ids),
+                ExperienceBlock.block_type == BlockType.SUPPORTING_PROJECT,
+                ExperienceBlock.embedding_status == EmbeddingStatus.READY,
+                ExperienceBlock.embedding_model == get_backend().name
+            ).order_by(
+                ExperienceBlock.embedding.cosine_distance(job_embedding)
+            ).limit(3).all()
 
     selected_blocks.extend(vector_blocks)
     for block in vector_blocks:
         selected_ids.add(block.id)
-    print(f"✅ Added {len(vector_blocks)} vector-matched projects")
+    logger.info("✅ Added %d vector-matched projects", len(vector_blocks), extra={"event": "retrieval.step"})
 
     # 5. Add most recent employment
-    employment = db.query(ExperienceBlock).filter(
-        ExperienceBlock.block_type == BlockType.EMPLOYMENT
-    ).order_by(desc(ExperienceBlock.created_at)).first()
+    employment = profile.latest_employment
 
     if employment and employment.id not in selected_ids:
         selected_blocks.append(employment)
         selected_ids.add(employment.id)
-        print(f"✅ Added employment history")
+        logger.info("✅ Added employment history", extra={"event": "retrieval.step"})
 
     # 6. Add education
-    education = db.query(ExperienceBlock).filter(
-        ExperienceBlock.block_type == BlockType.EDUCATION
-    ).first()
+    education = profile.education
 
     if education and education.id not in selected_ids:
         selected_blocks.append(education)
-        print(f"✅ Added education")
+        logger.info("✅ Added education", extra={"event": "retrieval.step"})
 
-    print(f"📦 Total blocks selected: {len(selected_blocks)}")
+    logger.info("📦 Total blocks selected: %d", len(selected_blocks),
+                extra={"event": "retrieval.selected", "blocks": len(selected_blocks)})
     return selected_blocks
 
+def encode_application_cursor(created_at: datetime, application_id: uuid.UUID) -> str:
+    """Opaque keyset cursor pointing just past the given row"""
+    raw = f"{created_at.isoformat()}|{application_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_application_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, application_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(application_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
 # --- Lifecycle ---
 
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+def prime_db_pool():
+    """Open the pool's connections now instead of on the first requests"""
+    connections = []
+    try:
+        for _ in range(engine.pool.size() if hasattr(engine.pool, "size") else 1):
+            connections.append(engine.connect())
+    finally:
+        for conn in connections:
+            conn.close()
+
+def _warm_llm_client():
+    provider_errors()  # imports the SDK
+    if os.getenv("OPENAI_API_KEY"):
+        get_client()
+
+def _warm_docx():
+    from docx import Document
+    Document()  # loads and parses the default template
+
+def _warm_profile_snapshot():
+    db = SessionLocal()
+    try:
+        get_profile_snapshot(db)
+    finally:
+        db.close()
+
+def warm_up():
+    """First-use costs moved off the request path: the LLM SDK and client,
+    python-docx and its default template, the embedding backend and the
+    profile snapshot. Runs in the background, so the worker is ready first.
+    """
+    started = time.perf_counter()
+    for step in (_warm_llm_client, _warm_docx, get_backend, _warm_profile_snapshot):
+        try:
+            step()
+        except Exception as e:
+            logger.warning("⚠️  Warm-up step %s failed: %s", step.__name__, e)
+    elapsed = time.perf_counter() - started
+    STARTUP_SECONDS.labels(phase="warmup").set(elapsed)
+    logger.info("🔥 Warm-up done in %.0f ms", elapsed * 1000)
+
 @app.on_event("startup")
 def startup_event():
+    started = time.perf_counter()
     init_db()
+    schema_seconds = time.perf_counter() - started
+    prime_db_pool()
+    size_threadpool()
+    embedding_worker.start()
+    if STARTUP_WARMUP:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    STARTUP_SECONDS.labels(phase="import").set(IMPORT_SECONDS)
+    STARTUP_SECONDS.labels(phase="schema").set(schema_seconds)
+    logger.info("🚀 Ready: imports %.0f ms, schema check %.0f ms, startup %.0f ms",
+                IMPORT_SECONDS * 1000, schema_seconds * 1000, (time.perf_counter() - started) * 1000)
+
+@app.on_event("shutdown")
+def shutdown_event():
+    embedding_worker.stop()
 
 # --- Endpoints ---
 
@@ -346,7 +552,7 @@ def create_personal_info(info: PersonalInfoCreate, db: Session = Depends(get_db)
 
 @app.get("/api/personal-info",
         response_model=PersonalInfoResponse,
-        dependencies=[Depends(check_general_rate_limit)])
+        dependencies=[Depends(check_general_rate_limit), Depends(conditional_get("personal_info"))])
 def get_personal_info(db: Session = Depends(get_db)):
     info = db.query(PersonalInfo).first()
     if not info:
@@ -357,7 +563,7 @@ def get_personal_info(db: Session = Depends(get_db)):
 @app.post("/api/experience-blocks", response_model=ExperienceBlockResponse,
           dependencies=[Depends(verify_admin_key)])
 def create_experience_block(exp: ExperienceBlockCreate, db: Session = Depends(get_db)):
-    embedding = generate_embedding(exp.content)
+    """Create an experience block; its embedding is generated in the background"""
     block_type_enum = BlockType(exp.block_type) if exp.block_type else BlockType.SUPPORTING_PROJECT
 
     db_exp = ExperienceBlock(
@@ -367,11 +573,17 @@ def create_experience_block(exp: ExperienceBlockCreate, db: Session = Depends(ge
         metadata_tags=exp.metadata_tags,
         block_type=block_type_enum,
         priority=exp.priority,
-        embedding=embedding
+        embedding_status=EmbeddingStatus.PENDING
     )
+    db_exp.content_hash = hash_block(db_exp)
     db.add(db_exp)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="An experience block with this title already exists")
     db.refresh(db_exp)
+    embedding_worker.notify()
     return db_exp
 
 @app.put("/api/experience-blocks/{block_id}", response_model=ExperienceBlockResponse,
@@ -381,7 +593,7 @@ def update_experience_block(
     exp: ExperienceBlockUpdate,
     db: Session = Depends(get_db)
 ):
-    """Update an existing experience block"""
+    """Update an existing experience block, queueing it for re-embedding if its text changed"""
     block = db.query(ExperienceBlock).filter(ExperienceBlock.id == block_id).first()
     if not block:
         raise HTTPException(status_code=404, detail="Experience block not found")
@@ -389,37 +601,51 @@ def update_experience_block(
     # Update fields that are provided
     update_data = exp.dict(exclude_unset=True)
     
-    # Regenerate embedding if content changed
-    regenerate_embedding = False
+    # Re-embed only if the embedded text changed
+    previous_text = embedding_text(block.title, block.company, block.content, block.metadata_tags)
     for key, value in update_data.items():
         if key == "block_type" and value:
             setattr(block, key, BlockType(value))
         else:
             setattr(block, key, value)
-        
-        if key == "content":
-            regenerate_embedding = True
     
+    regenerate_embedding = (
+        embedding_text(block.title, block.company, block.content, block.metadata_tags) != previous_text
+        or block.embedding_status == EmbeddingStatus.FAILED
+    )
     if regenerate_embedding:
-        combined_text = f"{block.title} at {block.company}: {block.content} Keywords: {', '.join(block.metadata_tags or [])}"
-        block.embedding = generate_embedding(combined_text)
+        # The worker fills the vector in; a stale one must not be searched meanwhile
+        block.embedding = None
+        block.embedding_status = EmbeddingStatus.PENDING
+        block.embedding_attempts = 0
+        # A worker batch already embedding the old text loses its claim
+        block.embedding_claimed_by = None
+        block.embedding_claimed_at = None
     
+    block.content_hash = hash_block(block)
     block.updated_at = datetime.utcnow()
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="An experience block with this title already exists")
     db.refresh(block)
+    if regenerate_embedding:
+        embedding_worker.notify()
     return block
 
 @app.get("/api/experience-blocks",
         response_model=List[ExperienceBlockResponse],
-        dependencies=[Depends(check_general_rate_limit)])
+        dependencies=[Depends(check_general_rate_limit), Depends(conditional_get("experience_blocks"))])
 def list_experience_blocks(
+    response: Response,
     block_type: Optional[str] = None,
     priority: Optional[str] = None,
     search: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """List experience blocks with optional filtering"""
-    query = db.query(ExperienceBlock)
+    query = db.query(*BLOCK_READ_COLUMNS)
     
     # Apply filters
     if block_type:
@@ -432,21 +658,35 @@ def list_experience_blocks(
         query = query.filter(ExperienceBlock.priority == priority)
     
     if search:
-        search_term = f"%{search}%"
+        # Ranked full-text search (GIN on search_vector) plus fuzzy title
+        # matching (pg_trgm) so typos in titles still hit
+        ts_query = func.websearch_to_tsquery("english", search)
         query = query.filter(
-            (ExperienceBlock.title.ilike(search_term)) |
-            (ExperienceBlock.company.ilike(search_term)) |
-            (ExperienceBlock.content.ilike(search_term))
+            ExperienceBlock.search_vector.op("@@")(ts_query) |
+            ExperienceBlock.title.op("%")(search)
+        )
+        rank = func.ts_rank_cd(ExperienceBlock.search_vector, ts_query) + func.similarity(ExperienceBlock.title, search)
+        snippet = func.ts_headline(
+            "english", ExperienceBlock.content, ts_query,
+            f"StartSel=\"{SNIPPET_START}\", StopSel=\"{SNIPPET_STOP}\", MaxFragments=2, MaxWords=25, MinWords=10"
         )
+
+        rows = query.add_columns(snippet.label("snippet")).order_by(
+            desc(rank), desc(ExperienceBlock.created_at)
+        ).all()
+        return rows_response([
+            {**row._asdict(), "snippet": highlight_snippet(row.snippet)} for row in rows
+        ], response)
     
-    return query.order_by(desc(ExperienceBlock.created_at)).all()
+    rows = query.order_by(desc(ExperienceBlock.created_at)).all()
+    return rows_response([{**row._asdict(), "snippet": None} for row in rows], response)
 
 @app.get("/api/experience-blocks/{block_id}",
         response_model=ExperienceBlockResponse,
-        dependencies=[Depends(check_general_rate_limit)])
+        dependencies=[Depends(check_general_rate_limit), Depends(conditional_get("experience_blocks"))])
 def get_experience_block(block_id: uuid.UUID, db: Session = Depends(get_db)):
     """Get a single experience block by ID"""
-    block = db.query(ExperienceBlock).filter(ExperienceBlock.id == block_id).first()
+    block = db.query(ExperienceBlock).options(BLOCK_READ_OPTIONS).filter(ExperienceBlock.id == block_id).first()
     if not block:
         raise HTTPException(status_code=404, detail="Experience block not found")
     return block
@@ -469,15 +709,32 @@ def create_job_application(
     db: Session = Depends(get_db)):
 
     # 1. Check if allowed (Raises 429 if limit hit)
-    check_ai_usage_allowed(request)
+    check_ai_usage_allowed(request, db)
 
-    personal_info = db.query(PersonalInfo).first()
-    if not personal_info:
+    client_ip = get_client_ip(request)
+    with collect_usage() as usage:
+        try:
+            return _generate_application(app_data, request, db, usage, client_ip)
+        except Exception:
+            # The tokens were spent even though no application was saved
+            if usage:
+                db.rollback()
+                record_usage(db, usage, client_ip)
+                db.commit()
+            raise
+
+def _generate_application(app_data: JobApplicationCreate, request: Request, db: Session,
+                          usage: List[llm_usage.UsageRecord], client_ip: str) -> JobApplicationResponse:
+    # Personal info, style guidelines and fixed blocks, cached until an admin write
+    profile = get_profile_snapshot(db)
+    personal_dict = profile.personal_info_dict()
+    if not personal_dict:
         raise HTTPException(status_code=400, detail="Please add your personal info first")
 
     # Use hybrid selection strategy
-    print(f"\n🔍 Analyzing job: {app_data.job_title} at {app_data.company_name}")
-    experiences = select_relevant_blocks(app_data.raw_spec, db)
+    logger.info("🔍 Analyzing job: %s at %s", app_data.job_title, app_data.company_name)
+    with span("retrieval"):
+        experiences = select_relevant_blocks(app_data.raw_spec, db, profile)
 
     if not experiences:
         raise HTTPException(status_code=400, detail="Please add at least one experience block first")
@@ -487,50 +744,50 @@ def create_job_application(
             "title": exp.title,
             "company": exp.company,
             "content": exp.content,
-            "metadata_tags": exp.metadata_tags or []
+            "metadata_tags": list(exp.metadata_tags or [])
         }
         for exp in experiences
     ]
 
-    personal_dict = {
-        "name": personal_info.name,
-        "email": personal_info.email,
-        "phone": personal_info.phone,
-        "location": personal_info.location,
-        "linkedin": personal_info.linkedin,
-        "github": personal_info.github,
-        "portfolio": personal_info.portfolio,
-        "summary": personal_info.summary
-    }
-
-    style_guidelines = db.query(StyleGuideline).filter(StyleGuideline.is_active == "true").all()
-    style_dicts = [{"name": sg.name, "description": sg.description} for sg in style_guidelines]
+    style_dicts = profile.style_dicts()
 
     try:
-        print(f"📝 Generating CV with {len(experience_chunks)} blocks...")
-        skills_gap = analyze_skills_gap(experience_chunks, app_data.raw_spec)
-        cv = generate_tailored_cv(personal_dict, experience_chunks, app_data.raw_spec, style_dicts)
-        cover_letter = generate_cover_letter(
-            personal_dict, experience_chunks, app_data.raw_spec,
-            app_data.company_name, app_data.job_title
-        )
+        logger.info("📝 Generating CV with %d blocks...", len(experience_chunks))
+        with span("generation.skills_gap"):
+            skills_gap = analyze_skills_gap(experience_chunks, app_data.raw_spec)
+        with span("generation.cv"):
+            cv = generate_tailored_cv(personal_dict, experience_chunks, app_data.raw_spec, style_dicts)
+        with span("generation.cover_letter"):
+            cover_letter = generate_cover_letter(
+                personal_dict, experience_chunks, app_data.raw_spec,
+                app_data.company_name, app_data.job_title
+            )
 
         # 2. SUCCESS! The AI actually worked. Log the usage now.
         log_ai_usage_success(request)
 
+    except LLMUnavailableError as e:
+        logger.warning("⚠️  AI Generation skipped: %s", e)
+        raise HTTPException(
+            status_code=503,
+            detail="AI generation is temporarily unavailable. Please try again shortly; your daily limit was not affected.",
+            headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
     except Exception as e:
-        print(f"❌ AI Generation failed: {e}")
+        logger.exception("❌ AI Generation failed: %s", e)
         # We DON'T log usage here, so the user keeps their credit
         raise HTTPException(status_code=500, detail="AI generation failed. Please try again; your daily limit was not affected.")
 
     # Generate Word documents
-    print(f"📄 Generating Word documents...")
+    logger.info("📄 Generating Word documents...")
     try:
-        cv_docx_path = generate_cv_docx(cv, app_data.company_name, app_data.job_title, OUTPUT_DIR)
-        cover_docx_path = generate_cover_letter_docx(cover_letter, app_data.company_name, app_data.job_title, OUTPUT_DIR)
-        print(f"✅ Word documents generated")
+        with span("render.cv_docx"):
+            cv_docx_path = generate_cv_docx(cv, app_data.company_name, app_data.job_title, OUTPUT_DIR)
+        with span("render.cover_letter_docx"):
+            cover_docx_path = generate_cover_letter_docx(cover_letter, app_data.company_name, app_data.job_title, OUTPUT_DIR)
+        logger.info("✅ Word documents generated")
     except Exception as e:
-        print(f"⚠️  Word document generation failed: {e}")
+        logger.warning("⚠️  Word document generation failed: %s", e)
         cv_docx_path = None
         cover_docx_path = None
 
@@ -544,16 +801,20 @@ def create_job_application(
         skills_gap_report=skills_gap,
         status=ApplicationStatus.DRAFT
     )
-    db.add(db_app)
-    db.commit()
-    db.refresh(db_app)
+    with span("persist"):
+        db.add(db_app)
+        db.flush()
+        # Saved with the application, so a stored application always has its usage
+        record_usage(db, usage, client_ip, db_app.id)
+        db.commit()
+        db.refresh(db_app)
 
     # Add docx paths to response
     response = JobApplicationResponse.from_orm(db_app)
     response.cv_docx_path = cv_docx_path
     response.cover_letter_docx_path = cover_docx_path
 
-    print(f"✅ Application created successfully\n")
+    logger.info("✅ Application created successfully", extra={"application_id": str(db_app.id)})
     return response
 
 @app.put("/api/applications/{application_id}",
@@ -582,22 +843,64 @@ def update_application(
     return app
 
 @app.get("/api/applications",
-        response_model=List[JobApplicationResponse],
-        dependencies=[Depends(check_general_rate_limit)])
+        response_model=List[JobApplicationSummary],
+        dependencies=[Depends(check_general_rate_limit), Depends(conditional_get("job_applications"))])
 def list_applications(
+    response: Response,
     status: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """List applications with optional status filter"""
-    query = db.query(JobApplication)
+    """List application summaries, newest first, with keyset pagination.
+
+    The cursor for the next page is returned in the X-Next-Cursor header and
+    is absent on the last page.
+    """
+    query = db.query(
+        JobApplication.id,
+        JobApplication.company_name,
+        JobApplication.job_title,
+        JobApplication.status,
+        JobApplication.notes,
+        JobApplication.job_url,
+        JobApplication.applied_date,
+        JobApplication.created_at,
+        JobApplication.updated_at
+    )
     
     if status:
         try:
             query = query.filter(JobApplication.status == ApplicationStatus(status))
         except ValueError:
             pass  # Invalid status, ignore filter
+
+    if cursor:
+        cursor_created_at, cursor_id = decode_application_cursor(cursor)
+        query = query.filter(
+            tuple_(JobApplication.created_at, JobApplication.id) < tuple_(cursor_created_at, cursor_id)
+        )
     
-    return query.order_by(desc(JobApplication.created_at)).all()
+    # Fetch one extra row to learn whether another page exists
+    rows = query.order_by(
+        desc(JobApplication.created_at), desc(JobApplication.id)
+    ).limit(limit + 1).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_application_cursor(rows[-1].created_at, rows[-1].id)
+
+    return rows_response([row._asdict() for row in rows], response)
+
+@app.get("/api/applications/{application_id}",
+        response_model=JobApplicationResponse,
+        dependencies=[Depends(check_general_rate_limit), Depends(conditional_get("job_applications"))])
+def get_application(application_id: uuid.UUID, db: Session = Depends(get_db)):
+    """Get a single application including generated CV, cover letter and skills gap report"""
+    app = db.query(JobApplication).filter(JobApplication.id == application_id).first()
+    if not app:
+        raise HTTPException(status_code=404, detail="Application not found")
+    return app
 
 # Download endpoints for Word documents
 @app.get("/api/download/cv/{application_id}",
@@ -638,6 +941,29 @@ def download_cover_letter(application_id: uuid.UUID, db: Session = Depends(get_d
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate Word document: {str(e)}")
 
+@app.get("/api/download/bundle",
+        dependencies=[Depends(verify_admin_key)])
+def download_application_bundle(
+    status: Optional[str] = None,
+    company: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None
+):
+    """Stream a ZIP of every matching application's CV, cover letter (DOCX + markdown) and skills gap report"""
+    status_enum = None
+    if status:
+        try:
+            status_enum = ApplicationStatus(status)
+        except ValueError:
+            pass  # Invalid status, ignore filter
+
+    filename = f"applications_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        iter_application_bundle(status_enum, company, created_after, created_before),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 # Style Guidelines
 @app.post("/api/style-guidelines",
           response_model=StyleGuidelineResponse,
@@ -651,116 +977,203 @@ def create_style_guideline(guideline: StyleGuidelineCreate, db: Session = Depend
 
 @app.get("/api/style-guidelines",
         response_model=List[StyleGuidelineResponse],
-        dependencies=[Depends(check_general_rate_limit)])
-def list_style_guidelines(db: Session = Depends(get_db)):
-    return db.query(StyleGuideline).filter(StyleGuideline.is_active == "true").all()
+        dependencies=[Depends(check_general_rate_limit), Depends(conditional_get("style_guidelines"))])
+def list_style_guidelines(response: Response, db: Session = Depends(get_db)):
+    rows = db.query(
+        StyleGuideline.id,
+        StyleGuideline.name,
+        StyleGuideline.description,
+        StyleGuideline.rules,
+        StyleGuideline.is_active,
+        StyleGuideline.created_at
+    ).filter(StyleGuideline.is_active == "true").all()
+    return rows_response([row._asdict() for row in rows], response)
 
 # Backup/Restore Endpoints
 @app.get("/api/export-data",
         response_model=DataExportResponse,
-        dependencies=[Depends(check_general_rate_limit)])
+        dependencies=[Depends(check_general_rate_limit), Depends(conditional_get("personal_info", "experience_blocks"))])
 def export_all_data(db: Session = Depends(get_db)):
     """Export all personal info and experience blocks as JSON"""
     personal_info = db.query(PersonalInfo).first()
-    experience_blocks = db.query(ExperienceBlock).all()
+    experience_blocks = db.query(
+        ExperienceBlock.title,
+        ExperienceBlock.company,
+        ExperienceBlock.content,
+        ExperienceBlock.metadata_tags,
+        ExperienceBlock.block_type,
+        ExperienceBlock.priority
+    ).all()
     
     if not personal_info:
         raise HTTPException(status_code=404, detail="No personal info found")
     
-    personal_dict = {
-        "name": personal_info.name,
-        "email": personal_info.email,
-        "phone": personal_info.phone,
-        "location": personal_info.location,
-        "linkedin": personal_info.linkedin,
-        "github": personal_info.github,
-        "portfolio": personal_info.portfolio,
-        "summary": personal_info.summary
-    }
-    
-    blocks_list = [
-        {
-            "title": block.title,
-            "company": block.company,
-            "content": block.content,
-            "tags": block.metadata_tags or [],
-            "block_type": block.block_type.value if block.block_type else "supporting_project",
-            "priority": block.priority or "3"
-        }
-        for block in experience_blocks
-    ]
+    personal_dict = personal_info_dict(personal_info)
+    blocks_list = [block_export_dict(block) for block in experience_blocks]
     
     return DataExportResponse(
         personal_info=personal_dict,
         experience_blocks=blocks_list
     )
 
+@app.get("/api/export-data/stream",
+        dependencies=[Depends(check_general_rate_limit)])
+def export_all_data_stream(
+    include_applications: bool = False,
+    include_embeddings: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Stream the profile as NDJSON (chunked), optionally with applications and float16 embeddings"""
+    if not db.query(PersonalInfo.id).first():
+        raise HTTPException(status_code=404, detail="No personal info found")
+
+    return StreamingResponse(
+        iter_profile_ndjson(include_applications, include_embeddings),
+        media_type="application/x-ndjson"
+    )
+
+@app.get("/api/export-data/manifest",
+        dependencies=[Depends(check_general_rate_limit), Depends(conditional_get("personal_info", "experience_blocks"))])
+def export_data_manifest(db: Session = Depends(get_db)):
+    """Personal info plus the content hash of every experience block, for differential backups"""
+    personal_info = db.query(PersonalInfo).first()
+    if not personal_info:
+        raise HTTPException(status_code=404, detail="No personal info found")
+
+    rows = db.query(ExperienceBlock.title, ExperienceBlock.content_hash).order_by(ExperienceBlock.title).all()
+    return {
+        "personal_info": personal_info_dict(personal_info),
+        "blocks": [{"title": row.title, "content_hash": row.content_hash} for row in rows]
+    }
+
+@app.post("/api/export-data/blocks",
+          dependencies=[Depends(check_general_rate_limit)])
+def export_blocks_by_hash(request: BlockHashesRequest, db: Session = Depends(get_db)):
+    """Export only the experience blocks with the given content hashes"""
+    if not request.hashes:
+        return {"experience_blocks": []}
+
+    rows = db.query(
+        ExperienceBlock.title,
+        ExperienceBlock.company,
+        ExperienceBlock.content,
+        ExperienceBlock.metadata_tags,
+        ExperienceBlock.block_type,
+        ExperienceBlock.priority,
+        ExperienceBlock.content_hash
+    ).filter(ExperienceBlock.content_hash.in_(request.hashes)).all()
+
+    return {
+        "experience_blocks": [
+            {**block_export_dict(row), "content_hash": row.content_hash} for row in rows
+        ]
+    }
+
 @app.post("/api/import-data",
           dependencies=[Depends(verify_admin_key)])
 def import_all_data(data: DataImportRequest, db: Session = Depends(get_db)):
-    """Import personal info and experience blocks from JSON"""
+    """Import personal info and experience blocks from JSON.
+
+    Blocks are upserted by title; only new or changed blocks are queued for re-embedding.
+    """
     try:
+        result = import_experience_blocks(db, data.experience_blocks)
+
         # Import personal info
-        existing_info = db.query(PersonalInfo).first()
-        if existing_info:
-            for key, value in data.personal_info.items():
-                setattr(existing_info, key, value)
-            existing_info.updated_at = datetime.utcnow()
-        else:
-            db_info = PersonalInfo(**data.personal_info)
-            db.add(db_info)
-        
-        # Import experience blocks
-        imported_count = 0
-        for block_data in data.experience_blocks:
-            # Check if block exists by title
-            existing_block = db.query(ExperienceBlock).filter(
-                ExperienceBlock.title == block_data["title"]
-            ).first()
-            
-            # Prepare embedding
-            combined_text = f"{block_data['title']} at {block_data.get('company', '')}: {block_data['content']} Keywords: {', '.join(block_data.get('tags', []))}"
-            embedding = generate_embedding(combined_text)
-            
-            if existing_block:
-                # Update existing block
-                existing_block.company = block_data.get("company")
-                existing_block.content = block_data["content"]
-                existing_block.metadata_tags = block_data.get("tags", [])
-                existing_block.block_type = BlockType(block_data.get("block_type", "supporting_project"))
-                existing_block.priority = block_data.get("priority", "3")
-                existing_block.embedding = embedding
-                existing_block.updated_at = datetime.utcnow()
+        if data.personal_info:
+            existing_info = db.query(PersonalInfo).first()
+            if existing_info:
+                for key, value in data.personal_info.items():
+                    setattr(existing_info, key, value)
+                existing_info.updated_at = datetime.utcnow()
             else:
-                # Create new block
-                new_block = ExperienceBlock(
-                    title=block_data["title"],
-                    company=block_data.get("company"),
-                    content=block_data["content"],
-                    metadata_tags=block_data.get("tags", []),
-                    block_type=BlockType(block_data.get("block_type", "supporting_project")),
-                    priority=block_data.get("priority", "3"),
-                    embedding=embedding
-                )
-                db.add(new_block)
-            
-            imported_count += 1
+                db_info = PersonalInfo(**data.personal_info)
+                db.add(db_info)
         
         db.commit()
+        embedding_worker.notify()
+        logger.info(
+            "📥 Imported blocks: %d inserted, %d updated, %d unchanged, %d queued for embedding (%s)",
+            result["inserted"], result["updated"], result["unchanged"], result["queued_for_embedding"],
+            result["timings_ms"]
+        )
         return {
             "message": "Import successful",
-            "imported_blocks": imported_count
+            "imported_blocks": result["inserted"] + result["updated"] + result["unchanged"],
+            **result
         }
     
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
 
+@app.get("/api/export-backup",
+        dependencies=[Depends(verify_admin_key)])
+def export_backup(db: Session = Depends(get_db)):
+    """Export personal info and experience blocks with their embeddings in the binary backup format"""
+    personal_info = db.query(PersonalInfo).first()
+    if not personal_info:
+        raise HTTPException(status_code=404, detail="No personal info found")
+
+    rows = db.query(
+        ExperienceBlock.title,
+        ExperienceBlock.company,
+        ExperienceBlock.content,
+        ExperienceBlock.metadata_tags,
+        ExperienceBlock.block_type,
+        ExperienceBlock.priority,
+        ExperienceBlock.embedding,
+        ExperienceBlock.embedding_model
+    ).order_by(ExperienceBlock.title).all()
+
+    # The manifest names one vector space; vectors from any other backend are left out
+    backend = get_backend()
+    content = write_backup(
+        personal_info_dict(personal_info),
+        [block_export_dict(row) for row in rows],
+        [row.embedding if row.embedding_model == backend.name else None for row in rows],
+        backend.name,
+        backend.dimensions
+    )
+    filename = f"my_data.backup-{datetime.now().strftime('%Y%m%d_%H%M%S')}{BACKUP_EXTENSION}"
+    return Response(
+        content,
+        media_type=BACKUP_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.post("/api/import-backup",
+          dependencies=[Depends(verify_admin_key)])
+def import_backup(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """Restore a binary backup, reusing its vectors when they match the current embedding model"""
+    try:
+        manifest, personal_info, blocks, matrix = read_backup(file.file.read())
+    except BackupFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    backend = get_backend()
+    trust_vectors = vectors_compatible(manifest, backend.name, backend.dimensions)
+    for row, block in enumerate(blocks):
+        if trust_vectors and block.pop("has_embedding", False):
+            block["embedding"] = matrix[row].tolist()
+            block["embedding_model"] = backend.name
+        else:
+            block.pop("has_embedding", None)
+
+    result = import_all_data(
+        DataImportRequest(personal_info=personal_info, experience_blocks=blocks),
+        db
+    )
+    result["embedding_model_match"] = trust_vectors
+    return result
+
 @app.get("/api/usage-stats")
-def get_usage_stats(request: Request):
-    """Returns remaining AI generations for the current user"""
-    forwarded = request.headers.get("X-Forwarded-For")
-    client_ip = forwarded.split(",")[0] if forwarded else request.client.host
+def get_usage_stats(request: Request, db: Session = Depends(get_db)):
+    """Returns remaining AI generations (or token/cost budget) for the current user"""
+    client_ip = get_client_ip(request)
+
+    if llm_usage.BUDGET_MODE != "requests":
+        return budget_status(db, client_ip)
 
     now = datetime.now()
     # Sync the tracker (clean old entries)
@@ -775,6 +1188,41 @@ def get_usage_stats(request: Request):
         "limit": max_allowed
     }
 
+@app.get("/api/usage/costs", dependencies=[Depends(verify_admin_key)])
+def get_usage_costs(days: int = Query(30, ge=1, le=366), db: Session = Depends(get_db)):
+    """LLM tokens and cost per day and client, and per model"""
+    return daily_costs(db, days)
+
+@app.get("/api/llm-status", dependencies=[Depends(verify_admin_key)])
+def get_llm_status():
+    """Circuit breaker state, concurrency and retry counters of the LLM provider"""
+    return llm_status()
+
+@app.get("/api/admission-status", dependencies=[Depends(verify_admin_key)])
+def get_admission_status():
+    """Slots in use and requests queued per route class"""
+    return admission_status()
+
+@app.get("/api/profiles", dependencies=[Depends(verify_admin_key)])
+def get_profiles():
+    """Stored request profiles, newest first: timing, SQL and LLM call counts"""
+    return profiler.list_profiles()
+
+@app.get("/api/profiles/{profile_id}", dependencies=[Depends(verify_admin_key)])
+def get_profile(profile_id: str, format: str = Query("speedscope", pattern="^(speedscope|collapsed|json)$")):
+    """Download a profile: speedscope JSON (speedscope.app), collapsed stacks (flamegraph.pl) or its summary"""
+    path = profiler.profile_path(profile_id, format)
+    if path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "text/plain" if format == "collapsed" else "application/json"
+    return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus scrape endpoint; nginx only proxies /api, so it is not public"""
+    payload, content_type = metrics_payload()
+    return Response(content=payload, headers={"Content-Type": content_type})
+
 # --- Runtime ---
 
 if __name__ == "__main__":
@@ -0,0 +1,148 @@
+"""
+Prometheus metrics
+Latency histograms for HTTP routes, retrieval stages, LLM calls and DOCX
+rendering, plus counters for tokens, embeddings and DB pool checkouts.
+Labels are route templates, task names and configured models only, never
+ids or raw paths, so series counts stay bounded
+"""
+
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+
+# Generation requests take tens of seconds, browsing ones milliseconds
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+LLM_BUCKETS = (0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 180)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"], buckets=HTTP_BUCKETS
+)
+RETRIEVAL_STAGE_SECONDS = Histogram(
+    "retrieval_stage_duration_seconds", "Time per select_relevant_blocks stage", ["stage"]
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds", "LLM chat call latency, retries included",
+    ["task", "model", "outcome"], buckets=LLM_BUCKETS
+)
+LLM_TOKENS = Counter("llm_tokens", "Tokens used by LLM chat calls", ["task", "model", "kind"])
+EMBEDDING_CALLS = Counter("embedding_calls", "Embedding backend calls", ["backend", "outcome"])
+EMBEDDING_TEXTS = Counter("embedding_texts", "Texts sent to the embedding backend", ["backend"])
+DOCX_RENDER_SECONDS = Histogram("docx_render_duration_seconds", "Word document render time", ["document"])
+DB_POOL_CHECKOUTS = Counter("db_pool_checkouts", "Connections checked out of the SQLAlchemy pool")
+DB_POOL_IN_USE = Gauge("db_pool_connections_in_use", "Connections currently checked out of the pool")
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured SQLAlchemy pool size (overflow excluded)")
+LOG_RECORDS_DROPPED = Counter("log_records_dropped", "Log records dropped because the log queue was full")
+TRACES_DROPPED = Counter("traces_dropped", "Finished traces dropped because the trace export queue was full")
+ADMISSION_IN_FLIGHT = Gauge("admission_in_flight", "Admitted requests in progress by route class", ["route_class"])
+ADMISSION_QUEUE_DEPTH = Gauge("admission_queue_depth", "Requests waiting for a slot by route class", ["route_class"])
+ADMISSION_WAIT_SECONDS = Histogram(
+    "admission_wait_seconds", "Time admitted requests waited for a slot", ["route_class"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected", "Requests answered 503 by admission control", ["route_class", "reason"]
+)
+STARTUP_SECONDS = Gauge("app_startup_seconds", "Worker startup time by phase: import, schema, warmup", ["phase"])
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time one retrieval stage"""
+    with RETRIEVAL_STAGE_SECONDS.labels(stage=stage).time():
+        yield
+
+
+def observe_llm_call(task: str, model: str, seconds: float, outcome: str,
+                     prompt_tokens: int = 0, completion_tokens: int = 0):
+    LLM_REQUEST_SECONDS.labels(task=task, model=model, outcome=outcome).observe(seconds)
+    if prompt_tokens:
+        LLM_TOKENS.labels(task=task, model=model, kind="prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(task=task, model=model, kind="completion").inc(completion_tokens)
+
+
+def instrument_engine(engine):
+    """Count pool checkouts and report connections in use"""
+    event.listen(engine, "checkout", lambda *args: DB_POOL_CHECKOUTS.inc())
+    pool = engine.pool
+    if hasattr(pool, "checkedout"):
+        DB_POOL_IN_USE.set_function(pool.checkedout)
+    if hasattr(pool, "size"):
+        DB_POOL_SIZE.set_function(pool.size)
+
+
+class LLMProviderCollector:
+    """Reads the circuit breaker and limiter state from llm_provider at scrape time"""
+
+    def describe(self):
+        # Registration would otherwise call collect() while llm_provider is still importing
+        return []
+
+    def collect(self):
+        from llm_provider import llm_status
+
+        status = llm_status()
+        state = GaugeMetricFamily("llm_circuit_state", "1 for the breaker's current state", labels=["state"])
+        for name in ("closed", "open", "half_open"):
+            state.add_metric([name], 1 if status["breaker"]["state"] == name else 0)
+        yield state
+        yield GaugeMetricFamily("llm_requests_in_flight", "Upstream LLM requests in flight",
+                                value=status["concurrency"]["in_flight"])
+        yield GaugeMetricFamily("llm_concurrency_limit", "Maximum concurrent upstream LLM requests",
+                                value=status["concurrency"]["limit"])
+        yield CounterMetricFamily("llm_circuit_opened", "Times the breaker opened",
+                                  value=status["breaker"]["times_opened"])
+        calls = CounterMetricFamily("llm_provider_events", "Provider call events", labels=["event"])
+        for name, value in status["calls"].items():
+            calls.add_metric([name], value)
+        yield calls
+
+
+REGISTRY.register(LLMProviderCollector())
+
+
+def _status_class(status: int) -> str:
+    return f"{status // 100}xx"
+
+
+class MetricsMiddleware:
+    """Observes every HTTP request under its route template ("/api/applications/{application_id}")"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope; anything
+            # unmatched shares one label instead of one per probed URL
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                method=scope["method"],
+                route=route.path if route is not None else "unmatched",
+                status=_status_class(status)
+            ).observe(time.perf_counter() - started)
+
+
+def metrics_payload():
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
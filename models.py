@@ -1,7 +1,10 @@
 from datetime import datetime
-from sqlalchemy import Column, String, Text, DateTime, JSON, Enum as SQLEnum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (
+    Column, String, Text, DateTime, JSON, Integer, BigInteger, Numeric, ForeignKey, Index, Computed, Enum as SQLEnum
+)
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import deferred
 from pgvector.sqlalchemy import Vector
 import uuid
 import enum
@@ -23,20 +26,61 @@ class BlockType(str, enum.Enum):
     EDUCATION = "education"                # Education block
     SKILLS_SUMMARY = "skills_summary"      # Comprehensive skills list
 
+class EmbeddingStatus(str, enum.Enum):
+    PENDING = "pending"  # Waiting for the background embedding worker
+    READY = "ready"      # embedding matches the current content
+    FAILED = "failed"    # Gave up after repeated errors, re-saving the block retries
+
+# Weighted full-text document for experience block search: title > company > content
+EXPERIENCE_BLOCK_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(company, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'C')"
+)
+
 class ExperienceBlock(Base):
     __tablename__ = "experience_blocks"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    title = Column(String(200), nullable=False)
+    title = Column(String(200), nullable=False)  # Unique, the natural key for import/upsert
     company = Column(String(200))
     content = Column(Text, nullable=False)
     metadata_tags = Column(JSON)  # Store skills/keywords as JSON array
     block_type = Column(SQLEnum(BlockType), default=BlockType.SUPPORTING_PROJECT)  # NEW FIELD
     priority = Column(String(10), default="3")  # 1=highest, 5=lowest (for ordering within type)
-    embedding = Column(Vector(1024))  # OpenAI's embedding dimension
+    # OpenAI's embedding dimension. Deferred so ordinary queries never fetch and
+    # parse the vector; only SQL expressions (cosine_distance) or explicit
+    # undefer() touch it.
+    embedding = deferred(Column(Vector(1024)))
+    # Written by embedding_worker; only READY blocks take part in vector search
+    embedding_status = Column(
+        SQLEnum(EmbeddingStatus, native_enum=False, length=16),
+        default=EmbeddingStatus.PENDING, nullable=False
+    )
+    embedding_attempts = Column(Integer, default=0, nullable=False)
+    # Backend that produced embedding (embeddings.EmbeddingBackend.name); vectors are
+    # only compared with vectors from the same backend
+    embedding_model = Column(String(100))
+    # Set by the embedding worker batch that took a PENDING block; its result is
+    # only written back while the claim is still its own (see embedding_worker)
+    embedding_claimed_by = Column(String(64))
+    embedding_claimed_at = Column(DateTime)
+    search_vector = deferred(Column(TSVECTOR, Computed(EXPERIENCE_BLOCK_SEARCH_VECTOR_SQL, persisted=True)))
+    content_hash = Column(String(64))  # SHA-256 of the exported fields, see block_import.block_content_hash
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        Index("uq_experience_blocks_title", "title", unique=True),
+        Index("ix_experience_blocks_search_vector", "search_vector", postgresql_using="gin"),
+        # Fuzzy title matching (pg_trgm)
+        Index("ix_experience_blocks_title_trgm", "title",
+              postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        # The embedding worker's queue
+        Index("ix_experience_blocks_embedding_pending", "updated_at",
+              postgresql_where=embedding_status == EmbeddingStatus.PENDING.name),
+    )
+
 class PersonalInfo(Base):
     __tablename__ = "personal_info"
     
@@ -77,4 +121,49 @@ class JobApplication(Base):
     notes = Column(Text)
     job_url = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Keyset pagination on (created_at, id), optionally narrowed by status
+        Index("ix_job_applications_created_at_id", "created_at", "id"),
+        Index("ix_job_applications_status_created_at_id", "status", "created_at", "id"),
+    )
+
+class LLMUsage(Base):
+    """Tokens and cost of one LLM chat call, see llm_usage.py"""
+    __tablename__ = "llm_usage"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # NULL when the generation failed before an application was saved; the spend still counts
+    application_id = Column(UUID(as_uuid=True), ForeignKey("job_applications.id", ondelete="SET NULL"))
+    client_ip = Column(String(64))
+    task = Column(String(50), nullable=False)
+    model = Column(String(100), nullable=False)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    cost_usd = Column(Numeric(12, 6), nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Budget checks: one client's spend over the last day
+        Index("ix_llm_usage_client_ip_created_at", "client_ip", "created_at"),
+        Index("ix_llm_usage_created_at", "created_at"),
+        Index("ix_llm_usage_application_id", "application_id"),
+    )
+
+class TableVersion(Base):
+    """Per-table change counter, bumped by statement triggers on writes that change rows (see database.py)"""
+    __tablename__ = "table_versions"
+
+    table_name = Column(String(100), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class SchemaVersion(Base):
+    """Single row naming the schema definition the database was last brought up to (see database.init_db)"""
+    __tablename__ = "schema_version"
+
+    id = Column(Integer, primary_key=True, default=1)
+    version = Column(Integer, nullable=False)
+    fingerprint = Column(String(64), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,128 @@
+"""
+In-process profile snapshot
+Personal info, active style guidelines and the blocks every CV includes change
+rarely, so they are loaded once into an immutable snapshot and only reloaded
+when table_versions shows a write to one of their tables
+"""
+
+import logging
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+
+from models import ExperienceBlock, PersonalInfo, StyleGuideline, TableVersion, BlockType
+from exports import personal_info_dict
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TABLES = ("personal_info", "style_guidelines", "experience_blocks")
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+@dataclass(frozen=True)
+class BlockSnapshot:
+    """Read-only copy of the ExperienceBlock fields generation uses"""
+    id: uuid.UUID
+    title: str
+    company: Optional[str]
+    content: str
+    metadata_tags: Tuple[str, ...]
+    block_type: BlockType
+    priority: Optional[str]
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_block(cls, block: ExperienceBlock) -> "BlockSnapshot":
+        return cls(
+            id=block.id,
+            title=block.title,
+            company=block.company,
+            content=block.content,
+            metadata_tags=tuple(block.metadata_tags or []),
+            block_type=block.block_type,
+            priority=block.priority,
+            created_at=block.created_at
+        )
+
+
+@dataclass(frozen=True)
+class ProfileSnapshot:
+    versions: Tuple[int, ...]
+    personal_info: Optional[Tuple[Tuple[str, Optional[str]], ...]]
+    style_guidelines: Tuple[Tuple[str, Optional[str]], ...]
+    pillar_blocks: Tuple[BlockSnapshot, ...]
+    skills_summary: Optional[BlockSnapshot]
+    latest_employment: Optional[BlockSnapshot]
+    education: Optional[BlockSnapshot]
+
+    def personal_info_dict(self) -> Optional[Dict]:
+        """A fresh dict each call, so callers can't mutate the shared snapshot"""
+        return dict(self.personal_info) if self.personal_info is not None else None
+
+    def style_dicts(self) -> List[Dict]:
+        return [{"name": name, "description": description} for name, description in self.style_guidelines]
+
+
+def _current_versions(db: Session) -> Tuple[int, ...]:
+    """One indexed lookup; tables never written since the triggers were installed report 0"""
+    found = dict(
+        db.query(TableVersion.table_name, TableVersion.version)
+        .filter(TableVersion.table_name.in_(PROFILE_TABLES))
+        .all()
+    )
+    return tuple(found.get(table, 0) for table in PROFILE_TABLES)
+
+
+def _build_snapshot(db: Session, versions: Tuple[int, ...]) -> ProfileSnapshot:
+    personal_info = db.query(PersonalInfo).first()
+    style_guidelines = db.query(StyleGuideline).filter(StyleGuideline.is_active == "true").all()
+
+    pillar_blocks = db.query(ExperienceBlock).filter(
+        ExperienceBlock.block_type == BlockType.PILLAR_PROJECT
+    ).all()
+    skills_summary = db.query(ExperienceBlock).filter(
+        ExperienceBlock.block_type == BlockType.SKILLS_SUMMARY
+    ).first()
+    latest_employment = db.query(ExperienceBlock).filter(
+        ExperienceBlock.block_type == BlockType.EMPLOYMENT
+    ).order_by(desc(ExperienceBlock.created_at)).first()
+    education = db.query(ExperienceBlock).filter(
+        ExperienceBlock.block_type == BlockType.EDUCATION
+    ).first()
+
+    def snapshot_or_none(block):
+        return BlockSnapshot.from_block(block) if block else None
+
+    return ProfileSnapshot(
+        versions=versions,
+        personal_info=tuple(personal_info_dict(personal_info).items()) if personal_info else None,
+        style_guidelines=tuple((sg.name, sg.description) for sg in style_guidelines),
+        pillar_blocks=tuple(BlockSnapshot.from_block(block) for block in pillar_blocks),
+        skills_summary=snapshot_or_none(skills_summary),
+        latest_employment=snapshot_or_none(latest_employment),
+        education=snapshot_or_none(education)
+    )
+
+
+def get_profile_snapshot(db: Session) -> ProfileSnapshot:
+    """Current profile snapshot, rebuilt only if a profile table changed since it was built"""
+    global _snapshot
+    versions = _current_versions(db)
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.versions == versions:
+        return snapshot
+
+    with _lock:
+        if _snapshot is None or _snapshot.versions != versions:
+            # Versions are read before the rows, so a write landing in between
+            # only makes the next request rebuild again, never serves stale data
+            _snapshot = _build_snapshot(db, versions)
+            logger.info("🔄 Profile snapshot rebuilt (versions %s)", versions)
+        return _snapshot
@@ -0,0 +1,373 @@
+"""
+Opt-in per-request profiler for admin callers
+A request with "X-Profile: sample" (or "trace") and the admin bearer token runs
+its endpoint under a stack sampler (or a deterministic sys.setprofile tracer).
+The stacks are saved as speedscope JSON and collapsed stacks in PROFILE_DIR,
+with the request's SQL and LLM call counts, and the response carries the
+profile's id in X-Profile-Id. PROFILE_MAX_FILES bounds the directory
+"""
+
+import functools
+import hmac
+import inspect
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+# Deeper stacks are cut at the root end; recursion would otherwise bloat the output
+PROFILE_MAX_DEPTH = 200
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_MODES = ("sample", "trace")
+
+_PROFILE_ID = re.compile(r"^[0-9a-f]{12}$")
+
+_active: ContextVar[Optional["Profile"]] = ContextVar("active_profile", default=None)
+_write_lock = threading.Lock()
+
+Frame = Tuple[str, str, int]
+
+
+def _frame_key(code) -> Frame:
+    return code.co_qualname if hasattr(code, "co_qualname") else code.co_name, code.co_filename, code.co_firstlineno
+
+
+def _stack(frame) -> Tuple[Frame, ...]:
+    """Root-first frames from `frame` outwards"""
+    frames = []
+    while frame is not None and len(frames) < PROFILE_MAX_DEPTH:
+        frames.append(_frame_key(frame.f_code))
+        frame = frame.f_back
+    return tuple(reversed(frames))
+
+
+class Profile:
+    """One profiled request: stacks with weights in microseconds, plus counters"""
+
+    def __init__(self, mode: str, method: str, path: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.method = method
+        self.path = path
+        self.route = None
+        self.status = None
+        self.started_at = datetime.utcnow()
+        self.wall_ms = 0.0
+        self.samples: List[Tuple[Tuple[Frame, ...], int]] = []
+        self.sql_queries = 0
+        self.sql_ms = 0.0
+        self.llm_calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def running(self):
+        """Profile the current thread while the block runs"""
+        if self.mode == "trace":
+            with self._traced():
+                yield
+        else:
+            with self._sampled(threading.get_ident()):
+                yield
+
+    @contextmanager
+    def _sampled(self, thread_id: int):
+        stop = threading.Event()
+        interval = PROFILE_SAMPLE_INTERVAL_MS / 1000
+
+        def sample():
+            last = time.perf_counter_ns()
+            while not stop.wait(interval):
+                frame = sys._current_frames().get(thread_id)
+                now = time.perf_counter_ns()
+                if frame is not None:
+                    # Weighted by the real gap; the GIL can delay the sampler
+                    self.samples.append((_stack(frame), (now - last) // 1000))
+                last = now
+
+        sampler = threading.Thread(target=sample, name=f"profiler-{self.id}", daemon=True)
+        sampler.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            sampler.join()
+
+    @contextmanager
+    def _traced(self):
+        """Exact self time per call stack; slows Python-heavy code several times over"""
+        stack: List[List[int]] = []  # [started_ns, child_ns] per open call
+        totals: Dict[Tuple[Frame, ...], int] = {}
+        path: List[Frame] = []
+
+        def handler(frame, event_name, arg):
+            now = time.perf_counter_ns()
+            if event_name in ("call", "c_call"):
+                if event_name == "call":
+                    key = _frame_key(frame.f_code)
+                else:
+                    key = (getattr(arg, "__qualname__", repr(arg)), "<builtin>", 0)
+                path.append(key)
+                stack.append([now, 0])
+            elif stack:
+                started, child = stack.pop()
+                elapsed = now - started
+                key = tuple(path)
+                totals[key] = totals.get(key, 0) + elapsed - child
+                path.pop()
+                if stack:
+                    stack[-1][1] += elapsed
+
+        previous = sys.getprofile()
+        sys.setprofile(handler)
+        try:
+            yield
+        finally:
+            sys.setprofile(previous)
+            self.samples.extend((key, ns // 1000) for key, ns in totals.items())
+
+    def note_sql(self, seconds: float):
+        with self._lock:
+            self.sql_queries += 1
+            self.sql_ms += seconds * 1000
+
+    def note_llm(self, task: str):
+        with self._lock:
+            self.llm_calls[task] = self.llm_calls.get(task, 0) + 1
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "wall_ms": round(self.wall_ms, 2),
+            "profiled_ms": round(sum(weight for _, weight in self.samples) / 1000, 2),
+            "samples": len(self.samples),
+            "sql_queries": self.sql_queries,
+            "sql_ms": round(self.sql_ms, 2),
+            "llm_calls": dict(self.llm_calls)
+        }
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format: "root;child;leaf <microseconds>" per line"""
+        folded: Dict[str, int] = {}
+        for stack, weight in self.samples:
+            line = ";".join(
+                f"{name} ({os.path.basename(file)}:{lineno})".replace(";", ",") for name, file, lineno in stack
+            )
+            folded[line] = folded.get(line, 0) + weight
+        return "".join(f"{line} {weight}\n" for line, weight in folded.items() if line and weight > 0)
+
+    def speedscope(self) -> Dict:
+        frames: List[Dict] = []
+        index: Dict[Frame, int] = {}
+        samples, weights = [], []
+        for stack, weight in self.samples:
+            if not stack or weight <= 0:
+                continue
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    name, file, line = frame
+                    frames.append({"name": name, "file": file, "line": line})
+                ids.append(index[frame])
+            samples.append(ids)
+            weights.append(weight)
+        name = f"{self.method} {self.route or self.path} ({self.mode})"
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "vector-cv profiler",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "microseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights
+            }]
+        }
+
+
+def profile_path(profile_id: str, kind: str) -> Optional[str]:
+    """Path of a stored profile's "json" summary, "speedscope" or "collapsed" file; None for bad ids"""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    suffix = {"json": ".json", "speedscope": ".speedscope.json", "collapsed": ".collapsed.txt"}[kind]
+    return os.path.join(PROFILE_DIR, f"{profile_id}{suffix}")
+
+
+def save(profile: Profile):
+    with _write_lock:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(profile_path(profile.id, "speedscope"), "w", encoding="utf-8") as f:
+            json.dump(profile.speedscope(), f, separators=(",", ":"))
+        with open(profile_path(profile.id, "collapsed"), "w", encoding="utf-8") as f:
+            f.write(profile.collapsed())
+        # The summary goes last: list_profiles only shows complete profiles
+        with open(profile_path(profile.id, "json"), "w", encoding="utf-8") as f:
+            json.dump(profile.summary(), f)
+        _prune()
+
+
+def _prune():
+    summaries = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if _PROFILE_ID.match(entry.name.split(".")[0])
+         and entry.name.endswith(".json") and not entry.name.endswith(".speedscope.json")),
+        key=lambda entry: entry.stat().st_mtime, reverse=True
+    )
+    for entry in summaries[PROFILE_MAX_FILES:]:
+        profile_id = entry.name.split(".")[0]
+        for kind in ("json", "speedscope", "collapsed"):
+            try:
+                os.remove(profile_path(profile_id, kind))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles() -> List[Dict]:
+    """Stored profile summaries, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        profile_id = name.split(".")[0]
+        if name == f"{profile_id}.json" and _PROFILE_ID.match(profile_id):
+            try:
+                with open(os.path.join(PROFILE_DIR, name), encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return sorted(profiles, key=lambda p: p["started_at"], reverse=True)
+
+
+def note_llm_call(task: str):
+    """Called by llm_provider.call for every upstream call; a no-op outside a profiled request"""
+    profile = _active.get()
+    if profile is not None:
+        profile.note_llm(task)
+
+
+def instrument_engine(engine):
+    """Count SQL statements and their time for the profiled request running them"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _active.get() is not None:
+            conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        profile = _active.get()
+        started = conn.info.get("profile_started")
+        if profile is not None and started:
+            profile.note_sql(time.perf_counter() - started.pop())
+
+
+def _profiled(endpoint):
+    """Run the endpoint under the request's profile, in whichever thread it runs"""
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            profile = _active.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            # The event loop thread also runs other requests' coroutines meanwhile
+            with profile.running():
+                return await endpoint(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = _active.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        with profile.running():
+            return endpoint(*args, **kwargs)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint can be profiled; set as the router's route_class
+    before routes are declared. Sync endpoints run in a worker thread, so the
+    middleware alone would only ever see the event loop waiting
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _profiled(endpoint), **kwargs)
+
+
+class ProfilerMiddleware:
+    """Starts a profile for admin requests carrying X-Profile and saves it once the response is sent"""
+
+    def __init__(self, app, admin_key: str):
+        self.app = app
+        self.admin_key = admin_key.encode("latin-1")
+
+    def _requested_mode(self, scope) -> Optional[str]:
+        headers = dict(scope["headers"])
+        mode = headers.get(PROFILE_HEADER.lower().encode("latin-1"), b"").decode("latin-1").strip().lower()
+        if not mode:
+            return None
+        authorization = headers.get(b"authorization", b"")
+        # Not an admin: the header is ignored, not refused, like any unknown header
+        if not hmac.compare_digest(authorization, b"Bearer " + self.admin_key):
+            return None
+        return mode if mode in PROFILE_MODES else "sample"
+
+    async def __call__(self, scope, receive, send):
+        mode = self._requested_mode(scope) if scope["type"] == "http" else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(mode, scope["method"], scope["path"])
+        token = _active.set(profile)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", [])) + [
+                        (PROFILE_ID_HEADER.lower().encode("latin-1"), profile.id.encode("latin-1"))
+                    ]
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _active.reset(token)
+            profile.wall_ms = (time.perf_counter() - started) * 1000
+            route = scope.get("route")
+            profile.route = route.path if route is not None else None
+            await run_in_threadpool(save, profile)
+            logger.info("🔬 Profiled %s %s as %s: %.0f ms, %d SQL, %d LLM calls", profile.method, profile.path,
+                        profile.id, profile.wall_ms, profile.sql_queries, sum(profile.llm_calls.values()))
@@ -3,8 +3,8 @@ import json
 import sys
 from pathlib import Path
 from database import SessionLocal, engine
-from models import ExperienceBlock, PersonalInfo, Base, BlockType
-from llm_service import generate_embedding
+from models import PersonalInfo
+from block_import import import_experience_blocks
 
 
 def load_personal_data(json_path: str = "my_data/my_data.json") -> dict:
@@ -39,43 +39,15 @@ def seed_personal_info(db, data: dict):
 
 
 def seed_experience_blocks(db, blocks: list):
-    """Seed or update experience blocks with embeddings."""
-    print("Generating embeddings and saving blocks...")
+    """Seed or update experience blocks; the API's embedding worker embeds them."""
+    print("Saving blocks...")
     
-    for item in blocks:
-        # Check if this block already exists by title
-        existing_block = db.query(ExperienceBlock).filter(
-            ExperienceBlock.title == item['title']
-        ).first()
-        
-        # Prepare combined text for embedding
-        combined_text = (
-            f"{item['title']} at {item['company']}: "
-            f"{item['content']} Keywords: {', '.join(item['tags'])}"
-        )
-        
-        if existing_block:
-            print(f"  → Updating existing block: {item['title']}")
-            existing_block.content = item['content']
-            existing_block.metadata_tags = item['tags']
-            existing_block.company = item['company']
-            existing_block.block_type = BlockType(item['block_type'])
-            existing_block.priority = item['priority']
-            existing_block.embedding = generate_embedding(combined_text)
-        else:
-            print(f"  + Adding new block: {item['title']}")
-            vector = generate_embedding(combined_text)
-            
-            block = ExperienceBlock(
-                title=item['title'],
-                company=item['company'],
-                content=item['content'],
-                metadata_tags=item['tags'],
-                block_type=BlockType(item['block_type']),
-                priority=item['priority'],
-                embedding=vector
-            )
-            db.add(block)
+    # Same set-based upsert as /api/import-data: unchanged blocks are not re-embedded
+    result = import_experience_blocks(db, blocks)
+    print(
+        f"  + {result['inserted']} added, → {result['updated']} updated, "
+        f"= {result['unchanged']} unchanged, ⏳ {result['queued_for_embedding']} queued for embedding"
+    )
     
     db.commit()
 
@@ -123,6 +95,9 @@ def seed_database(json_path: str = "my_data/my_data.json"):
 
 if __name__ == "__main__":
     from database import init_db
+    from logging_setup import configure_logging
+
+    configure_logging(log_format="text")
     
     # Get JSON path from command line or use default
     json_path = sys.argv[1] if len(sys.argv) > 1 else "my_data/my_data.json"
@@ -7,6 +7,8 @@ from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 from collections import defaultdict
+from backup_format import read_backup, read_manifest, BACKUP_EXTENSION
+from backup_store import BackupStore, is_snapshot, SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX
 
 # Load environment variables
 load_dotenv()
@@ -49,6 +51,10 @@ BACKUP_DIR = "./backups"
 MY_DATA_DIR = "./my_data"
 os.makedirs(BACKUP_DIR, exist_ok=True)
 os.makedirs(MY_DATA_DIR, exist_ok=True)
+backup_store = BackupStore(BACKUP_DIR)
+
+# Hashes requested per call when a snapshot fetches new or changed blocks
+SNAPSHOT_FETCH_BATCH = 500
 
 st.set_page_config(
     page_title="Vector CV",
@@ -117,6 +123,23 @@ elif st.session_state["authentication_status"]:
             st.error(f"API Error: {str(e)}")
             return None
 
+    def api_get_all(endpoint, page_size=200):
+        """GET a paginated list endpoint, following X-Next-Cursor until the last page"""
+        try:
+            items = []
+            params = {"limit": page_size}
+            while True:
+                response = requests.get(f"{API_URL}{endpoint}", params=params)
+                response.raise_for_status()
+                items.extend(response.json())
+                next_cursor = response.headers.get("X-Next-Cursor")
+                if not next_cursor:
+                    return items
+                params["cursor"] = next_cursor
+        except Exception as e:
+            st.error(f"API Error: {str(e)}")
+            return None
+
     def api_post(endpoint, data):
         try:
             headers = {"Authorization": f"Bearer {ADMIN_KEY}"}
@@ -127,6 +150,17 @@ elif st.session_state["authentication_status"]:
             st.error(f"API Error: {str(e)}")
             return None
 
+    def api_post_file(endpoint, filepath):
+        try:
+            headers = {"Authorization": f"Bearer {ADMIN_KEY}"}
+            with open(filepath, 'rb') as f:
+                response = requests.post(f"{API_URL}{endpoint}", files={"file": (os.path.basename(filepath), f)}, headers=headers)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            st.error(f"API Error: {str(e)}")
+            return None
+
     def api_put(endpoint, data):
         try:
             headers = {"Authorization": f"Bearer {ADMIN_KEY}"}
@@ -149,45 +183,161 @@ elif st.session_state["authentication_status"]:
 
     # --- 7. BACKUP FUNCTIONS ---
     def export_to_json_file():
-        """Export data via API and save to file"""
+        """Stream the NDJSON export from the API straight into a JSON backup file.
+
+        The file is written under a temporary name and only moved into place
+        once the stream's "end" record has arrived with a matching block count,
+        so a cut-off stream never leaves a partial backup behind.
+        """
+        # Create timestamped filename
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"my_data.json.backup-{timestamp}"
+        filepath = os.path.join(BACKUP_DIR, filename)
+        # Not listed as a backup while it is being written
+        temp_path = os.path.join(BACKUP_DIR, f".{filename}.partial")
+        
         try:
-            data = api_get("/api/export-data")
-            if not data:
-                return None
+            with requests.get(f"{API_URL}/api/export-data/stream", stream=True) as response:
+                response.raise_for_status()
+                
+                # Write the usual backup layout one block at a time instead of
+                # holding the whole profile in memory
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    block_count = 0
+                    end = None
+                    for raw_line in response.iter_lines():
+                        if not raw_line:
+                            continue
+                        record = json.loads(raw_line)
+                        
+                        if record["type"] == "personal_info":
+                            personal_json = json.dumps(record["data"], indent=2, ensure_ascii=False).replace("\n", "\n  ")
+                            f.write('{\n  "personal_info": ' + personal_json + ',\n  "experience_blocks": [')
+                        elif record["type"] == "experience_block":
+                            if f.tell() == 0:
+                                raise ValueError("export stream sent blocks before personal info")
+                            f.write(",\n    " if block_count else "\n    ")
+                            f.write(json.dumps(record["data"], ensure_ascii=False))
+                            block_count += 1
+                        elif record["type"] == "end":
+                            end = record
+                            break
+                    
+                    if end is None:
+                        raise ValueError(f"export stream ended early, after {block_count} blocks")
+                    if f.tell() == 0:
+                        raise ValueError("export stream contained no personal info")
+                    expected = end.get("counts", {}).get("experience_blocks")
+                    if expected != block_count:
+                        raise ValueError(f"received {block_count} of {expected} experience blocks")
+                    f.write("\n  ]\n}\n")
             
-            # Create timestamped filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"my_data.json.backup-{timestamp}"
-            filepath = os.path.join(BACKUP_DIR, filename)
+            os.replace(temp_path, filepath)
+            return filepath
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            st.error(f"Backup failed: {str(e)}")
+            return None
+
+    def export_to_binary_file():
+        """Download a binary backup (blocks plus embeddings) from the API and save it"""
+        try:
+            headers = {"Authorization": f"Bearer {ADMIN_KEY}"}
+            response = requests.get(f"{API_URL}/api/export-backup", headers=headers)
+            response.raise_for_status()
             
-            # Save to file
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filepath = os.path.join(BACKUP_DIR, f"my_data.backup-{timestamp}{BACKUP_EXTENSION}")
+            with open(filepath, 'wb') as f:
+                f.write(response.content)
             
             return filepath
         except Exception as e:
             st.error(f"Backup failed: {str(e)}")
             return None
 
+    def create_snapshot():
+        """Snapshot the profile into the content-addressed store, fetching only blocks it doesn't hold yet"""
+        try:
+            manifest = api_get("/api/export-data/manifest")
+            if manifest is None:
+                return None, 0
+            
+            block_hashes = {block["title"]: block["content_hash"] for block in manifest["blocks"]}
+            missing = backup_store.missing(block_hashes.values())
+            for start in range(0, len(missing), SNAPSHOT_FETCH_BATCH):
+                result = api_post("/api/export-data/blocks", {"hashes": missing[start:start + SNAPSHOT_FETCH_BATCH]})
+                if result is None:
+                    return None, 0
+                for block in result["experience_blocks"]:
+                    backup_store.put_object(block.pop("content_hash"), block)
+            
+            return backup_store.write_snapshot(manifest["personal_info"], block_hashes), len(missing)
+        except Exception as e:
+            st.error(f"Snapshot failed: {str(e)}")
+            return None, 0
+
+    def is_binary_backup(filename):
+        return filename.endswith(BACKUP_EXTENSION)
+
+    def backup_timestamp(filename):
+        """The YYYYmmdd_HHMMSS part of a backup filename (snapshots add _microseconds)"""
+        return (
+            filename.replace("my_data.json.backup-", "")
+            .replace("my_data.backup-", "")
+            .replace(SNAPSHOT_PREFIX, "")
+            .replace(BACKUP_EXTENSION, "")
+            .replace(SNAPSHOT_SUFFIX, "")
+        )
+
     def list_backups():
-        """List all available backup files"""
+        """List all available backups (JSON, binary and snapshots), newest first"""
         backup_files = sorted(
-            [f for f in os.listdir(BACKUP_DIR) if f.startswith("my_data.json.backup-")],
+            [
+                f for f in os.listdir(BACKUP_DIR)
+                if f.startswith("my_data.json.backup-")
+                or (f.startswith("my_data.backup-") and is_binary_backup(f))
+                or is_snapshot(f)
+            ],
+            key=backup_timestamp,
             reverse=True
         )
         return backup_files
 
-    def import_from_json_file(filepath):
-        """Import data from JSON file via API"""
+    def load_backup_data(filepath):
+        """Load personal info and blocks from any backup format (vectors are left out)"""
+        if is_snapshot(filepath):
+            return backup_store.materialize(filepath)
+        
+        if is_binary_backup(filepath):
+            with open(filepath, 'rb') as f:
+                _, personal_info, blocks, _ = read_backup(f.read())
+            for block in blocks:
+                block.pop("has_embedding", None)
+            return {"personal_info": personal_info, "experience_blocks": blocks}
+        
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def import_from_backup_file(filepath):
+        """Import data from a JSON or binary backup file via API"""
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Send to API
-            result = api_post("/api/import-data", data)
+            if is_binary_backup(filepath):
+                # Vectors travel with the backup, the API only re-embeds what it can't reuse
+                result = api_post_file("/api/import-backup", filepath)
+            else:
+                # Unchanged blocks are matched by content hash on the server and not re-embedded
+                result = api_post("/api/import-data", load_backup_data(filepath))
             
             if result:
-                st.success(f"✅ Imported {result.get('imported_blocks', 0)} experience blocks")
+                st.success(
+                    f"✅ Imported {result.get('imported_blocks', 0)} experience blocks "
+                    f"({result.get('inserted', 0)} new, {result.get('updated', 0)} updated, "
+                    f"{result.get('unchanged', 0)} unchanged, "
+                    f"{result.get('reused_embeddings', 0)} embeddings reused, "
+                    f"{result.get('queued_for_embedding', 0)} queued for embedding)"
+                )
                 return True
             return False
         except Exception as e:
@@ -225,9 +375,11 @@ elif st.session_state["authentication_status"]:
     def compare_backups(backup1_path, backup2_path):
         """Compare two backup files and show differences"""
         try:
-            with open(backup1_path, 'r') as f1, open(backup2_path, 'r') as f2:
-                data1 = json.load(f1)
-                data2 = json.load(f2)
+            if is_snapshot(backup1_path) and is_snapshot(backup2_path):
+                return compare_snapshots(backup1_path, backup2_path)
+            
+            data1 = load_backup_data(backup1_path)
+            data2 = load_backup_data(backup2_path)
             
             differences = []
             
@@ -258,6 +410,27 @@ elif st.session_state["authentication_status"]:
         except Exception as e:
             return [f"Comparison failed: {str(e)}"]
 
+    def compare_snapshots(snapshot1_path, snapshot2_path):
+        """Block-level diff of two snapshots, read from their manifests only"""
+        diff = backup_store.diff(snapshot1_path, snapshot2_path)
+        differences = []
+        
+        if diff["personal_info_changed"]:
+            differences.append("Personal info has changed")
+        
+        count1, count2 = diff["block_counts"]
+        if count1 != count2:
+            differences.append(f"Experience blocks: {count1} → {count2}")
+        
+        if diff["added"]:
+            differences.append(f"Added blocks: {', '.join(diff['added'])}")
+        if diff["removed"]:
+            differences.append(f"Removed blocks: {', '.join(diff['removed'])}")
+        if diff["modified"]:
+            differences.append(f"Modified blocks: {', '.join(diff['modified'])}")
+        
+        return differences if differences else ["No differences found"]
+
     # --- 8. SIDEBAR NAVIGATION & LOGOUT ---
     st.sidebar.markdown(f"# 📄 Welcome, {st.session_state['name']}")
 
@@ -279,7 +452,7 @@ elif st.session_state["authentication_status"]:
         st.markdown('<div class="main-header">📊 Dashboard</div>', unsafe_allow_html=True)
         col1, col2, col3, col4 = st.columns(4)
         experiences = api_get("/api/experience-blocks")
-        applications = api_get("/api/applications")
+        applications = api_get_all("/api/applications")
 
         with col1:
             st.metric("Experience Blocks", len(experiences) if experiences else 0)
@@ -459,6 +632,13 @@ elif st.session_state["authentication_status"]:
                 with st.expander(f"{exp['title']} ({exp.get('block_type', 'N/A')}) - Priority: {exp.get('priority', 'N/A')}"):
                     st.write(f"**Company:** {exp.get('company', 'N/A')}")
                     st.write(f"**Tags:** {', '.join(exp.get('metadata_tags', []))}")
+                    if exp.get('snippet'):
+                        # The API escapes the block text; only its <mark> tags are HTML
+                        st.markdown(f"🔍 …{exp['snippet']}…", unsafe_allow_html=True)
+                    if exp.get('embedding_status') == 'pending':
+                        st.caption("⏳ Embedding in progress, not used for vector matching yet")
+                    elif exp.get('embedding_status') == 'failed':
+                        st.caption("⚠️ Embedding failed, save the block again to retry")
                     st.write(exp['content'])
                     
                     col1, col2 = st.columns(2)
@@ -507,7 +687,7 @@ elif st.session_state["authentication_status"]:
             if status_filter != "All":
                 endpoint += f"?status={status_filter}"
             
-            apps = api_get(endpoint)
+            apps = api_get_all(endpoint)
             if apps:
                 for a in apps:
                     with st.expander(f"{a['job_title']} at {a['company_name']} ({a['status']})"):
@@ -541,7 +721,9 @@ elif st.session_state["authentication_status"]:
                                 st.rerun()
                         
                         if st.checkbox("View CV", key=f"v_{a['id']}"):
-                            st.text_area("CV", a['generated_cv'], height=300, key=f"cv_text_{a['id']}")
+                            detail = api_get(f"/api/applications/{a['id']}")
+                            if detail:
+                                st.text_area("CV", detail['generated_cv'], height=300, key=f"cv_text_{a['id']}")
 
     elif page == "💾 Backup Manager":
         st.markdown('<div class="main-header">💾 Backup Manager</div>', unsafe_allow_html=True)
@@ -552,20 +734,37 @@ elif st.session_state["authentication_status"]:
             st.markdown("### Export Current Data")
             st.info("Create a timestamped backup of all your current data from the database.")
             
+            backup_format = st.radio(
+                "Format",
+                [
+                    "Snapshot (deduplicated, only downloads new or changed blocks)",
+                    "Binary (includes embeddings, restores without re-embedding)",
+                    "JSON (human-readable)"
+                ]
+            )
+            
             if st.button("📤 Create Backup Now", type="primary"):
                 with st.spinner("Creating backup..."):
-                    filepath = export_to_json_file()
-                    if filepath:
-                        st.success(f"✅ Backup created: {os.path.basename(filepath)}")
-                        
-                        # Offer download
-                        with open(filepath, 'r') as f:
-                            st.download_button(
-                                label="⬇️ Download Backup",
-                                data=f.read(),
-                                file_name=os.path.basename(filepath),
-                                mime="application/json"
-                            )
+                    if backup_format.startswith("Snapshot"):
+                        filepath, fetched = create_snapshot()
+                        if filepath:
+                            st.success(f"✅ Snapshot created: {os.path.basename(filepath)} ({fetched} new or changed block(s) stored)")
+                    else:
+                        if backup_format.startswith("Binary"):
+                            filepath = export_to_binary_file()
+                        else:
+                            filepath = export_to_json_file()
+                        if filepath:
+                            st.success(f"✅ Backup created: {os.path.basename(filepath)}")
+                            
+                            # Offer download
+                            with open(filepath, 'rb') as f:
+                                st.download_button(
+                                    label="⬇️ Download Backup",
+                                    data=f.read(),
+                                    file_name=os.path.basename(filepath),
+                                    mime="application/octet-stream" if is_binary_backup(filepath) else "application/json"
+                                )
         
         with tab2:
             st.markdown("### Import from Backup")
@@ -580,16 +779,20 @@ elif st.session_state["authentication_status"]:
                 # Preview option
                 if st.checkbox("Preview backup content"):
                     try:
-                        with open(os.path.join(BACKUP_DIR, selected_backup), 'r') as f:
-                            preview_data = json.load(f)
-                        st.json(preview_data)
+                        selected_path = os.path.join(BACKUP_DIR, selected_backup)
+                        if is_binary_backup(selected_backup):
+                            with open(selected_path, 'rb') as f:
+                                st.json(read_manifest(f.read()))
+                        elif is_snapshot(selected_backup):
+                            st.json(backup_store.read_snapshot(selected_path))
+                        st.json(load_backup_data(selected_path))
                     except Exception as e:
                         st.error(f"Failed to preview: {str(e)}")
                 
                 if st.button("📥 Import Selected Backup"):
                     with st.spinner("Importing..."):
                         filepath = os.path.join(BACKUP_DIR, selected_backup)
-                        if import_from_json_file(filepath):
+                        if import_from_backup_file(filepath):
                             st.success("✅ Import complete!")
                             st.rerun()
             
@@ -597,11 +800,15 @@ elif st.session_state["authentication_status"]:
             
             # Option 2: Upload new backup file
             st.markdown("#### Upload Backup File")
-            uploaded_file = st.file_uploader("Upload a JSON backup file", type=['json'])
+            uploaded_file = st.file_uploader("Upload a backup file", type=['json', BACKUP_EXTENSION.lstrip('.')])
             if uploaded_file is not None:
                 # Validate structure
                 try:
-                    upload_data = json.load(uploaded_file)
+                    if is_binary_backup(uploaded_file.name):
+                        _, personal_info, blocks, _ = read_backup(uploaded_file.getvalue())
+                        upload_data = {"personal_info": personal_info, "experience_blocks": blocks}
+                    else:
+                        upload_data = json.load(uploaded_file)
                     is_valid, message = validate_json_structure(upload_data)
                     
                     if is_valid:
@@ -620,7 +827,7 @@ elif st.session_state["authentication_status"]:
                                     f.write(uploaded_file.getbuffer())
                                 
                                 # Import from temp file
-                                if import_from_json_file(temp_path):
+                                if import_from_backup_file(temp_path):
                                     st.success("✅ Import complete!")
                                     st.rerun()
                                 
@@ -632,6 +839,8 @@ elif st.session_state["authentication_status"]:
                 
                 except json.JSONDecodeError:
                     st.error("❌ Invalid JSON file")
+                except ValueError as e:
+                    st.error(f"❌ Invalid backup file: {e}")
         
         with tab3:
             st.markdown("### Manage Existing Backups")
@@ -647,29 +856,36 @@ elif st.session_state["authentication_status"]:
                     
                     with col1:
                         # Extract timestamp from filename
-                        timestamp_str = backup.replace("my_data.json.backup-", "")
+                        timestamp_str = backup_timestamp(backup)
                         try:
-                            dt = datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
+                            dt = datetime.strptime(timestamp_str[:15], "%Y%m%d_%H%M%S")
                             display_name = dt.strftime("%Y-%m-%d %H:%M:%S")
                         except:
                             display_name = backup
-                        st.write(f"📄 {display_name}")
+                        icon = '📦' if is_binary_backup(backup) else ('🧩' if is_snapshot(backup) else '📄')
+                        st.write(f"{icon} {display_name}")
                     
                     with col2:
                         filepath = os.path.join(BACKUP_DIR, backup)
-                        with open(filepath, 'r') as f:
-                            st.download_button(
-                                label="⬇️",
-                                data=f.read(),
-                                file_name=backup,
-                                mime="application/json",
-                                key=f"download_{backup}"
-                            )
+                        if is_snapshot(backup):
+                            # Snapshots reference blocks in the local store, so there's no single file to download
+                            st.caption(f"{len(backup_store.read_snapshot(filepath)['blocks'])} blocks")
+                        else:
+                            with open(filepath, 'rb') as f:
+                                st.download_button(
+                                    label="⬇️",
+                                    data=f.read(),
+                                    file_name=backup,
+                                    mime="application/octet-stream" if is_binary_backup(backup) else "application/json",
+                                    key=f"download_{backup}"
+                                )
                     
                     with col3:
                         if st.button("🗑️", key=f"delete_{backup}"):
                             try:
                                 os.remove(filepath)
+                                if is_snapshot(backup):
+                                    backup_store.gc()
                                 st.success(f"Deleted {backup}")
                                 st.rerun()
                             except Exception as e:
@@ -701,7 +917,7 @@ elif st.session_state["authentication_status"]:
                     elif page == "📊 Analytics":
                         st.markdown('<div class="main-header">📊 Analytics Dashboard</div>', unsafe_allow_html=True)
                         
-                        applications = api_get("/api/applications")
+                        applications = api_get_all("/api/applications")
                         experiences = api_get("/api/experience-blocks")
                         
                         if applications and experiences:
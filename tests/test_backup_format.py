@@ -0,0 +1,67 @@
+"""Binary backups round-trip blocks and vectors, and refuse corrupted files"""
+
+import io
+import json
+import tarfile
+
+import pytest
+import zstandard
+
+from backup_format import (
+    BLOCKS_MEMBER, BackupFormatError, read_backup, vectors_compatible, write_backup
+)
+
+BLOCKS = [
+    {"title": "Platform team", "company": "Acme", "content": "Ran Kubernetes", "metadata_tags": {"skills": ["k8s"]}},
+    {"title": "Side project", "company": None, "content": "Wrote a parser", "metadata_tags": {}}
+]
+
+
+def backup(personal_info=None, embeddings=([0.5, 0.25, -1.0], None)):
+    return write_backup(personal_info, BLOCKS, list(embeddings), "local-hash", 3)
+
+
+def replace_member(data: bytes, name: str, content: bytes) -> bytes:
+    out = io.BytesIO()
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:") as source, tarfile.open(fileobj=out, mode="w") as target:
+        for member in source.getmembers():
+            payload = content if member.name == name else source.extractfile(member).read()
+            member.size = len(payload)
+            target.addfile(member, io.BytesIO(payload))
+    return out.getvalue()
+
+
+def test_round_trip():
+    manifest, personal_info, blocks, matrix = read_backup(backup({"name": "Ada"}))
+    assert personal_info == {"name": "Ada"}
+    assert [block["title"] for block in blocks] == ["Platform team", "Side project"]
+    assert [block["has_embedding"] for block in blocks] == [True, False]
+    assert matrix.shape == (2, 3)
+    assert matrix[0].tolist() == [0.5, 0.25, -1.0]
+    assert manifest["block_count"] == 2
+
+
+def test_round_trip_without_personal_info():
+    _, personal_info, blocks, _ = read_backup(backup())
+    assert personal_info is None
+    assert len(blocks) == 2
+
+
+def test_tampered_blocks_fail_the_checksum():
+    data = backup({"name": "Ada"})
+    tampered = json.dumps({"personal_info": {"name": "Eve"}, "experience_blocks": []}).encode("utf-8")
+    data = replace_member(data, BLOCKS_MEMBER, zstandard.ZstdCompressor().compress(tampered))
+    with pytest.raises(BackupFormatError, match="checksum"):
+        read_backup(data)
+
+
+def test_not_a_backup():
+    with pytest.raises(BackupFormatError):
+        read_backup(b"not a tar file at all")
+
+
+def test_vectors_only_trusted_for_the_same_model_and_dimensions():
+    manifest, _, _, _ = read_backup(backup())
+    assert vectors_compatible(manifest, "local-hash", 3)
+    assert not vectors_compatible(manifest, "text-embedding-3-small", 3)
+    assert not vectors_compatible(manifest, "local-hash", 1536)
@@ -0,0 +1,76 @@
+"""
+The read and export endpoints must never load experience_blocks.embedding:
+a 1024-float vector per row that none of them returns. The statements are
+captured from a session that runs nothing and compiled for PostgreSQL
+"""
+
+import re
+import uuid
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+from sqlalchemy.orm import Session
+
+import main
+
+EMBEDDING_COLUMN = re.compile(r"\bexperience_blocks\.embedding\b")
+
+
+class CapturingSession(Session):
+    """Records every statement and answers with no rows"""
+
+    def __init__(self):
+        super().__init__()
+        self.statements = []
+
+    def execute(self, statement, *args, **kwargs):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return IteratorResult(SimpleResultMetaData([]), iter([]))
+
+
+def select_lists(session: CapturingSession):
+    """The SELECT list of each statement run against experience_blocks"""
+    return [
+        statement.split("\nFROM ", 1)[0]
+        for statement in session.statements
+        if "FROM experience_blocks" in statement
+    ]
+
+
+def assert_no_embedding(session: CapturingSession):
+    columns = select_lists(session)
+    assert columns, "no experience_blocks query was captured"
+    for select in columns:
+        assert not EMBEDDING_COLUMN.search(select), select
+
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"block_type": "pillar_project", "priority": "1"},
+    {"search": "kubernetes"},
+])
+def test_list_experience_blocks_skips_embedding(params):
+    db = CapturingSession()
+    main.list_experience_blocks(Response(), db=db, **{"block_type": None, "priority": None, "search": None, **params})
+    assert_no_embedding(db)
+
+
+def test_get_experience_block_skips_embedding():
+    db = CapturingSession()
+    with pytest.raises(HTTPException):
+        main.get_experience_block(uuid.uuid4(), db=db)
+    assert_no_embedding(db)
+
+
+def test_export_all_data_skips_embedding():
+    db = CapturingSession()
+    with pytest.raises(HTTPException):
+        main.export_all_data(db=db)
+    assert_no_embedding(db)
+
+
+def test_embedding_pattern_matches_the_column_only():
+    assert EMBEDDING_COLUMN.search("SELECT experience_blocks.embedding, experience_blocks.id")
+    assert not EMBEDDING_COLUMN.search("SELECT experience_blocks.embedding_status")
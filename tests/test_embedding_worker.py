@@ -0,0 +1,115 @@
+"""
+A worker batch must claim its rows in the transaction that locks them and
+write results back only while the claim is still its own; the statements are
+captured from a session that runs nothing and compiled for PostgreSQL
+"""
+
+import uuid
+from types import SimpleNamespace
+from unittest import mock
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+from sqlalchemy.orm import Session
+
+import embedding_worker
+
+BLOCK = SimpleNamespace(id=uuid.uuid4(), title="Platform", company="Acme", content="Ran Kubernetes",
+                        metadata_tags=["k8s"], embedding_attempts=0)
+
+
+class ClaimingSession(Session):
+    """Finds `pending` claimable rows and records what happens after"""
+
+    log = []
+    pending = [BLOCK]
+
+    def execute(self, statement, *args, **kwargs):
+        compiled = statement.compile(dialect=postgresql.dialect())
+        self.log.append(("execute", str(compiled), compiled.params))
+        if str(compiled).startswith("SELECT"):
+            result = IteratorResult(SimpleResultMetaData(["id"]), iter([(row.id,) for row in self.pending]))
+            result.rowcount = len(self.pending)
+            return result
+        rows = [tuple(row.__dict__.values()) for row in self.pending] if "RETURNING" in str(compiled) else []
+        result = IteratorResult(SimpleResultMetaData(list(vars(BLOCK))), iter(rows))
+        # Query.update reads the matched count
+        result.rowcount = 1
+        return result
+
+    def commit(self):
+        self.log.append(("commit", None, None))
+
+    def rollback(self):
+        self.log.append(("rollback", None, None))
+
+
+class FakeBackend:
+    name = "local:test"
+
+    def embed(self, texts):
+        ClaimingSession.log.append(("embed", None, None))
+        return [[0.0] * 4 for _ in texts]
+
+
+def run_batch(pending=(BLOCK,)):
+    ClaimingSession.log = []
+    ClaimingSession.pending = list(pending)
+    with mock.patch.object(embedding_worker, "SessionLocal", ClaimingSession), \
+            mock.patch.object(embedding_worker, "get_backend", FakeBackend):
+        result = embedding_worker.process_pending_batch()
+    return result, ClaimingSession.log
+
+
+def test_rows_are_claimed_before_the_locks_are_released():
+    result, log = run_batch()
+    assert result == (1, False)
+    kinds = [kind for kind, _, _ in log]
+    # lock, claim, commit (locks released), API call, write-back, commit
+    assert kinds[:4] == ["execute", "execute", "commit", "embed"]
+    lock_sql = log[0][1]
+    assert lock_sql.startswith("SELECT experience_blocks.id")
+    assert "FOR UPDATE SKIP LOCKED" in lock_sql
+    assert "embedding_claimed_at IS NULL OR experience_blocks.embedding_claimed_at <" in lock_sql
+    claim_sql, claim_params = log[1][1], log[1][2]
+    assert claim_sql.startswith("UPDATE experience_blocks SET embedding_claimed_by=")
+    assert "FOR UPDATE" not in claim_sql
+    assert claim_params["embedding_claimed_by"]
+
+
+def test_idle_poll_writes_nothing():
+    # Any UPDATE would fire the table_versions trigger and invalidate caches
+    result, log = run_batch(pending=())
+    assert result == (0, False)
+    assert [kind for kind, _, _ in log] == ["execute", "rollback"]
+    assert log[0][1].startswith("SELECT")
+
+
+def test_write_back_requires_the_batch_claim():
+    _, log = run_batch()
+    claim_token = log[1][2]["embedding_claimed_by"]
+    write_sql, write_params = log[4][1], log[4][2]
+    assert write_sql.startswith("UPDATE experience_blocks SET")
+    assert "experience_blocks.embedding_claimed_by = %(embedding_claimed_by_1)s" in write_sql
+    assert write_params["embedding_claimed_by_1"] == claim_token
+    # The claim is released with the result
+    assert write_params["embedding_claimed_by"] is None
+
+
+class NothingForeignSession(ClaimingSession):
+    """Answers the EXISTS check with false"""
+
+    def execute(self, statement, *args, **kwargs):
+        compiled = statement.compile(dialect=postgresql.dialect())
+        self.log.append(("execute", str(compiled), compiled.params))
+        return IteratorResult(SimpleResultMetaData(["anon_1"]), iter([(False,)]))
+
+
+def test_requeue_with_nothing_foreign_writes_nothing():
+    NothingForeignSession.log = []
+    with mock.patch.object(embedding_worker, "SessionLocal", NothingForeignSession), \
+            mock.patch.object(embedding_worker, "get_backend", FakeBackend):
+        assert embedding_worker.requeue_foreign_embeddings() == 0
+    statements = [sql for kind, sql, _ in NothingForeignSession.log if kind == "execute"]
+    assert len(statements) == 1 and statements[0].startswith("SELECT EXISTS")
+    assert "commit" not in [kind for kind, _, _ in NothingForeignSession.log]
@@ -0,0 +1,47 @@
+"""
+Circuit breaker bookkeeping in llm_provider.call: every way a call can end
+must settle a half_open probe, or the breaker short-circuits every later call
+"""
+
+import pytest
+
+import llm_provider
+from llm_provider import CircuitBreaker, LLMError, call
+
+
+@pytest.fixture
+def half_open_breaker(monkeypatch):
+    breaker = CircuitBreaker(threshold=1, reset_seconds=0)
+    breaker.state = "half_open"
+    monkeypatch.setattr(llm_provider, "breaker", breaker)
+    return breaker
+
+
+def failing_with(error):
+    def fn(timeout):
+        raise error
+    return fn
+
+
+def test_non_sdk_error_in_probe_reopens_breaker(half_open_breaker):
+    with pytest.raises(LLMError) as raised:
+        call("generation", failing_with(ValueError("unparseable response")))
+    assert isinstance(raised.value.__cause__, ValueError)
+    assert half_open_breaker.state == "open"
+    assert half_open_breaker._probing is False
+    # reset_seconds=0: the next call gets to probe again instead of being short-circuited
+    assert half_open_breaker.allow() is True
+
+
+def test_malformed_response_counts_as_failure(half_open_breaker):
+    failures = llm_provider.llm_status()["calls"]["failures"]
+    with pytest.raises(LLMError):
+        call("generation", lambda timeout: [][0])
+    assert llm_provider.llm_status()["calls"]["failures"] == failures + 1
+    assert llm_provider.llm_status()["concurrency"]["in_flight"] == 0
+
+
+def test_successful_probe_closes_breaker(half_open_breaker):
+    assert call("generation", lambda timeout: "ok") == "ok"
+    assert half_open_breaker.state == "closed"
+    assert half_open_breaker.allow() is True
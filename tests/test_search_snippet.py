@@ -0,0 +1,21 @@
+"""
+Search snippets are rendered as HTML, but ts_headline hands back the block's
+raw content: everything except the match markers must come out escaped
+"""
+
+import main
+
+
+def test_block_html_is_escaped_and_matches_marked():
+    headline = f'<img src=x onerror="alert(1)"> ran {main.SNIPPET_START}Kubernetes{main.SNIPPET_STOP} & Helm'
+    assert main.highlight_snippet(headline) == (
+        '&lt;img src=x onerror=&quot;alert(1)&quot;&gt; ran <mark>Kubernetes</mark> &amp; Helm'
+    )
+
+
+def test_literal_mark_tags_in_content_stay_text():
+    assert main.highlight_snippet("<mark>not a match</mark>") == "&lt;mark&gt;not a match&lt;/mark&gt;"
+
+
+def test_no_snippet():
+    assert main.highlight_snippet(None) is None
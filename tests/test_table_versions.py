@@ -0,0 +1,102 @@
+"""
+table_versions drives the profile snapshot cache and the ETags, so it may
+only move when a statement actually changes rows. Runs against the database
+in TEST_DATABASE_URL (pgvector needed), inside a transaction that is rolled
+back, in a throwaway schema; skipped when the variable is unset
+"""
+
+import os
+import uuid
+
+import pytest
+from sqlalchemy import Enum, create_engine, text
+from sqlalchemy.schema import CreateTable
+
+from database import TABLE_VERSION_TRIGGERS, VERSIONED_TABLES
+from models import Base
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+
+@pytest.fixture
+def conn():
+    engine = create_engine(TEST_DATABASE_URL)
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        schema = f"table_versions_test_{uuid.uuid4().hex[:8]}"
+        connection.execute(text(f"CREATE SCHEMA {schema}"))
+        connection.execute(text(f"SET LOCAL search_path = {schema}, public"))
+        # Tables without their indexes (the triggers don't need them, and
+        # the trigram ones would need pg_trgm)
+        tables = [Base.metadata.tables[name] for name in (*VERSIONED_TABLES, "table_versions")]
+        for table in tables:
+            for column in table.columns:
+                if isinstance(column.type, Enum):
+                    column.type.create(connection, checkfirst=True)
+        for table in tables:
+            connection.execute(CreateTable(table))
+        for statement in TABLE_VERSION_TRIGGERS:
+            connection.execute(text(statement))
+        try:
+            yield connection
+        finally:
+            transaction.rollback()
+    engine.dispose()
+
+
+def version(conn, table="experience_blocks"):
+    return conn.execute(
+        text("SELECT version FROM table_versions WHERE table_name = :table"), {"table": table}
+    ).scalar() or 0
+
+
+def insert_block(conn, title="Platform"):
+    block_id = uuid.uuid4()
+    conn.execute(text(
+        "INSERT INTO experience_blocks (id, title, content, embedding_status, embedding_attempts, updated_at) "
+        "VALUES (:id, :title, 'Ran Kubernetes', 'PENDING', 0, now())"
+    ), {"id": block_id, "title": title})
+    return block_id
+
+
+def test_insert_update_and_delete_bump(conn):
+    block_id = insert_block(conn)
+    assert version(conn) == 1
+    conn.execute(text("UPDATE experience_blocks SET content = 'Ran Nomad' WHERE id = :id"), {"id": block_id})
+    assert version(conn) == 2
+    conn.execute(text("DELETE FROM experience_blocks WHERE id = :id"), {"id": block_id})
+    assert version(conn) == 3
+
+
+def test_statements_matching_no_rows_leave_version(conn):
+    insert_block(conn)
+    before = version(conn)
+    conn.execute(text("UPDATE experience_blocks SET content = 'x' WHERE false"))
+    conn.execute(text("DELETE FROM experience_blocks WHERE false"))
+    conn.execute(text("INSERT INTO experience_blocks (id, title, content) SELECT id, title, content FROM experience_blocks WHERE false"))
+    assert version(conn) == before
+
+
+def test_claim_only_update_leaves_version(conn):
+    block_id = insert_block(conn)
+    before = version(conn)
+    conn.execute(text(
+        "UPDATE experience_blocks SET embedding_claimed_by = 'batch', embedding_claimed_at = now(), "
+        "updated_at = updated_at WHERE id = :id"
+    ), {"id": block_id})
+    conn.execute(text(
+        "UPDATE experience_blocks SET embedding_claimed_by = NULL, embedding_claimed_at = NULL WHERE id = :id"
+    ), {"id": block_id})
+    assert version(conn) == before
+    # The worker's write-back changes the status, which the API returns
+    conn.execute(text("UPDATE experience_blocks SET embedding_status = 'READY' WHERE id = :id"), {"id": block_id})
+    assert version(conn) == before + 1
+
+
+def test_other_tables_are_versioned_separately(conn):
+    conn.execute(text("INSERT INTO personal_info (id, name) VALUES (:id, 'Ada')"), {"id": uuid.uuid4()})
+    assert version(conn, "personal_info") == 1
+    assert version(conn) == 0
@@ -0,0 +1,48 @@
+"""Trace export happens on the writer thread and never blocks the request"""
+
+import json
+import queue
+
+import tracing
+from metrics import TRACES_DROPPED
+
+
+def finished_trace(name="GET /api/profile"):
+    trace = tracing.Trace()
+    trace.start_span(name, None, tracing.SPAN_KIND_SERVER).end()
+    return trace
+
+
+def test_export_writes_on_the_writer_thread(tmp_path, monkeypatch):
+    trace_file = tmp_path / "spans.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_EXPORTER", "file")
+    monkeypatch.setattr(tracing, "TRACE_FILE", str(trace_file))
+
+    trace = finished_trace()
+    tracing.export(trace)
+    tracing._export_queue.join()
+
+    line = json.loads(trace_file.read_text().splitlines()[-1])
+    span = line["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert span["traceId"] == trace.trace_id
+    assert span["name"] == "GET /api/profile"
+
+
+def test_full_queue_drops_and_counts(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_EXPORTER", "file")
+    # A queue nobody drains stands in for a writer that fell behind
+    monkeypatch.setattr(tracing, "_export_queue", queue.Queue(1))
+    monkeypatch.setattr(tracing, "_start_writer", lambda: None)
+
+    before = TRACES_DROPPED._value.get()
+    tracing.export(finished_trace())
+    tracing.export(finished_trace())
+    assert TRACES_DROPPED._value.get() == before + 1
+    assert tracing._export_queue.qsize() == 1
+
+
+def test_off_queues_nothing(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_EXPORTER", "off")
+    monkeypatch.setattr(tracing, "_export_queue", queue.Queue(1))
+    tracing.export(finished_trace())
+    assert tracing._export_queue.empty()
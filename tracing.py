@@ -0,0 +1,327 @@
+"""
+Lightweight request tracing
+Spans live in a contextvar, so nested stages, SQL queries and LLM calls find
+their parent without passing anything around. Each finished request is
+exported as one line of OTLP/JSON (an ExportTraceServiceRequest), which the
+OpenTelemetry collector's otlpjsonfile receiver and most trace tools read.
+
+Finished traces are queued and serialized and written by a background
+thread, so the event loop never waits on JSON encoding or the disk; when the
+writer falls behind and the queue is full, traces are dropped and counted.
+
+TRACE_EXPORTER: "off" (default), "stdout" or "file" (TRACE_FILE, JSON lines)
+TRACE_QUEUE_SIZE: finished traces waiting for the writer (default 1000)
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+from metrics import TRACES_DROPPED
+
+logger = logging.getLogger(__name__)
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "off").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "./traces/spans.jsonl")
+# Bulk imports issue thousands of statements; keep a trace's size bounded
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "2000"))
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "1000"))
+SQL_STATEMENT_MAX_LENGTH = 1000
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "vector-cv-backend")
+
+TRACE_ID_HEADER = "X-Trace-Id"
+
+# OTLP enum values
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_export_queue: "queue.Queue[Optional[Trace]]" = queue.Queue(TRACE_QUEUE_SIZE)
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+
+
+class Trace:
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self.dropped = 0
+
+    def start_span(self, name: str, parent_id: Optional[str], kind: int = SPAN_KIND_INTERNAL,
+                   attributes: Optional[Dict] = None) -> "Span":
+        span = Span(self, name, parent_id, kind, attributes)
+        if len(self.spans) < TRACE_MAX_SPANS:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+        return span
+
+
+class Span:
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], kind: int, attributes: Optional[Dict]):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.status = STATUS_OK
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes):
+        self.events.append((name, time.time_ns(), attributes))
+
+    def record_error(self, error: BaseException):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"[:500]
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    def to_otlp(self) -> Dict:
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status, "message": self.status_message}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.events:
+            span["events"] = [
+                {"name": name, "timeUnixNano": str(at), "attributes": _otlp_attributes(attributes)}
+                for name, at, attributes in self.events
+            ]
+        return span
+
+
+def _otlp_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict) -> List[Dict]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current.get()
+    return span.trace.trace_id if span else None
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes):
+    """Child span of the current one; a no-op outside a traced request"""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.trace.start_span(name, parent.span_id, kind, attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.record_error(e)
+        raise
+    finally:
+        _current.reset(token)
+        child.end()
+
+
+def export(trace: Trace):
+    """Queue a finished trace for the writer thread; never blocks"""
+    if TRACE_EXPORTER == "off" or not trace.spans:
+        return
+    _start_writer()
+    try:
+        _export_queue.put_nowait(trace)
+    except queue.Full:
+        TRACES_DROPPED.inc()
+
+
+def _write(trace: Trace):
+    root_attributes = {"service.name": SERVICE_NAME}
+    if trace.dropped:
+        root_attributes["trace.dropped_spans"] = trace.dropped
+    line = json.dumps({
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes(root_attributes)},
+            "scopeSpans": [{
+                "scope": {"name": "vector-cv"},
+                "spans": [span.to_otlp() for span in trace.spans]
+            }]
+        }]
+    }, separators=(",", ":"))
+
+    if TRACE_EXPORTER == "stdout":
+        print(line, flush=True)
+    else:
+        os.makedirs(os.path.dirname(TRACE_FILE) or ".", exist_ok=True)
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def _run_writer():
+    while True:
+        trace = _export_queue.get()
+        try:
+            if trace is None:
+                return
+            _write(trace)
+        except Exception as e:
+            logger.warning("⚠️  Trace export failed: %s", e)
+        finally:
+            _export_queue.task_done()
+
+
+def _start_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run_writer, name="trace-writer", daemon=True)
+            _writer.start()
+            # Write what is still queued when the worker exits
+            atexit.register(_stop_writer)
+
+
+def _stop_writer(timeout: float = 5.0):
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            return
+        try:
+            _export_queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        _writer.join(timeout)
+        _writer = None
+
+
+def instrument_engine(engine):
+    """A client span per SQL statement executed inside a traced request"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        parent = _current.get()
+        if parent is None:
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+        query_span = parent.trace.start_span(operation, parent.span_id, SPAN_KIND_CLIENT, {
+            "db.system": "postgresql",
+            "db.operation": operation,
+            "db.statement": statement[:SQL_STATEMENT_MAX_LENGTH],
+            "db.executemany": executemany or None
+        })
+        conn.info.setdefault("trace_spans", []).append(query_span)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            query_span = spans.pop()
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                query_span.set_attribute("db.rowcount", cursor.rowcount)
+            query_span.end()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        spans = context.connection.info.get("trace_spans") if context.connection is not None else None
+        if spans:
+            query_span = spans.pop()
+            query_span.record_error(context.original_exception)
+            query_span.end()
+
+
+class TracingMiddleware:
+    """Root span per HTTP request, continuing an incoming W3C traceparent,
+    and the trace id in the X-Trace-Id response header
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        remote_parent = None
+        trace_id = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                match = _TRACEPARENT.match(value.decode("latin-1").strip().lower())
+                if match and match.group(1) != "0" * 32:
+                    trace_id, remote_parent = match.group(1), match.group(2)
+                break
+
+        trace = Trace(trace_id)
+        root = trace.start_span(f"{scope['method']} {scope['path']}", remote_parent, SPAN_KIND_SERVER, {
+            "http.method": scope["method"],
+            "http.target": scope["path"]
+        })
+        token = _current.set(root)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    root.status = STATUS_ERROR
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", [])) + [
+                        (TRACE_ID_HEADER.lower().encode("latin-1"), trace.trace_id.encode("latin-1"))
+                    ]
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            root.record_error(e)
+            raise
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                root.name = f"{scope['method']} {route.path}"
+                root.set_attribute("http.route", route.path)
+            _current.reset(token)
+            root.end()
+            export(trace)
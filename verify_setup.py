@@ -5,7 +5,7 @@ Run this after migration or fresh seed to ensure everything is working
 
 from sqlalchemy import create_engine, text
 from database import SessionLocal
-from models import ExperienceBlock, PersonalInfo, BlockType
+from models import ExperienceBlock, PersonalInfo, BlockType, EmbeddingStatus
 import os
 from dotenv import load_dotenv
 
@@ -92,14 +92,20 @@ def verify_setup():
     
     total_blocks = db.query(ExperienceBlock).count()
     blocks_with_embeddings = db.query(ExperienceBlock).filter(
-        ExperienceBlock.embedding.isnot(None)
+        ExperienceBlock.embedding_status == EmbeddingStatus.READY
+    ).count()
+    failed_embeddings = db.query(ExperienceBlock).filter(
+        ExperienceBlock.embedding_status == EmbeddingStatus.FAILED
     ).count()
     
     if blocks_with_embeddings == total_blocks:
         print(f"   ✅ All {total_blocks} blocks have embeddings")
     else:
         print(f"   ⚠️  Only {blocks_with_embeddings}/{total_blocks} blocks have embeddings")
-        print("   Run seed_data.py to regenerate embeddings")
+        if failed_embeddings:
+            print(f"   ❌ {failed_embeddings} block(s) failed to embed, re-run seed_data.py to retry them")
+        else:
+            print("   The rest are queued, the API's embedding worker will process them")
     
     # 6. List all blocks
     print("\n6. All Experience Blocks:")
@@ -130,7 +136,7 @@ def verify_setup():
     if not all_critical_present:
         print("❌ Missing critical blocks - run seed_data.py to fix")
     elif blocks_with_embeddings < total_blocks:
-        print("⚠️  Missing embeddings - regenerate with seed_data.py")
+        print("⚠️  Missing embeddings - check the API is running so its embedding worker can process them")
     else:
         print("✅ Database looks healthy!")
         print("\nNext steps:")